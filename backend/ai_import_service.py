@@ -3,12 +3,20 @@ AI Import Service
 Handles validation and creation of tracks from AI-extracted JSON
 """
 
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel, validator, Field
-from typing import List, Optional, Literal, Dict, Any
+from fastapi import APIRouter, HTTPException, Depends, Request
+from pydantic import BaseModel, ValidationError, validator, Field
+from typing import List, Optional, Literal, Dict, Any, Tuple
+import logging
 import uuid
 from datetime import datetime
-from motor.motor_asyncio import AsyncIOMotorDatabase
+from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorClientSession
+from pymongo import ReplaceOne
+from pymongo.errors import OperationFailure
+
+from bulk_import import bulk_import_response
+from exam_cache import invalidate_exam_cache
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -194,43 +202,27 @@ def get_database() -> AsyncIOMotorDatabase:
     return db
 
 
-async def create_exam_from_import(db: AsyncIOMotorDatabase, import_data: AIImportRequest) -> str:
-    """Create exam document in database"""
-    exam_id = f"ielts-{import_data.test_type}-{uuid.uuid4().hex[:8]}"
-    
-    exam_data = {
-        "_id": exam_id,
-        "id": exam_id,
-        "title": import_data.title,
-        "description": import_data.description,
-        "exam_type": import_data.test_type,
-        "audio_url": import_data.audio_url,
-        "audio_source_method": "url" if import_data.audio_url else None,
-        "loop_audio": False,
-        "duration_seconds": import_data.duration_seconds,
-        "published": True,
-        "is_active": False,
-        "started_at": None,
-        "stopped_at": None,
-        "question_count": sum(len(s.questions) for s in import_data.sections),
-        "submission_count": 0,
-        "created_at": datetime.utcnow().isoformat() + "Z",
-        "updated_at": datetime.utcnow().isoformat() + "Z",
-        "is_demo": False
-    }
-    
-    await db.exams.replace_one({"_id": exam_id}, exam_data, upsert=True)
-    return exam_id
+# Result of supports_transactions() per Motor client, keyed by id(client)
+_transaction_support: Dict[int, bool] = {}
 
 
-async def create_sections_from_import(
-    db: AsyncIOMotorDatabase,
-    exam_id: str,
-    sections: List[SectionImport]
-) -> List[str]:
-    """Create section documents in database"""
-    section_ids = []
-    
+async def supports_transactions(db: AsyncIOMotorDatabase) -> bool:
+    """Whether the deployment can run multi-document transactions (replica set or sharded cluster)"""
+    client = db.client
+    cached = _transaction_support.get(id(client))
+    if cached is None:
+        try:
+            hello = await client.admin.command("hello")
+            cached = "setName" in hello or hello.get("msg") == "isdbgrid"
+        except OperationFailure:
+            cached = False
+        _transaction_support[id(client)] = cached
+    return cached
+
+
+def build_section_documents(exam_id: str, sections: List[SectionImport]) -> List[Dict[str, Any]]:
+    """Section documents of an import"""
+    documents = []
     for section in sections:
         section_id = f"{exam_id}-section-{section.index}"
         section_data = {
@@ -246,20 +238,13 @@ async def create_sections_from_import(
         if section.passage_text:
             section_data["passage_text"] = section.passage_text
         
-        await db.sections.replace_one({"_id": section_id}, section_data, upsert=True)
-        section_ids.append(section_id)
-    
-    return section_ids
+        documents.append(section_data)
+    return documents
 
 
-async def create_questions_from_import(
-    db: AsyncIOMotorDatabase,
-    exam_id: str,
-    sections: List[SectionImport]
-) -> int:
-    """Create question documents in database"""
-    questions_created = 0
-    
+def build_question_documents(exam_id: str, sections: List[SectionImport]) -> List[Dict[str, Any]]:
+    """Question documents of an import"""
+    documents = []
     for section in sections:
         section_id = f"{exam_id}-section-{section.index}"
         
@@ -290,7 +275,7 @@ async def create_questions_from_import(
             if question.instructions:
                 payload["instructions"] = question.instructions
             
-            question_data = {
+            documents.append({
                 "_id": question_id,
                 "id": question_id,
                 "section_id": section_id,
@@ -301,19 +286,85 @@ async def create_questions_from_import(
                 "marks": 1,
                 "created_by": "admin",
                 "is_demo": False
-            }
-            
-            await db.questions.replace_one({"_id": question_id}, question_data, upsert=True)
-            questions_created += 1
+            })
+    return documents
+
+
+async def create_exam_from_import(
+    db: AsyncIOMotorDatabase,
+    import_data: AIImportRequest,
+    session: Optional[AsyncIOMotorClientSession] = None
+) -> str:
+    """Create exam document in database"""
+    exam_id = f"ielts-{import_data.test_type}-{uuid.uuid4().hex[:8]}"
+    
+    exam_data = {
+        "_id": exam_id,
+        "id": exam_id,
+        "title": import_data.title,
+        "description": import_data.description,
+        "exam_type": import_data.test_type,
+        "audio_url": import_data.audio_url,
+        "audio_source_method": "url" if import_data.audio_url else None,
+        "loop_audio": False,
+        "duration_seconds": import_data.duration_seconds,
+        "published": True,
+        "is_active": False,
+        "started_at": None,
+        "stopped_at": None,
+        "question_count": sum(len(s.questions) for s in import_data.sections),
+        "submission_count": 0,
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "updated_at": datetime.utcnow().isoformat() + "Z",
+        # A re-import replaces the exam and resets its status
+        "status_updated_at": datetime.utcnow().isoformat() + "Z",
+        "is_demo": False
+    }
     
-    return questions_created
+    await db.exams.replace_one({"_id": exam_id}, exam_data, upsert=True, session=session)
+    return exam_id
+
+
+async def create_sections_from_import(
+    db: AsyncIOMotorDatabase,
+    exam_id: str,
+    sections: List[SectionImport],
+    session: Optional[AsyncIOMotorClientSession] = None
+) -> List[str]:
+    """Create section documents in database (one ordered bulk_write)"""
+    documents = build_section_documents(exam_id, sections)
+    if documents:
+        await db.sections.bulk_write(
+            [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in documents],
+            ordered=True,
+            session=session
+        )
+    return [doc["id"] for doc in documents]
+
+
+async def create_questions_from_import(
+    db: AsyncIOMotorDatabase,
+    exam_id: str,
+    sections: List[SectionImport],
+    session: Optional[AsyncIOMotorClientSession] = None
+) -> int:
+    """Create question documents in database (one ordered bulk_write)"""
+    documents = build_question_documents(exam_id, sections)
+    if documents:
+        await db.questions.bulk_write(
+            [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in documents],
+            ordered=True,
+            session=session
+        )
+    return len(documents)
 
 
 async def create_track_record(
     db: AsyncIOMotorDatabase,
     import_data: AIImportRequest,
     exam_id: str,
-    admin_email: str = "admin@example.com"
+    admin_email: str = "admin@example.com",
+    session: Optional[AsyncIOMotorClientSession] = None
 ) -> str:
     """Create track document in database"""
     track_id = str(uuid.uuid4())
@@ -343,10 +394,55 @@ async def create_track_record(
         "source": "ai_import"
     }
     
-    await db.tracks.replace_one({"_id": track_id}, track_data, upsert=True)
+    await db.tracks.replace_one({"_id": track_id}, track_data, upsert=True, session=session)
     return track_id
 
 
+async def _remove_import(db: AsyncIOMotorDatabase, exam_id: str):
+    """Delete whatever a failed non-transactional import managed to write"""
+    await db.questions.delete_many({"exam_id": exam_id})
+    await db.sections.delete_many({"exam_id": exam_id})
+    await db.tracks.delete_many({"exam_id": exam_id})
+    await db.exams.delete_one({"id": exam_id})
+
+
+async def write_import(db: AsyncIOMotorDatabase, import_data: AIImportRequest) -> Tuple[str, str, int, int]:
+    """
+    Write an import's exam, sections, questions and track
+    
+    Runs in a transaction when the deployment supports one; on a standalone
+    server the partial writes of a failed import are deleted instead.
+    
+    Returns:
+        (exam_id, track_id, sections_created, questions_created)
+    """
+    async def write(session: Optional[AsyncIOMotorClientSession]):
+        exam_id = await create_exam_from_import(db, import_data, session)
+        written["exam_id"] = exam_id
+        section_ids = await create_sections_from_import(db, exam_id, import_data.sections, session)
+        questions_created = await create_questions_from_import(db, exam_id, import_data.sections, session)
+        track_id = await create_track_record(db, import_data, exam_id, session=session)
+        return exam_id, track_id, len(section_ids), questions_created
+    
+    written: Dict[str, str] = {}
+    if await supports_transactions(db):
+        async with await db.client.start_session() as session:
+            result = await session.with_transaction(write)
+    else:
+        try:
+            result = await write(None)
+        except Exception:
+            if "exam_id" in written:
+                try:
+                    await _remove_import(db, written["exam_id"])
+                except Exception as cleanup_error:
+                    logger.error(f"Cleanup of failed import {written['exam_id']} failed: {cleanup_error}")
+            raise
+    
+    invalidate_exam_cache(result[0])
+    return result
+
+
 # ============================================
 # API ENDPOINTS
 # ============================================
@@ -398,25 +494,16 @@ async def import_track_from_ai(import_data: AIImportRequest, db: AsyncIOMotorDat
     6. Return success response
     """
     try:
-        # Step 1: Create exam
-        exam_id = await create_exam_from_import(db, import_data)
-        
-        # Step 2: Create sections
-        section_ids = await create_sections_from_import(db, exam_id, import_data.sections)
-        
-        # Step 3: Create questions
-        questions_created = await create_questions_from_import(db, exam_id, import_data.sections)
+        # Steps 2-5: exam, sections, questions and track, written together
+        exam_id, track_id, sections_created, questions_created = await write_import(db, import_data)
         
-        # Step 4: Create track record
-        track_id = await create_track_record(db, import_data, exam_id)
-        
-        # Step 5: Return success
+        # Step 6: Return success
         return TrackCreateResponse(
             success=True,
             track_id=track_id,
             exam_id=exam_id,
             questions_created=questions_created,
-            sections_created=len(section_ids),
+            sections_created=sections_created,
             message=f"Track '{import_data.title}' created successfully with {questions_created} questions"
         )
         
@@ -424,6 +511,41 @@ async def import_track_from_ai(import_data: AIImportRequest, db: AsyncIOMotorDat
         raise HTTPException(status_code=400, detail=f"Failed to create track: {str(e)}")
 
 
+@router.post("/api/tracks/import-bulk")
+async def import_tracks_bulk(request: Request, db: AsyncIOMotorDatabase = Depends(get_database)):
+    """
+    Create tracks from many AI-generated tests in one upload
+    Body: JSON Lines (one test per line) or a JSON array of tests
+    Response: NDJSON, one result per test as it is created, then a summary line
+    """
+    async def import_one(test_data: Any) -> Dict[str, Any]:
+        if not isinstance(test_data, dict):
+            return {"status": "failed", "errors": ["Each test must be a JSON object"]}
+        
+        title = test_data.get("title")
+        try:
+            import_data = AIImportRequest(**test_data)
+        except ValidationError as e:
+            errors = [f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()]
+            return {"title": title, "status": "failed", "errors": errors}
+        
+        try:
+            exam_id, track_id, sections_created, questions_created = await write_import(db, import_data)
+        except Exception as e:
+            return {"title": title, "status": "failed", "errors": [f"Failed to create track: {str(e)}"]}
+        
+        return {
+            "title": title,
+            "status": "success",
+            "exam_id": exam_id,
+            "track_id": track_id,
+            "sections_created": sections_created,
+            "questions_created": questions_created,
+        }
+    
+    return await bulk_import_response(request, import_one)
+
+
 @router.post("/api/tracks/from-exam/{exam_id}")
 async def convert_exam_to_track(exam_id: str, db: AsyncIOMotorDatabase = Depends(get_database)):
     """
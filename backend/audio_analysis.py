@@ -0,0 +1,315 @@
+"""
+Audio Analysis
+Upload-time analysis of listening tracks with NumPy: duration, level,
+silent gaps (from which section start times are derived) and a compact
+peak array for waveform display
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import subprocess
+import wave
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+import anyio
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_VERSION = 1
+ANALYSIS_DIRNAME = "analysis"
+# Tracks are analysed as mono at this rate (enough for levels and silences)
+ANALYSIS_SAMPLE_RATE = 8000
+WINDOW_SECONDS = 0.05
+PEAK_BUCKETS = 1000
+# A gap counts as silence when it is this far below the track's median level...
+SILENCE_BELOW_MEDIAN_DB = 25.0
+# ...or below this absolute level
+SILENCE_FLOOR_DBFS = -50.0
+MIN_SILENCE_SECONDS = 1.5
+READ_BLOCK_SECONDS = 10
+
+
+def _dbfs(value: float) -> float:
+    return round(float(20 * np.log10(max(value, 1e-9))), 2)
+
+
+class _WindowStats:
+    """Accumulates RMS and peak amplitude per WINDOW_SECONDS window of mono samples"""
+
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self.window = max(1, int(sample_rate * WINDOW_SECONDS))
+        self.samples = 0
+        self._carry = np.zeros(0, dtype=np.float32)
+        self._rms: List[np.ndarray] = []
+        self._peak: List[np.ndarray] = []
+
+    def add(self, samples: np.ndarray):
+        self.samples += len(samples)
+        samples = np.concatenate([self._carry, samples]) if len(self._carry) else samples
+        whole = len(samples) // self.window * self.window
+        self._carry = samples[whole:]
+        self._add_windows(samples[:whole])
+
+    def _add_windows(self, samples: np.ndarray):
+        if not len(samples):
+            return
+        windows = samples.reshape(-1, self.window)
+        self._rms.append(np.sqrt(np.mean(np.square(windows, dtype=np.float64), axis=1)))
+        self._peak.append(np.max(np.abs(windows), axis=1))
+
+    def finish(self):
+        if len(self._carry):
+            padded = np.zeros(self.window, dtype=np.float32)
+            padded[:len(self._carry)] = self._carry
+            self._add_windows(padded)
+            self._carry = np.zeros(0, dtype=np.float32)
+        rms = np.concatenate(self._rms) if self._rms else np.zeros(0)
+        peak = np.concatenate(self._peak) if self._peak else np.zeros(0)
+        return rms, peak
+
+
+def _decode_wav(path: Path) -> Optional[_WindowStats]:
+    """Feed a PCM WAV file to a _WindowStats block by block; None if unsupported"""
+    try:
+        reader = wave.open(str(path), "rb")
+    except (wave.Error, EOFError):
+        return None
+
+    with reader:
+        width = reader.getsampwidth()
+        channels = reader.getnchannels()
+        rate = reader.getframerate()
+        if width not in (1, 2, 3, 4) or not rate:
+            return None
+
+        stats = _WindowStats(rate)
+        block_frames = rate * READ_BLOCK_SECONDS
+        while True:
+            raw = reader.readframes(block_frames)
+            if not raw:
+                break
+            if width == 1:
+                samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+            elif width == 3:
+                # Sign-extend 24-bit samples into int32
+                triples = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+                values = triples[:, 0].astype(np.int32) | (triples[:, 1].astype(np.int32) << 8) | (triples[:, 2].astype(np.int32) << 16)
+                samples = (np.where(values & 0x800000, values - 0x1000000, values) / float(1 << 23)).astype(np.float32)
+            else:
+                dtype = np.int16 if width == 2 else np.int32
+                samples = np.frombuffer(raw, dtype=dtype).astype(np.float32) / float(1 << (8 * width - 1))
+            if channels > 1:
+                samples = samples[:len(samples) // channels * channels].reshape(-1, channels).mean(axis=1)
+            stats.add(samples)
+        return stats
+
+
+def _decode_ffmpeg(path: Path, ffmpeg: str) -> Optional[_WindowStats]:
+    """Decode any format ffmpeg reads into mono 16-bit PCM at ANALYSIS_SAMPLE_RATE"""
+    stats = _WindowStats(ANALYSIS_SAMPLE_RATE)
+    process = subprocess.Popen(
+        [ffmpeg, "-nostdin", "-v", "error", "-i", str(path), "-vn", "-ac", "1",
+         "-ar", str(ANALYSIS_SAMPLE_RATE), "-f", "s16le", "-"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL
+    )
+    block_bytes = ANALYSIS_SAMPLE_RATE * 2 * READ_BLOCK_SECONDS
+    leftover = b""
+    with process:
+        while True:
+            raw = process.stdout.read(block_bytes)
+            if not raw:
+                break
+            raw = leftover + raw
+            usable = len(raw) // 2 * 2
+            leftover = raw[usable:]
+            stats.add(np.frombuffer(raw[:usable], dtype=np.int16).astype(np.float32) / 32768.0)
+    if process.returncode != 0 or stats.samples == 0:
+        return None
+    return stats
+
+
+def find_silences(rms: np.ndarray, window_seconds: float = WINDOW_SECONDS) -> List[List[float]]:
+    """[start, end] seconds of every quiet stretch of at least MIN_SILENCE_SECONDS"""
+    if not len(rms):
+        return []
+    level = 20 * np.log10(np.maximum(rms, 1e-9))
+    audible = level[level > SILENCE_FLOOR_DBFS]
+    threshold = SILENCE_FLOOR_DBFS
+    if len(audible):
+        threshold = max(threshold, float(np.median(audible)) - SILENCE_BELOW_MEDIAN_DB)
+
+    quiet = np.concatenate([[False], level < threshold, [False]])
+    edges = np.flatnonzero(np.diff(quiet.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+    min_windows = int(np.ceil(MIN_SILENCE_SECONDS / window_seconds))
+    keep = (ends - starts) >= min_windows
+    return [
+        [round(float(start * window_seconds), 2), round(float(end * window_seconds), 2)]
+        for start, end in zip(starts[keep], ends[keep])
+    ]
+
+
+def section_starts(silences: List[List[float]], section_count: int) -> List[float]:
+    """
+    Start times of section_count sections, splitting the track at the
+    section_count - 1 longest silences. Returns fewer entries when the
+    track has fewer gaps.
+    """
+    if section_count <= 1:
+        return [0.0]
+    longest = sorted(silences, key=lambda gap: gap[1] - gap[0], reverse=True)[:section_count - 1]
+    return [0.0] + sorted(gap[1] for gap in longest)
+
+
+def analyze_track(path: Path, ffmpeg: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Analyse a track (blocking; run it in a worker thread). WAV files are
+    decoded natively, other formats need ffmpeg. Returns None if the track
+    cannot be decoded.
+    """
+    stats = None
+    if path.suffix.lower() == ".wav":
+        stats = _decode_wav(path)
+    if stats is None and ffmpeg:
+        stats = _decode_ffmpeg(path, ffmpeg)
+    if stats is None or stats.samples == 0:
+        return None
+
+    rms, peak = stats.finish()
+    duration = stats.samples / stats.sample_rate
+
+    # Waveform: maximum peak per bucket, relative to the track's loudest
+    # sample (peak_dbfs gives the absolute level) and scaled to 0-255
+    buckets = min(PEAK_BUCKETS, len(peak))
+    bounds = np.linspace(0, len(peak), buckets + 1).astype(np.int64)
+    peaks = np.maximum.reduceat(peak, bounds[:-1]) if buckets else np.zeros(0)
+    if len(peaks) and peak.max() > 0:
+        peaks = peaks / peak.max()
+    total_rms = float(np.sqrt(np.mean(np.square(rms, dtype=np.float64)))) if len(rms) else 0.0
+
+    return {
+        "version": ANALYSIS_VERSION,
+        "duration_seconds": round(duration, 3),
+        "rms_dbfs": _dbfs(total_rms),
+        "peak_dbfs": _dbfs(float(peak.max()) if len(peak) else 0.0),
+        "silences": find_silences(rms),
+        "peaks": np.clip(np.round(peaks * 255), 0, 255).astype(np.uint8).tolist(),
+        "peaks_seconds_per_bucket": round(duration / buckets, 4) if buckets else 0,
+    }
+
+
+class AudioAnalyzer:
+    """
+    Computes and caches track analyses as JSON sidecars in the store's
+    analysis/ directory (<stem>.json). Stored tracks are content-addressed
+    and immutable, so a sidecar never goes stale.
+
+    Decoding runs in worker threads, at most concurrency tracks at a time,
+    and each track is analysed once however many callers ask for it.
+    Request handlers schedule() the analysis in the background, like
+    AudioTranscoder does for renditions.
+    """
+
+    def __init__(self, root: Path, concurrency: int = 2, ffmpeg: Optional[str] = None):
+        self.analysis_dir = root / ANALYSIS_DIRNAME
+        self.analysis_dir.mkdir(parents=True, exist_ok=True)
+        self.ffmpeg = ffmpeg or shutil.which("ffmpeg")
+        self._slots = asyncio.Semaphore(concurrency)
+        self._running: Dict[Path, asyncio.Task] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def sidecar_path(self, source: Path) -> Path:
+        return self.analysis_dir / f"{source.stem}.json"
+
+    def _load(self, source: Path) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.sidecar_path(source)) as f:
+                analysis = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return analysis if analysis.get("version") == ANALYSIS_VERSION else None
+
+    def _analyze_and_store(self, source: Path) -> Optional[Dict[str, Any]]:
+        analysis = analyze_track(source, self.ffmpeg)
+        if analysis is None:
+            return None
+        target = self.sidecar_path(source)
+        partial = target.with_name(target.name + ".part")
+        with open(partial, "w") as f:
+            json.dump(analysis, f, separators=(",", ":"))
+        os.replace(partial, target)
+        return analysis
+
+    async def _compute(self, source: Path) -> Optional[Dict[str, Any]]:
+        async with self._slots:
+            return await anyio.to_thread.run_sync(self._analyze_and_store, source)
+
+    def _start(self, source: Path) -> asyncio.Task:
+        """The running analysis of a track, starting one if needed"""
+        task = self._running.get(source)
+        if task is None:
+            task = asyncio.create_task(self._compute(source))
+            self._running[source] = task
+            task.add_done_callback(lambda _: self._running.pop(source, None))
+        return task
+
+    async def cached(self, source: Path) -> Optional[Dict[str, Any]]:
+        """The stored analysis of a track, or None if it has not been computed"""
+        return await anyio.to_thread.run_sync(self._load, source)
+
+    def is_pending(self, source: Path) -> bool:
+        """Whether a track is being analysed"""
+        return source in self._running
+
+    async def ensure(self, source: Path) -> Optional[Dict[str, Any]]:
+        """The analysis of a stored track, computing it if needed (None if undecodable)"""
+        analysis = await self.cached(source)
+        if analysis is not None:
+            return analysis
+        return await asyncio.shield(self._start(source))
+
+    def schedule(
+        self,
+        source: Path,
+        then: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+    ):
+        """
+        Analyse a track in the background (a no-op if its sidecar exists),
+        then await then(analysis) if given and the track could be decoded
+        """
+        task = asyncio.create_task(self._run_scheduled(source, then))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_scheduled(self, source: Path, then):
+        try:
+            analysis = await self.ensure(source)
+            if analysis is not None and then is not None:
+                await then(analysis)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Audio analysis of {source.name} failed: {e}")
+
+    async def close(self):
+        for task in list(self._tasks) + list(self._running.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._running.values(), return_exceptions=True)
+
+    @staticmethod
+    def exam_summary(analysis: Dict[str, Any], analysis_url: str, section_count: int) -> Dict[str, Any]:
+        """The part of an analysis stored on the exam next to audio_url"""
+        return {
+            "duration_seconds": analysis["duration_seconds"],
+            "rms_dbfs": analysis["rms_dbfs"],
+            "peak_dbfs": analysis["peak_dbfs"],
+            "section_starts": section_starts(analysis["silences"], section_count),
+            "analysis_url": analysis_url,
+        }
@@ -0,0 +1,365 @@
+"""
+Audio Delivery
+Serves listening tracks with byte ranges and strong ETags, transcodes
+uploads into lower-bitrate renditions in the background, and picks the
+rendition each listener should stream
+"""
+
+import asyncio
+import logging
+import os
+import re
+import shutil
+import stat
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import anyio
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = {".mp3", ".wav", ".m4a", ".ogg", ".flac"}
+RENDITION_DIRNAME = "renditions"
+STREAM_CHUNK_BYTES = 256 * 1024
+# Track files never change once written (unique names, atomic renames)
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Share of the measured bandwidth a rendition may use, leaving room for the API
+BANDWIDTH_HEADROOM = 0.7
+# Listeners who picked a rendition this recently count as about to stream
+RECENT_LISTENER_SECONDS = 60.0
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+_TRACK_URL_PATTERN = re.compile(r"/listening_tracks/([^/?#]+)$")
+_MEDIA_TYPES = {
+    ".mp3": "audio/mpeg",
+    ".wav": "audio/wav",
+    ".m4a": "audio/mp4",
+    ".ogg": "audio/ogg",
+    ".flac": "audio/flac",
+}
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a Range header into an inclusive (start, end) byte range.
+
+    Returns None when the whole file should be sent (no header, or a
+    multi-range request, which is answered with the full file).
+
+    Raises:
+        RangeNotSatisfiable: The range lies outside the file
+    """
+    if not header or "," in header:
+        return None
+    match = _RANGE_PATTERN.match(header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable
+    return start, end
+
+
+def file_etag(file_stat: os.stat_result) -> str:
+    """
+    Strong validator for a track file. Tracks are written once under a
+    unique name and never modified in place, so size, mtime and inode
+    identify the content.
+    """
+    return f'"{file_stat.st_ino:x}-{file_stat.st_size:x}-{file_stat.st_mtime_ns:x}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    return header.strip() == "*" or etag in [tag.strip() for tag in header.split(",")]
+
+
+class AudioFileResponse(StreamingResponse):
+    """Streams a byte range of a file, counting the listener while it runs"""
+
+    def __init__(self, library: "AudioLibrary", path: Path, start: int, end: int, **kwargs):
+        self.library = library
+        self.path = path
+        self.start = start
+        self.end = end
+        self._fd: Optional[int] = None
+        super().__init__(self._chunks(), **kwargs)
+
+    async def _chunks(self):
+        offset = self.start
+        while offset <= self.end:
+            size = min(STREAM_CHUNK_BYTES, self.end - offset + 1)
+            chunk = await anyio.to_thread.run_sync(os.pread, self._fd, size, offset)
+            if not chunk:
+                break
+            offset += len(chunk)
+            yield chunk
+
+    async def __call__(self, scope, receive, send):
+        self._fd = os.open(self.path, os.O_RDONLY)
+        self.library.active_streams += 1
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.library.active_streams -= 1
+            os.close(self._fd)
+
+
+class AudioLibrary:
+    """
+    The listening track directory: originals at the top level and their
+    renditions (<stem>-<kbps>k.mp3) in a renditions/ subdirectory.
+
+    Every response carries a strong ETag and long-lived immutable caching,
+    and honours Range, If-Range and If-None-Match, so a listener who seeks
+    or reconnects only fetches the bytes it is missing. Active streams and
+    recent rendition choices are counted to share a configured uplink
+    between listeners, including a whole hall pressing play at once.
+    """
+
+    def __init__(self, root: Path, rendition_kbps: List[int], uplink_kbps: int = 0):
+        """
+        Args:
+            root: Directory holding the uploaded tracks
+            rendition_kbps: Bitrates of the renditions produced for each track
+            uplink_kbps: Outgoing bandwidth of this server (0 if unknown)
+        """
+        self.root = root.resolve()
+        self.rendition_dir = self.root / RENDITION_DIRNAME
+        self.rendition_dir.mkdir(parents=True, exist_ok=True)
+        self.rendition_kbps = sorted(set(rendition_kbps))
+        self.uplink_kbps = uplink_kbps
+        self.active_streams = 0
+        self._recent_choices: deque = deque()
+
+    def resolve(self, relative_path: str) -> Optional[Path]:
+        """Path of a file inside the library, None for anything outside it"""
+        path = (self.root / relative_path).resolve()
+        if path != self.root and self.root in path.parents:
+            return path
+        return None
+
+    def source_for_url(self, audio_url: Optional[str]) -> Optional[Path]:
+        """The stored original an exam's audio_url points at, None for external URLs"""
+        match = _TRACK_URL_PATTERN.search(audio_url or "")
+        if not match:
+            return None
+        path = self.resolve(match.group(1))
+        if path is None or path.parent != self.root or not path.is_file():
+            return None
+        return path
+
+    def rendition_path(self, source: Path, kbps: int) -> Path:
+        return self.rendition_dir / f"{source.stem}-{kbps}k.mp3"
+
+    def url_for(self, path: Path) -> str:
+        return f"/listening_tracks/{path.relative_to(self.root).as_posix()}"
+
+    def renditions(self, source: Path) -> List[Dict[str, Any]]:
+        """Renditions of a track that have been transcoded, lowest bitrate first"""
+        available = []
+        for kbps in self.rendition_kbps:
+            path = self.rendition_path(source, kbps)
+            if path.is_file():
+                available.append({"kbps": kbps, "url": self.url_for(path)})
+        return available
+
+    def choose(
+        self,
+        source: Path,
+        client_kbps: Optional[int] = None,
+        save_data: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Pick the rendition a listener should stream: the highest bitrate that
+        fits both the client's reported bandwidth and this listener's share
+        of the uplink. Without any bandwidth information the highest
+        rendition is used. The original is only served while no rendition
+        has been transcoded yet.
+        """
+        renditions = self.renditions(source)
+        result = {
+            "original": self.url_for(source),
+            "renditions": renditions,
+            "recommended": self.url_for(source),
+        }
+        if not renditions:
+            return result
+
+        budgets = []
+        if client_kbps:
+            budgets.append(client_kbps * BANDWIDTH_HEADROOM)
+        if self.uplink_kbps:
+            budgets.append(self.uplink_kbps * BANDWIDTH_HEADROOM / self._expected_listeners())
+
+        if save_data:
+            chosen = renditions[0]
+        elif budgets:
+            budget = min(budgets)
+            fitting = [r for r in renditions if r["kbps"] <= budget]
+            chosen = fitting[-1] if fitting else renditions[0]
+        else:
+            chosen = renditions[-1]
+        result["recommended"] = chosen["url"]
+        return result
+
+    def _expected_listeners(self) -> int:
+        """Listeners to share the uplink with, counting this one"""
+        now = time.monotonic()
+        while self._recent_choices and self._recent_choices[0] < now - RECENT_LISTENER_SECONDS:
+            self._recent_choices.popleft()
+        self._recent_choices.append(now)
+        return max(self.active_streams + 1, len(self._recent_choices))
+
+    async def response(self, request: Request, relative_path: str) -> Response:
+        """Serve a track file (GET or HEAD) with range and cache validation"""
+        path = self.resolve(relative_path)
+        if path is None or path.suffix.lower() not in AUDIO_EXTENSIONS:
+            raise HTTPException(status_code=404, detail="Not Found")
+        try:
+            file_stat = await anyio.to_thread.run_sync(os.stat, path)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Not Found")
+        if not stat.S_ISREG(file_stat.st_mode):
+            raise HTTPException(status_code=404, detail="Not Found")
+
+        size = file_stat.st_size
+        etag = file_etag(file_stat)
+        headers = {
+            "ETag": etag,
+            "Accept-Ranges": "bytes",
+            "Cache-Control": CACHE_CONTROL,
+        }
+        media_type = _MEDIA_TYPES.get(path.suffix.lower(), "application/octet-stream")
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+
+        byte_range = None
+        if_range = request.headers.get("if-range")
+        if not if_range or if_range.strip() == etag:
+            try:
+                byte_range = parse_range(request.headers.get("range", ""), size)
+            except RangeNotSatisfiable:
+                headers["Content-Range"] = f"bytes */{size}"
+                return Response(status_code=416, headers=headers)
+
+        if byte_range is None:
+            start, end, status_code = 0, size - 1, 200
+        else:
+            start, end = byte_range
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+
+        if request.method == "HEAD" or size == 0:
+            return Response(status_code=status_code, headers=headers, media_type=media_type)
+        return AudioFileResponse(self, path, start, end, status_code=status_code, headers=headers, media_type=media_type)
+
+
+class AudioTranscoder:
+    """
+    Transcodes uploaded tracks into the library's MP3 renditions with
+    ffmpeg, in the background and at most `concurrency` files at a time.
+
+    Renditions are written to a temporary name and renamed into place, so
+    a rendition is either complete or absent. Without ffmpeg on the PATH
+    nothing is transcoded and listeners stream the original.
+    """
+
+    def __init__(self, library: AudioLibrary, concurrency: int = 1, ffmpeg: Optional[str] = None):
+        self.library = library
+        self.ffmpeg = ffmpeg or shutil.which("ffmpeg")
+        self._slots = asyncio.Semaphore(concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+        self._scheduled: Set[Path] = set()
+
+    @property
+    def available(self) -> bool:
+        return self.ffmpeg is not None
+
+    def is_pending(self, source: Path) -> bool:
+        """Whether renditions of a track are queued or being transcoded"""
+        return source in self._scheduled
+
+    def schedule(self, source: Path) -> bool:
+        """Queue the missing renditions of a track; False if ffmpeg is unavailable"""
+        if not self.available:
+            return False
+        if source in self._scheduled:
+            return True
+        self._scheduled.add(source)
+        task = asyncio.create_task(self._transcode_all(source))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    def backfill(self) -> int:
+        """Schedule tracks that are missing renditions (e.g. uploaded before a restart)"""
+        if not self.available:
+            return 0
+        count = 0
+        for source in self.library.root.iterdir():
+            if source.is_file() and source.suffix.lower() in AUDIO_EXTENSIONS:
+                if any(not self.library.rendition_path(source, kbps).exists() for kbps in self.library.rendition_kbps):
+                    self.schedule(source)
+                    count += 1
+        return count
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _transcode_all(self, source: Path):
+        try:
+            async with self._slots:
+                for kbps in self.library.rendition_kbps:
+                    target = self.library.rendition_path(source, kbps)
+                    if not target.exists():
+                        await self._transcode(source, target, kbps)
+        finally:
+            self._scheduled.discard(source)
+
+    async def _transcode(self, source: Path, target: Path, kbps: int):
+        partial = target.with_name(target.name + ".part")
+        # Speech stays intelligible in mono at low bitrates
+        channels = ["-ac", "1"] if kbps < 96 else []
+        process = await asyncio.create_subprocess_exec(
+            self.ffmpeg, "-nostdin", "-v", "error", "-y", "-i", str(source),
+            "-vn", *channels, "-c:a", "libmp3lame", "-b:a", f"{kbps}k", "-f", "mp3", str(partial),
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            _, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            process.kill()
+            await process.wait()
+            partial.unlink(missing_ok=True)
+            raise
+
+        if process.returncode != 0:
+            partial.unlink(missing_ok=True)
+            logger.error(f"Transcoding {source.name} to {kbps}k failed: {stderr.decode(errors='replace').strip()}")
+            return
+        os.replace(partial, target)
+        logger.info(f"Transcoded {source.name} to {target.name}")
@@ -0,0 +1,601 @@
+"""
+Audio Upload
+Streams uploaded listening tracks to disk off the event loop, hashing them
+on the way, and stores them content-addressed so identical uploads share
+one file. Large tracks can also be sent as resumable uploads
+"""
+
+import asyncio
+import contextlib
+import errno
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import anyio
+from fastapi import HTTPException, Request
+from python_multipart import MultipartParser
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import parse_options_header
+
+logger = logging.getLogger(__name__)
+
+# Partial uploads live next to the store so the final rename stays on one filesystem
+UPLOAD_DIRNAME = ".uploads"
+# Data is handed to the writer thread in blocks of this size
+WRITE_BUFFER_BYTES = 1024 * 1024
+MAX_AUDIO_BYTES = int(float(os.environ.get("AUDIO_UPLOAD_MAX_MB", "500")) * 1024 * 1024)
+UPLOAD_TIMEOUT_SECONDS = float(os.environ.get("AUDIO_UPLOAD_TIMEOUT_SECONDS", "900"))
+
+
+def upload_dir(store: Path) -> Path:
+    path = store / UPLOAD_DIRNAME
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def store_by_hash(store: Path, path: Path, sha256: str, extension: str) -> Tuple[str, bool]:
+    """
+    Move a complete upload to <sha256><extension> in the store (a hard link,
+    never a copy), or drop it if identical content is already stored.
+
+    Linking fails if the target exists, so concurrent uploads of the same
+    track (in any process) store it exactly once and never replace a file
+    that is being served.
+
+    Returns:
+        (filename in the store, whether the file is new)
+    """
+    filename = f"{sha256}{extension}"
+    target = store / filename
+    try:
+        os.link(path, target)
+        created = True
+    except FileExistsError:
+        created = False
+    except OSError as e:
+        if e.errno not in (errno.EPERM, errno.ENOTSUP, errno.EOPNOTSUPP):
+            raise
+        # No hard links on this filesystem: claim the name exclusively, then move into it
+        try:
+            os.close(os.open(target, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644))
+        except FileExistsError:
+            created = False
+        else:
+            os.replace(path, target)
+            return filename, True
+    path.unlink(missing_ok=True)
+    return filename, created
+
+
+class TrackWriter:
+    """
+    Writes a track to a partial file in the store and computes its SHA-256
+    on the fly. File writes and hashing (which releases the GIL) run in
+    worker threads on WRITE_BUFFER_BYTES blocks, so the event loop only
+    appends to a buffer.
+
+    commit() renames the partial file to <sha256><extension>; if that file
+    already exists the upload is a duplicate and the partial file is
+    dropped instead.
+    """
+
+    def __init__(self, store: Path, max_bytes: int = MAX_AUDIO_BYTES):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.path = upload_dir(store) / f"{uuid.uuid4()}.part"
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+        self._buffer = bytearray()
+        self._file = open(self.path, "wb")
+
+    async def write(self, data: bytes):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Audio file exceeds the {self.max_bytes // (1024 * 1024)} MB limit"
+            )
+        self._buffer += data
+        if len(self._buffer) >= WRITE_BUFFER_BYTES:
+            await self._flush()
+
+    async def _flush(self):
+        if not self._buffer:
+            return
+        block = bytes(self._buffer)
+        self._buffer.clear()
+        await anyio.to_thread.run_sync(self._write_block, block)
+
+    def _write_block(self, block: bytes):
+        self._sha256.update(block)
+        self._file.write(block)
+
+    async def commit(self, extension: str) -> Tuple[str, bool]:
+        """
+        Store the track under its content hash.
+
+        Returns:
+            (filename in the store, whether the file is new)
+        """
+        await self._flush()
+        return await anyio.to_thread.run_sync(self._commit, extension)
+
+    def _commit(self, extension: str) -> Tuple[str, bool]:
+        self._file.close()
+        return store_by_hash(self.store, self.path, self._sha256.hexdigest(), extension)
+
+    @property
+    def sha256(self) -> str:
+        return self._sha256.hexdigest()
+
+    async def abort(self):
+        """Drop the partial file"""
+        def discard():
+            self._file.close()
+            self.path.unlink(missing_ok=True)
+        await anyio.to_thread.run_sync(discard)
+
+
+class _TrackPartParser:
+    """
+    Incremental multipart/form-data parser that picks out the "file" part.
+    Parser callbacks only record events; they are applied asynchronously
+    after each chunk so that writes can be awaited.
+    """
+
+    def __init__(self, boundary: bytes):
+        self.events: List[Tuple[str, Any]] = []
+        self._header_field = b""
+        self._header_value = b""
+        self._headers: Dict[bytes, bytes] = {}
+        self._in_file = False
+        self._seen_file = False
+        self.parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        # Only the first file part named "file" is stored
+        self._in_file = (
+            not self._seen_file and options.get(b"name") == b"file" and b"filename" in options
+        )
+        if self._in_file:
+            self._seen_file = True
+            self.events.append(("file", options[b"filename"].decode("utf-8", "replace")))
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_file:
+            self.events.append(("data", data[start:end]))
+
+    def _on_part_end(self):
+        if self._in_file:
+            self.events.append(("end", None))
+        self._in_file = False
+
+
+async def receive_track_upload(
+    request: Request,
+    store: Path,
+    allowed_extensions: List[str],
+    max_bytes: int = MAX_AUDIO_BYTES,
+    timeout: float = UPLOAD_TIMEOUT_SECONDS
+) -> Dict[str, Any]:
+    """
+    Stream the "file" part of a multipart upload into the content-addressed
+    store without buffering it in memory or in a spooled temp file.
+
+    Raises:
+        HTTPException: 400 for a malformed upload or file type, 413 above
+            max_bytes, 408 when the upload takes longer than timeout seconds
+
+    Returns:
+        Dict with filename (in the store), original_filename, size, sha256
+        and created (False when identical content was already stored)
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + 64 * 1024:
+        raise HTTPException(status_code=413, detail=f"Audio file exceeds the {max_bytes // (1024 * 1024)} MB limit")
+
+    parts = _TrackPartParser(boundary)
+    state: Dict[str, Any] = {"writer": None, "filename": None, "extension": None, "complete": False}
+
+    async def apply_events():
+        for event, value in parts.events:
+            if event == "file":
+                extension = Path(value).suffix.lower()
+                if extension not in allowed_extensions:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Invalid file type. Allowed types: {', '.join(allowed_extensions)}"
+                    )
+                state["filename"], state["extension"] = value, extension
+                state["writer"] = await anyio.to_thread.run_sync(TrackWriter, store, max_bytes)
+            elif event == "data":
+                await state["writer"].write(value)
+            elif event == "end":
+                state["complete"] = True
+        parts.events.clear()
+
+    async def receive():
+        try:
+            async for chunk in request.stream():
+                parts.parser.write(chunk)
+                await apply_events()
+            parts.parser.finalize()
+        except MultipartParseError as e:
+            raise HTTPException(status_code=400, detail=f"Malformed upload: {e}")
+        await apply_events()
+
+    try:
+        try:
+            await asyncio.wait_for(receive(), timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=408, detail=f"Upload took longer than {timeout:.0f} seconds")
+
+        writer: Optional[TrackWriter] = state["writer"]
+        if writer is None or not state["complete"]:
+            raise HTTPException(status_code=400, detail="No complete audio file in the upload")
+        if writer.size == 0:
+            raise HTTPException(status_code=400, detail="The uploaded audio file is empty")
+
+        filename, created = await writer.commit(state["extension"])
+    except BaseException:
+        if state["writer"] is not None:
+            await asyncio.shield(state["writer"].abort())
+        raise
+
+    return {
+        "filename": filename,
+        "original_filename": state["filename"],
+        "size": writer.size,
+        "sha256": writer.sha256,
+        "created": created,
+    }
+
+
+class UploadNotFound(Exception):
+    pass
+
+
+class OffsetMismatch(Exception):
+    def __init__(self, offset: int):
+        super().__init__(f"Upload is at offset {offset}")
+        self.offset = offset
+
+
+class UploadBusy(Exception):
+    """Another request (in any API process) is working on the upload"""
+
+
+class ResumableUploads:
+    """
+    tus-style resumable uploads into the content-addressed store.
+
+    create() preallocates <id>.part in the store's upload directory and
+    records the upload in <id>.json. Each append() must start at the
+    current offset; its body is written in place with pwrite as it arrives
+    and the offset is persisted afterwards, so an interrupted request keeps
+    every byte that reached the disk and the client resumes from offset().
+    finish() links the completed file into the store without copying it.
+    Requests on one upload are serialized with an exclusive flock on its
+    .part file, so concurrent requests from any process are refused with
+    UploadBusy instead of writing the same offset twice.
+
+    The SHA-256 is computed on the fly while appends arrive in order in
+    this process; after a restart (or if another process took appends) it
+    is computed from the file at finish(). Uploads untouched for
+    expiry_seconds are deleted by collect_garbage(), which also removes
+    partial files of interrupted single-request uploads.
+    """
+
+    def __init__(
+        self,
+        store: Path,
+        allowed_extensions: List[str],
+        max_bytes: int = MAX_AUDIO_BYTES,
+        expiry_seconds: float = 24 * 3600,
+        gc_interval: float = 3600
+    ):
+        self.store = store
+        self.directory = upload_dir(store)
+        self.allowed_extensions = allowed_extensions
+        self.max_bytes = max_bytes
+        self.expiry_seconds = expiry_seconds
+        self.gc_interval = gc_interval
+        # upload id -> (offset the hash covers, running hash)
+        self._hashes: Dict[str, Tuple[int, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _paths(self, upload_id: str) -> Tuple[Path, Path]:
+        if not upload_id or not all(c in "0123456789abcdef-" for c in upload_id):
+            raise UploadNotFound(upload_id)
+        return self.directory / f"{upload_id}.part", self.directory / f"{upload_id}.json"
+
+    def _read_meta(self, upload_id: str) -> Dict[str, Any]:
+        _, meta_path = self._paths(upload_id)
+        try:
+            with open(meta_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            raise UploadNotFound(upload_id)
+
+    def _write_meta(self, meta: Dict[str, Any]):
+        _, meta_path = self._paths(meta["id"])
+        partial = meta_path.with_name(meta_path.name + ".tmp")
+        meta["updated_at"] = time.time()
+        with open(partial, "w") as f:
+            json.dump(meta, f)
+        os.replace(partial, meta_path)
+
+    @contextlib.asynccontextmanager
+    async def _locked(self, upload_id: str) -> AsyncIterator[int]:
+        """
+        Hold the upload's lock and yield a read-write descriptor of its
+        .part file. The lock is a flock on that file rather than on the
+        .json record, which _write_meta() replaces on every update.
+
+        Raises:
+            UploadNotFound: Unknown or expired upload
+            UploadBusy: The lock is held by another request
+        """
+        part_path, _ = self._paths(upload_id)
+
+        def acquire() -> int:
+            try:
+                fd = os.open(part_path, os.O_RDWR)
+            except FileNotFoundError:
+                raise UploadNotFound(upload_id)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                raise UploadBusy(upload_id)
+            return fd
+
+        fd = await anyio.to_thread.run_sync(acquire)
+        try:
+            yield fd
+        finally:
+            # Closing the descriptor releases the lock
+            await asyncio.shield(anyio.to_thread.run_sync(os.close, fd))
+
+    async def create(self, filename: str, size: int) -> Dict[str, Any]:
+        """
+        Register an upload of `size` bytes and preallocate its file.
+
+        Raises:
+            HTTPException: 400 for a file type outside allowed_extensions or
+                an empty file, 413 above max_bytes
+        """
+        extension = Path(filename).suffix.lower()
+        if extension not in self.allowed_extensions:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid file type. Allowed types: {', '.join(self.allowed_extensions)}"
+            )
+        if size <= 0:
+            raise HTTPException(status_code=400, detail="The uploaded audio file is empty")
+        if size > self.max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Audio file exceeds the {self.max_bytes // (1024 * 1024)} MB limit"
+            )
+
+        meta = {
+            "id": str(uuid.uuid4()),
+            "filename": filename,
+            "extension": extension,
+            "size": size,
+            "offset": 0,
+            "created_at": time.time(),
+        }
+
+        def preallocate():
+            part_path, _ = self._paths(meta["id"])
+            fd = os.open(part_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+            try:
+                try:
+                    os.posix_fallocate(fd, 0, size)
+                except (AttributeError, OSError):
+                    # No fallocate on this platform/filesystem: a sparse file will do
+                    os.ftruncate(fd, size)
+            finally:
+                os.close(fd)
+            self._write_meta(meta)
+
+        await anyio.to_thread.run_sync(preallocate)
+        self._hashes[meta["id"]] = (0, hashlib.sha256())
+        return meta
+
+    async def status(self, upload_id: str) -> Dict[str, Any]:
+        return await anyio.to_thread.run_sync(self._read_meta, upload_id)
+
+    async def append(self, upload_id: str, offset: int, request: Request) -> Dict[str, Any]:
+        """
+        Write the request body at `offset`, which must be the upload's
+        current offset.
+
+        Raises:
+            UploadNotFound: Unknown or expired upload
+            UploadBusy: Another request is writing the upload
+            OffsetMismatch: offset is not the current offset
+            HTTPException: 413 when the body runs past the declared size
+        """
+        async with self._locked(upload_id) as fd:
+            meta = await anyio.to_thread.run_sync(self._read_meta, upload_id)
+            if offset != meta["offset"]:
+                raise OffsetMismatch(meta["offset"])
+
+            hashed = self._hashes.get(upload_id)
+            hasher = hashed[1] if hashed and hashed[0] == offset else None
+            position = offset
+            buffer = bytearray()
+
+            def write_block(block: bytes, at: int):
+                view = memoryview(block)
+                while view:
+                    written = os.pwrite(fd, view, at)
+                    view = view[written:]
+                    at += written
+                if hasher is not None:
+                    hasher.update(block)
+
+            async def flush():
+                nonlocal position
+                if buffer:
+                    block = bytes(buffer)
+                    buffer.clear()
+                    await anyio.to_thread.run_sync(write_block, block, position)
+                    position += len(block)
+
+            try:
+                async for chunk in request.stream():
+                    if position + len(buffer) + len(chunk) > meta["size"]:
+                        raise HTTPException(status_code=413, detail="Chunk runs past the declared upload length")
+                    buffer += chunk
+                    if len(buffer) >= WRITE_BUFFER_BYTES:
+                        await flush()
+                await flush()
+            finally:
+                # Keep whatever reached the disk, even if the client went away
+                meta["offset"] = position
+                await asyncio.shield(anyio.to_thread.run_sync(self._write_meta, meta))
+                if hasher is not None:
+                    self._hashes[upload_id] = (position, hasher)
+                else:
+                    self._hashes.pop(upload_id, None)
+            return meta
+
+    async def finish(self, upload_id: str) -> Dict[str, Any]:
+        """
+        Move a complete upload into the store.
+
+        Raises:
+            UploadNotFound: Unknown or expired upload
+            UploadBusy: Another request is working on the upload
+            OffsetMismatch: Not all bytes have been received yet
+
+        Returns:
+            Same fields as receive_track_upload()
+        """
+        async with self._locked(upload_id):
+            meta = await anyio.to_thread.run_sync(self._read_meta, upload_id)
+            if meta["offset"] != meta["size"]:
+                raise OffsetMismatch(meta["offset"])
+
+            part_path, meta_path = self._paths(upload_id)
+            hashed = self._hashes.pop(upload_id, None)
+
+            def commit() -> Tuple[str, bool, str]:
+                if hashed and hashed[0] == meta["size"]:
+                    digest = hashed[1].hexdigest()
+                else:
+                    hasher = hashlib.sha256()
+                    with open(part_path, "rb") as f:
+                        for block in iter(lambda: f.read(WRITE_BUFFER_BYTES), b""):
+                            hasher.update(block)
+                    digest = hasher.hexdigest()
+                filename, created = store_by_hash(self.store, part_path, digest, meta["extension"])
+                meta_path.unlink(missing_ok=True)
+                return filename, created, digest
+
+            filename, created, digest = await anyio.to_thread.run_sync(commit)
+        return {
+            "filename": filename,
+            "original_filename": meta["filename"],
+            "size": meta["size"],
+            "sha256": digest,
+            "created": created,
+        }
+
+    async def cancel(self, upload_id: str):
+        """Delete an upload and its partial file"""
+        async with self._locked(upload_id):
+            part_path, meta_path = self._paths(upload_id)
+            await anyio.to_thread.run_sync(self._read_meta, upload_id)
+
+            def remove():
+                part_path.unlink(missing_ok=True)
+                meta_path.unlink(missing_ok=True)
+
+            await anyio.to_thread.run_sync(remove)
+        self._hashes.pop(upload_id, None)
+
+    def _collect_garbage(self) -> int:
+        cutoff = time.time() - self.expiry_seconds
+        removed = 0
+        for path in self.directory.iterdir():
+            try:
+                if path.suffix == ".json":
+                    with open(path) as f:
+                        touched = json.load(f).get("updated_at", 0)
+                else:
+                    touched = path.stat().st_mtime
+                # Resumable .part files are owned by their .json record
+                if path.suffix == ".part" and path.with_suffix(".json").exists():
+                    continue
+            except (FileNotFoundError, ValueError):
+                continue
+            if touched < cutoff:
+                path.unlink(missing_ok=True)
+                if path.suffix == ".json":
+                    path.with_suffix(".part").unlink(missing_ok=True)
+                    self._hashes.pop(path.stem, None)
+                removed += 1
+        return removed
+
+    async def collect_garbage(self) -> int:
+        """Delete uploads untouched for expiry_seconds; returns the number removed"""
+        return await anyio.to_thread.run_sync(self._collect_garbage)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._gc_loop())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _gc_loop(self):
+        while True:
+            try:
+                removed = await self.collect_garbage()
+                if removed:
+                    logger.info(f"Removed {removed} abandoned audio upload(s)")
+            except Exception as e:
+                logger.warning(f"Audio upload cleanup failed: {e}")
+            await asyncio.sleep(self.gc_interval)
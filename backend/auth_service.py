@@ -1,43 +1,325 @@
 """
 Authentication service for Emergent Google OAuth integration
 """
+import asyncio
+import logging
+import os
+import random
+import time
+import uuid
 import httpx
+import jwt
 from datetime import datetime, timezone, timedelta
-from typing import Optional, Dict
+from typing import Optional, Dict, Set, Tuple
 from fastapi import Cookie, HTTPException, Request
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
+logger = logging.getLogger(__name__)
+
+
+def _as_utc(value) -> datetime:
+    """Session expiry as an aware datetime (native dates come back naive; old rows hold ISO strings)"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class SessionUserCache:
+    """
+    In-process session token -> user cache.
+    
+    Entries live for at most ttl_seconds and never past their session's
+    expiry. Logout, login and profile or account changes made through this
+    process invalidate immediately; changes made by another API process are
+    picked up once the entry's TTL runs out.
+    """
+    
+    def __init__(self, ttl_seconds: float = 60, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple[float, datetime, Dict]] = {}
+        self._tokens_by_user: Dict[str, Set[str]] = {}
+    
+    def get(self, token: str) -> Optional[Dict]:
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        stored_at, expires_at, user = entry
+        if time.monotonic() - stored_at > self.ttl_seconds or expires_at < datetime.now(timezone.utc):
+            self.invalidate_token(token)
+            return None
+        return dict(user)
+    
+    def put(self, token: str, expires_at: datetime, user: Dict):
+        if len(self._entries) >= self.max_entries:
+            self.clear()
+        self._entries[token] = (time.monotonic(), expires_at, user)
+        self._tokens_by_user.setdefault(user["id"], set()).add(token)
+    
+    def invalidate_token(self, token: str):
+        entry = self._entries.pop(token, None)
+        if entry is not None:
+            tokens = self._tokens_by_user.get(entry[2]["id"])
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self._tokens_by_user[entry[2]["id"]]
+    
+    def invalidate_user(self, user_id: str):
+        for token in self._tokens_by_user.pop(user_id, set()):
+            self._entries.pop(token, None)
+    
+    def clear(self):
+        self._entries.clear()
+        self._tokens_by_user.clear()
+
+
+class RevocationList:
+    """
+    Revoked signed session tokens (by token id) and users (all their tokens).
+    
+    Rows are written to revoked_sessions only on logout and account deletion
+    and expire with the tokens they cover. Every API process keeps the whole
+    list in memory and re-reads it every refresh_interval seconds, so
+    verifying a token never touches the database.
+    """
+    
+    def __init__(self, refresh_interval: float = 30):
+        self.refresh_interval = refresh_interval
+        self.token_ids: Set[str] = set()
+        self.user_ids: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+    
+    def is_revoked(self, claims: Dict) -> bool:
+        return claims.get("jti") in self.token_ids or claims.get("sub") in self.user_ids
+    
+    async def revoke(
+        self,
+        db: AsyncIOMotorDatabase,
+        expires_at: datetime,
+        token_id: Optional[str] = None,
+        user_id: Optional[str] = None
+    ):
+        """Revoke one token or every token of a user until expires_at"""
+        await db.revoked_sessions.insert_one({
+            "token_id": token_id,
+            "user_id": user_id,
+            "revoked_at": datetime.now(timezone.utc),
+            "expires_at": expires_at,
+        })
+        if token_id:
+            self.token_ids.add(token_id)
+        if user_id:
+            self.user_ids.add(user_id)
+    
+    async def refresh(self, db: AsyncIOMotorDatabase):
+        token_ids, user_ids = set(), set()
+        async for row in db.revoked_sessions.find(
+            {"expires_at": {"$gt": datetime.now(timezone.utc)}}, {"_id": 0, "token_id": 1, "user_id": 1}
+        ):
+            if row.get("token_id"):
+                token_ids.add(row["token_id"])
+            if row.get("user_id"):
+                user_ids.add(row["user_id"])
+        self.token_ids, self.user_ids = token_ids, user_ids
+    
+    def start(self, db: AsyncIOMotorDatabase):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_loop(db))
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+    
+    async def _refresh_loop(self, db: AsyncIOMotorDatabase):
+        while True:
+            try:
+                await self.refresh(db)
+            except Exception as e:
+                logger.warning(f"Session revocation refresh failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:  # Optional dependency: the session exchange falls back to HTTP/1.1 keep-alive
+    HTTP2_AVAILABLE = False
+
 
 class AuthService:
     """Handle authentication using Emergent OAuth"""
     
-    EMERGENT_SESSION_API = "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data"
+    # Overridable so logins can be benchmarked against scripts/stub_session_api.py
+    EMERGENT_SESSION_API = os.environ.get(
+        "EMERGENT_SESSION_API", "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data"
+    )
     SESSION_EXPIRY_DAYS = 7
     
+    # Session exchange client: one pooled connection set shared by all logins
+    SESSION_EXCHANGE_TIMEOUT_SECONDS = float(os.environ.get("SESSION_EXCHANGE_TIMEOUT_SECONDS", "10"))
+    SESSION_EXCHANGE_CONCURRENCY = int(os.environ.get("SESSION_EXCHANGE_CONCURRENCY", "32"))
+    SESSION_EXCHANGE_RETRIES = int(os.environ.get("SESSION_EXCHANGE_RETRIES", "2"))
+    _http_client: Optional[httpx.AsyncClient] = None
+    _exchange_slots: Optional[asyncio.Semaphore] = None
+    session_cache = SessionUserCache(ttl_seconds=float(os.environ.get("SESSION_CACHE_TTL_SECONDS", "60")))
+    
+    # AUTH_SESSION_MODE=jwt issues signed, short-lived session tokens that are
+    # verified without a database read; "database" keeps Emergent session rows
+    SESSION_MODE = os.environ.get("AUTH_SESSION_MODE", "database")
+    SESSION_JWT_SECRET = os.environ.get("SESSION_JWT_SECRET", "")
+    SESSION_JWT_ALGORITHM = "HS256"
+    SESSION_JWT_TTL_MINUTES = int(os.environ.get("SESSION_JWT_TTL_MINUTES", "60"))
+    revocations = RevocationList(refresh_interval=float(os.environ.get("SESSION_REVOCATION_REFRESH_SECONDS", "30")))
+    
+    @staticmethod
+    def uses_signed_tokens() -> bool:
+        """Whether logins issue signed session tokens (AUTH_SESSION_MODE=jwt)"""
+        if AuthService.SESSION_MODE != "jwt":
+            return False
+        if not AuthService.SESSION_JWT_SECRET:
+            raise RuntimeError("AUTH_SESSION_MODE=jwt requires SESSION_JWT_SECRET")
+        return True
+    
+    @staticmethod
+    def issue_session_token(user: Dict, is_admin: bool = False) -> str:
+        """
+        Sign a session token carrying the student id, email, name and admin flag
+        
+        Args:
+            user: Student document
+            is_admin: Whether the student is an admin
+            
+        Returns:
+            Encoded token, valid for SESSION_JWT_TTL_MINUTES
+        """
+        now = datetime.now(timezone.utc)
+        claims = {
+            "sub": user["id"],
+            "email": user.get("email", ""),
+            "name": user.get("full_name", ""),
+            "adm": is_admin,
+            "iat": now,
+            "exp": now + timedelta(minutes=AuthService.SESSION_JWT_TTL_MINUTES),
+            "jti": str(uuid.uuid4()),
+        }
+        return jwt.encode(claims, AuthService.SESSION_JWT_SECRET, algorithm=AuthService.SESSION_JWT_ALGORITHM)
+    
+    @staticmethod
+    def verify_session_token(token: str) -> Optional[Dict]:
+        """Claims of a valid, unrevoked signed session token, None otherwise"""
+        try:
+            claims = jwt.decode(
+                token,
+                AuthService.SESSION_JWT_SECRET,
+                algorithms=[AuthService.SESSION_JWT_ALGORITHM],
+                options={"require": ["sub", "exp", "iat", "jti"]}
+            )
+        except jwt.InvalidTokenError:
+            return None
+        if AuthService.revocations.is_revoked(claims):
+            return None
+        return claims
+    
+    @staticmethod
+    def _is_signed_token(token: str) -> bool:
+        return AuthService.SESSION_MODE == "jwt" and token.count(".") == 2
+    
+    @staticmethod
+    async def revoke_session_token(db: AsyncIOMotorDatabase, token: str):
+        """Revoke a signed session token (logout); ignores anything that is not one"""
+        try:
+            claims = jwt.decode(
+                token,
+                AuthService.SESSION_JWT_SECRET,
+                algorithms=[AuthService.SESSION_JWT_ALGORITHM],
+                options={"verify_exp": False}
+            )
+        except jwt.InvalidTokenError:
+            return
+        expires_at = datetime.fromtimestamp(claims["exp"], timezone.utc)
+        if expires_at > datetime.now(timezone.utc):
+            await AuthService.revocations.revoke(db, expires_at, token_id=claims.get("jti"))
+    
+    @staticmethod
+    async def revoke_user_tokens(db: AsyncIOMotorDatabase, user_id: str):
+        """Revoke every signed session token of a user (account deletion)"""
+        expires_at = datetime.now(timezone.utc) + timedelta(minutes=AuthService.SESSION_JWT_TTL_MINUTES)
+        await AuthService.revocations.revoke(db, expires_at, user_id=user_id)
+    
+    @staticmethod
+    def start_http_client():
+        """Create the pooled session exchange client (called at app startup)"""
+        if AuthService._http_client is not None:
+            return
+        concurrency = AuthService.SESSION_EXCHANGE_CONCURRENCY
+        AuthService._http_client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(AuthService.SESSION_EXCHANGE_TIMEOUT_SECONDS, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=concurrency,
+                max_keepalive_connections=concurrency,
+                keepalive_expiry=60
+            )
+        )
+        AuthService._exchange_slots = asyncio.Semaphore(concurrency)
+    
+    @staticmethod
+    async def close_http_client():
+        """Close the pooled session exchange client (called at app shutdown)"""
+        client, AuthService._http_client = AuthService._http_client, None
+        AuthService._exchange_slots = None
+        if client is not None:
+            await client.aclose()
+    
     @staticmethod
     async def exchange_session_id(session_id: str) -> Dict:
         """
         Exchange session_id for user data and session_token
         
+        Uses the pooled client, so logins reuse open connections instead of
+        a TCP and TLS handshake each. At most SESSION_EXCHANGE_CONCURRENCY
+        exchanges run at once; timeouts, connection errors, 429 and 5xx
+        responses are retried with jittered exponential backoff.
+        
         Args:
             session_id: Temporary session ID from URL fragment
             
         Returns:
             Dict with user data and session_token
         """
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                AuthService.EMERGENT_SESSION_API,
-                headers={"X-Session-ID": session_id}
-            )
-            
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=401,
-                    detail="Invalid or expired session ID"
-                )
-            
-            return response.json()
+        if AuthService._http_client is None:
+            AuthService.start_http_client()
+        
+        attempts = AuthService.SESSION_EXCHANGE_RETRIES + 1
+        async with AuthService._exchange_slots:
+            for attempt in range(attempts):
+                last_attempt = attempt == attempts - 1
+                try:
+                    response = await AuthService._http_client.get(
+                        AuthService.EMERGENT_SESSION_API,
+                        headers={"X-Session-ID": session_id}
+                    )
+                except httpx.TransportError as e:
+                    if last_attempt:
+                        logger.error(f"Session exchange failed: {e!r}")
+                        raise HTTPException(status_code=503, detail="Authentication service unavailable")
+                else:
+                    if response.status_code == 200:
+                        return response.json()
+                    if response.status_code != 429 and response.status_code < 500:
+                        raise HTTPException(
+                            status_code=401,
+                            detail="Invalid or expired session ID"
+                        )
+                    if last_attempt:
+                        raise HTTPException(status_code=503, detail="Authentication service unavailable")
+                
+                await asyncio.sleep(random.uniform(0, 0.2 * 2 ** attempt))
     
     @staticmethod
     async def create_session(db: AsyncIOMotorDatabase, user_id: str, session_token: str) -> Dict:
@@ -58,15 +340,18 @@ class AuthService:
             "user_id": user_id,
             "session_token": session_token,
             "created_at": datetime.now(timezone.utc).isoformat(),
-            "expires_at": expires_at.isoformat()
+            # Native date so the sessions TTL index reaps expired rows
+            "expires_at": expires_at
         }
         
-        # Upsert session (update if exists, insert if not)
+        # Upsert session (update if exists, insert if not); this replaces the
+        # user's previous token, so its cached lookups must go too
         await db.sessions.update_one(
             {"user_id": user_id},
             {"$set": session},
             upsert=True
         )
+        AuthService.session_cache.invalidate_user(user_id)
         
         return session
     
@@ -87,13 +372,15 @@ class AuthService:
         if not session:
             return None
         
-        # Check if session has expired
-        expires_at = datetime.fromisoformat(session["expires_at"])
+        # Check if session has expired (the TTL index removes expired rows
+        # within about a minute; only legacy ISO-string rows need deleting here)
+        expires_at = _as_utc(session["expires_at"])
         if expires_at < datetime.now(timezone.utc):
-            # Delete expired session
-            await db.sessions.delete_one({"session_token": session_token})
+            if isinstance(session["expires_at"], str):
+                await db.sessions.delete_one({"session_token": session_token})
             return None
         
+        session["expires_at"] = expires_at
         return session
     
     @staticmethod
@@ -106,6 +393,12 @@ class AuthService:
             session_token: Session token to delete
         """
         await db.sessions.delete_one({"session_token": session_token})
+        AuthService.session_cache.invalidate_token(session_token)
+    
+    @staticmethod
+    def invalidate_user(user_id: str):
+        """Drop cached lookups of a user after their profile or account changed"""
+        AuthService.session_cache.invalidate_user(user_id)
     
     @staticmethod
     async def get_current_user(request: Request, db: AsyncIOMotorDatabase, session_token: Optional[str] = Cookie(None)) -> Optional[Dict]:
@@ -132,6 +425,30 @@ class AuthService:
         if not token:
             return None
         
+        if AuthService._is_signed_token(token):
+            claims = AuthService.verify_session_token(token)
+            if not claims:
+                return None
+            # Past half its lifetime: hand a fresh token to the cookie middleware
+            remaining = claims["exp"] - time.time()
+            if remaining < AuthService.SESSION_JWT_TTL_MINUTES * 30:
+                request.state.refreshed_session_token = AuthService.issue_session_token(
+                    {"id": claims["sub"], "email": claims.get("email"), "full_name": claims.get("name")},
+                    claims.get("adm", False)
+                )
+            # Carries only what the token holds; use get_current_student for the full profile
+            return {
+                "id": claims["sub"],
+                "email": claims.get("email", ""),
+                "full_name": claims.get("name", ""),
+                "is_admin": claims.get("adm", False),
+                "from_token": True,
+            }
+        
+        cached_user = AuthService.session_cache.get(token)
+        if cached_user is not None:
+            return cached_user
+        
         # Get session
         session = await AuthService.get_session(db, token)
         if not session:
@@ -139,6 +456,20 @@ class AuthService:
         
         # Get user from database
         user = await db.students.find_one({"id": session["user_id"]})
+        if user:
+            AuthService.session_cache.put(token, session["expires_at"], user)
+            return dict(user)
+        return user
+    
+    @staticmethod
+    async def get_current_student(request: Request, db: AsyncIOMotorDatabase, session_token: Optional[str] = Cookie(None)) -> Optional[Dict]:
+        """
+        Like get_current_user, but always returns the full student document
+        (signed tokens only carry id, email, name and the admin flag)
+        """
+        user = await AuthService.get_current_user(request, db, session_token)
+        if user and user.get("from_token"):
+            return await db.students.find_one({"id": user["id"]})
         return user
     
     @staticmethod
@@ -3,13 +3,18 @@ Auto Import Handler for IELTS Tests
 Automatically detects question types and creates tests from JSON uploads
 """
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, Depends
+from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, Request
 from typing import Dict, List, Any, Optional
 import json
+import logging
 import uuid
 from datetime import datetime, timezone
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
+from ai_import_service import supports_transactions
+from bulk_import import bulk_import_response
+from exam_cache import invalidate_exam_cache
+
 from new_question_type_schemas import (
     QUESTION_TYPE_SCHEMAS,
     detect_question_type,
@@ -19,6 +24,7 @@ from new_question_type_schemas import (
 )
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
 def generate_id():
@@ -46,6 +52,13 @@ class AutoImportHandler:
         """
         Main import function - processes JSON and creates test
         
+        The whole document is detected and validated in memory first; only
+        then are the exam (with its final question_count), sections and
+        questions written, with one insert_many per collection. The writes
+        run in a transaction where the deployment supports one; otherwise a
+        failed write is undone by deleting what was inserted. Either way a
+        failed import leaves no partial exam behind.
+        
         Args:
             json_data: Complete test JSON structure
             
@@ -68,66 +81,125 @@ class AutoImportHandler:
                 results["errors"].append("Invalid JSON structure. Must contain: title, test_type, sections")
                 return results
             
-            # Create exam
-            exam_id = await self._create_exam(json_data)
-            results["exam_id"] = exam_id
-            
-            # Process sections
-            sections = json_data.get("sections", [])
+            prepared = self.prepare_import(json_data, results)
+            if not prepared["questions"]:
+                results["errors"].append("No valid questions found; nothing was imported")
+                return results
             
-            for section_data in sections:
-                try:
-                    section_id = await self._create_section(exam_id, section_data)
-                    results["sections_created"] += 1
-                    
-                    # Process questions in this section
-                    questions = section_data.get("questions", [])
-                    
-                    for question_data in questions:
-                        try:
-                            question_result = await self._create_question_auto_detect(
-                                exam_id, 
-                                section_id, 
-                                question_data
-                            )
-                            
-                            if question_result["success"]:
-                                results["questions_created"] += 1
-                                q_type = question_result["detected_type"]
-                                results["questions_detected"][q_type] = \
-                                    results["questions_detected"].get(q_type, 0) + 1
-                            else:
-                                results["warnings"].append(
-                                    f"Question {question_data.get('index', '?')}: {question_result['error']}"
-                                )
-                        
-                        except Exception as e:
-                            results["warnings"].append(
-                                f"Error creating question {question_data.get('index', '?')}: {str(e)}"
-                            )
-                
-                except Exception as e:
-                    results["errors"].append(f"Error creating section: {str(e)}")
+            await self.write_import(prepared)
             
-            results["success"] = results["questions_created"] > 0
+            results["exam_id"] = prepared["exam"]["id"]
+            results["sections_created"] = len(prepared["sections"])
+            results["questions_created"] = len(prepared["questions"])
+            results["success"] = True
             
             return results
         
         except Exception as e:
             results["errors"].append(f"Import failed: {str(e)}")
             return results
+        
+        finally:
+            if results["exam_id"]:
+                invalidate_exam_cache(results["exam_id"])
+    
+    def prepare_import(self, json_data: Dict[str, Any], results: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Detect, validate and build every document of an import without writing
+        
+        Questions that cannot be detected or fail validation are skipped with a
+        warning; duplicate section or question ids are reported the way the
+        database would have rejected them.
+        
+        Args:
+            json_data: Complete test JSON structure
+            results: Import results; warnings, errors and detected types are added
+            
+        Returns:
+            Dict with the "exam" document and "sections" and "questions" lists
+        """
+        exam = self._build_exam(json_data)
+        sections: List[Dict[str, Any]] = []
+        questions: List[Dict[str, Any]] = []
+        section_ids = set()
+        question_ids = set()
+        
+        for section_data in json_data.get("sections", []):
+            section = self._build_section(exam["id"], section_data)
+            if section["id"] in section_ids:
+                results["errors"].append(f"Error creating section: duplicate section id {section['id']}")
+                continue
+            section_ids.add(section["id"])
+            sections.append(section)
+            
+            for question_data in section_data.get("questions", []):
+                question_result = self._build_question_auto_detect(exam["id"], section["id"], question_data)
+                if not question_result["success"]:
+                    results["warnings"].append(
+                        f"Question {question_data.get('index', '?')}: {question_result['error']}"
+                    )
+                    continue
+                
+                question = question_result["question"]
+                if question["id"] in question_ids:
+                    results["warnings"].append(
+                        f"Error creating question {question_data.get('index', '?')}: duplicate question id {question['id']}"
+                    )
+                    continue
+                question_ids.add(question["id"])
+                questions.append(question)
+                
+                q_type = question_result["detected_type"]
+                results["questions_detected"][q_type] = results["questions_detected"].get(q_type, 0) + 1
+        
+        exam["question_count"] = len(questions)
+        return {"exam": exam, "sections": sections, "questions": questions}
+    
+    async def write_import(self, prepared: Dict[str, Any]):
+        """Write a prepared import atomically (transaction, or compensating deletes)"""
+        exam = prepared["exam"]
+        
+        async def write(session):
+            await self.db.exams.insert_one(exam, session=session)
+            if prepared["sections"]:
+                await self.db.sections.insert_many(prepared["sections"], ordered=True, session=session)
+            await self.db.questions.insert_many(prepared["questions"], ordered=True, session=session)
+        
+        if await supports_transactions(self.db):
+            async with await self.db.client.start_session() as session:
+                await session.with_transaction(write)
+            return
+        
+        # Nothing to undo if the exam itself is rejected (e.g. its id already exists)
+        await self.db.exams.insert_one(exam)
+        try:
+            if prepared["sections"]:
+                await self.db.sections.insert_many(prepared["sections"], ordered=True)
+            await self.db.questions.insert_many(prepared["questions"], ordered=True)
+        except Exception:
+            await self._rollback(exam["id"], prepared)
+            raise
+    
+    async def _rollback(self, exam_id: str, prepared: Dict[str, Any]):
+        """Delete the documents of a failed non-transactional import"""
+        try:
+            await self.db.questions.delete_many({"_id": {"$in": [q["_id"] for q in prepared["questions"]]}})
+            await self.db.sections.delete_many({"_id": {"$in": [s["_id"] for s in prepared["sections"]]}})
+            await self.db.exams.delete_one({"_id": exam_id})
+        except Exception as e:
+            logger.error(f"Rollback of failed import {exam_id} failed: {e}")
     
     def _validate_basic_structure(self, json_data: Dict[str, Any]) -> bool:
         """Validate basic JSON structure"""
         required_fields = ["title", "test_type", "sections"]
         return all(field in json_data for field in required_fields)
     
-    async def _create_exam(self, json_data: Dict[str, Any]) -> str:
-        """Create exam from JSON data"""
+    def _build_exam(self, json_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Build exam document from JSON data"""
         exam_id = json_data.get("id") or generate_id()
         now = get_timestamp()
         
-        exam_data = {
+        return {
             "id": exam_id,
             "_id": exam_id,
             "title": json_data.get("title"),
@@ -140,23 +212,21 @@ class AutoImportHandler:
             "published": json_data.get("published", True),
             "created_at": now,
             "updated_at": now,
+            "status_updated_at": now,
             "is_demo": False,
-            "question_count": 0,  # Will be updated
+            "question_count": 0,  # Set once all questions are validated
             "submission_count": 0,
             "is_active": False,
             "started_at": None,
             "stopped_at": None,
             "is_visible": True,
         }
-        
-        await self.db.exams.insert_one(exam_data)
-        return exam_id
     
-    async def _create_section(self, exam_id: str, section_data: Dict[str, Any]) -> str:
-        """Create section from JSON data"""
+    def _build_section(self, exam_id: str, section_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Build section document from JSON data"""
         section_id = section_data.get("id") or f"{exam_id}-section-{section_data.get('index', 1)}"
         
-        section = {
+        return {
             "id": section_id,
             "_id": section_id,
             "exam_id": exam_id,
@@ -165,25 +235,22 @@ class AutoImportHandler:
             "passage_text": section_data.get("passage_text"),  # For reading
             "instructions": section_data.get("instructions"),
         }
-        
-        await self.db.sections.insert_one(section)
-        return section_id
     
-    async def _create_question_auto_detect(
+    def _build_question_auto_detect(
         self, 
         exam_id: str, 
         section_id: str, 
         question_data: Dict[str, Any]
     ) -> Dict[str, Any]:
         """
-        Create question with automatic type detection
+        Build question document with automatic type detection
         
-        Returns dict with success status and detected type
+        Returns dict with success status, detected type and the document
         """
         result = {
             "success": False,
             "detected_type": None,
-            "question_id": None,
+            "question": None,
             "error": None
         }
         
@@ -204,16 +271,8 @@ class AutoImportHandler:
                 result["error"] = f"Validation failed: {', '.join(errors)}"
                 return result
             
-            # Create question
-            question_id = await self._create_question(
-                exam_id, 
-                section_id, 
-                detected_type, 
-                question_data
-            )
-            
+            result["question"] = self._build_question(exam_id, section_id, detected_type, question_data)
             result["success"] = True
-            result["question_id"] = question_id
             
             return result
         
@@ -221,20 +280,20 @@ class AutoImportHandler:
             result["error"] = str(e)
             return result
     
-    async def _create_question(
+    def _build_question(
         self, 
         exam_id: str, 
         section_id: str, 
         question_type: str, 
         question_data: Dict[str, Any]
-    ) -> str:
-        """Create question in database"""
+    ) -> Dict[str, Any]:
+        """Build question document"""
         question_id = question_data.get("id") or f"{exam_id}-q{question_data.get('index', 1)}"
         
         # Build payload based on question type
         payload = self._build_payload(question_type, question_data)
         
-        question = {
+        return {
             "id": question_id,
             "_id": question_id,
             "exam_id": exam_id,
@@ -246,16 +305,6 @@ class AutoImportHandler:
             "created_by": "auto_import",
             "is_demo": False,
         }
-        
-        await self.db.questions.insert_one(question)
-        
-        # Update exam question count
-        await self.db.exams.update_one(
-            {"id": exam_id},
-            {"$inc": {"question_count": 1}}
-        )
-        
-        return question_id
     
     def _build_payload(self, question_type: str, question_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -338,6 +387,21 @@ class AutoImportHandler:
 # API ENDPOINTS
 # ============================================
 
+def build_import_report(results: Dict[str, Any]) -> Dict[str, Any]:
+    """Import report returned to the client for one imported test"""
+    return {
+        "status": "success" if results["success"] else "failed",
+        "exam_id": results["exam_id"],
+        "summary": {
+            "sections_created": results["sections_created"],
+            "questions_created": results["questions_created"],
+            "questions_by_type": results["questions_detected"]
+        },
+        "errors": results["errors"],
+        "warnings": results["warnings"]
+    }
+
+
 # Database dependency function
 def get_db():
     """Get database instance - will be replaced when registered in main app"""
@@ -371,20 +435,7 @@ async def import_test_from_json(
         # Import
         results = await handler.import_from_json(json_data)
         
-        # Build response
-        response = {
-            "status": "success" if results["success"] else "failed",
-            "exam_id": results["exam_id"],
-            "summary": {
-                "sections_created": results["sections_created"],
-                "questions_created": results["questions_created"],
-                "questions_by_type": results["questions_detected"]
-            },
-            "errors": results["errors"],
-            "warnings": results["warnings"]
-        }
-        
-        return response
+        return build_import_report(results)
     
     except json.JSONDecodeError as e:
         raise HTTPException(status_code=400, detail=f"Invalid JSON file: {str(e)}")
@@ -392,6 +443,30 @@ async def import_test_from_json(
         raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
 
 
+@router.post("/api/admin/import-tests-bulk")
+async def import_tests_bulk(
+    request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Import many tests from one upload
+    
+    The request body is JSON Lines (one test per line) or a JSON array of
+    tests in the import-test-json format. Tests are parsed incrementally and
+    imported one at a time, each atomically; the response is NDJSON with one
+    import report per test as it completes, then a summary line.
+    """
+    handler = AutoImportHandler(db)
+    
+    async def import_one(json_data: Any) -> Dict[str, Any]:
+        if not isinstance(json_data, dict):
+            return {"status": "failed", "errors": ["Each test must be a JSON object"]}
+        results = await handler.import_from_json(json_data)
+        return {"title": json_data.get("title"), **build_import_report(results)}
+    
+    return await bulk_import_response(request, import_one)
+
+
 @router.post("/api/admin/validate-test-json")
 async def validate_test_json(
     file: UploadFile = File(...)
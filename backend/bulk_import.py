@@ -0,0 +1,201 @@
+"""
+Bulk Test Import
+Incremental parsing of multi-test uploads (JSON Lines or a JSON array)
+and the NDJSON progress stream returned while the tests are imported
+"""
+
+import asyncio
+import codecs
+import json
+import logging
+import os
+import tempfile
+from typing import Any, AsyncIterator, Awaitable, BinaryIO, Callable, Dict, Iterator
+
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+# Upload bytes kept in memory before the spooled body moves to a temp file
+SPOOL_MEMORY_BYTES = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.environ.get("BULK_IMPORT_MAX_BYTES", str(256 * 1024 * 1024)))
+# Largest single test accepted, in decoded characters
+MAX_DOCUMENT_CHARS = 16 * 1024 * 1024
+READ_CHUNK_BYTES = 64 * 1024
+
+_WHITESPACE = " \t\n\r"
+
+
+class BulkImportFormatError(ValueError):
+    """The upload is not a sequence of JSON tests or arrays of tests"""
+
+
+async def spool_request_body(request: Request, max_bytes: int = MAX_UPLOAD_BYTES) -> BinaryIO:
+    """
+    Copy the raw request body into a spooled temp file (memory up to
+    SPOOL_MEMORY_BYTES, disk beyond) and return it rewound.
+
+    The body has to be received before the streamed response starts:
+    Starlette reads the client connection for disconnects while a
+    StreamingResponse is running.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES, mode="w+b")
+    size = 0
+    try:
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+def iter_json_documents(
+    stream: BinaryIO,
+    chunk_size: int = READ_CHUNK_BYTES,
+    max_document_chars: int = MAX_DOCUMENT_CHARS
+) -> Iterator[Any]:
+    """
+    Yield the tests of an upload, reading the stream chunk by chunk.
+
+    The upload is a sequence of JSON values separated by whitespace: JSON
+    Lines, pretty-printed objects one after another, or JSON arrays, whose
+    items count as individual tests (so several files of either kind can
+    simply be concatenated).
+
+    Only the document being decoded is held in memory. A document that
+    does not decode with the data read so far is retried after reading
+    more (the read size grows with the pending text, so large documents
+    are not re-scanned once per chunk).
+
+    Raises:
+        BulkImportFormatError: Malformed JSON, or a document above max_document_chars
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    pos = 0
+    eof = False
+    in_array = False
+    expect_separator = False
+    count = 0
+
+    def read_more(min_chars: int) -> bool:
+        nonlocal buffer, pos, eof
+        if eof:
+            return False
+        data = stream.read(max(chunk_size, min_chars))
+        if not data:
+            eof = True
+            buffer = buffer[pos:] + utf8.decode(b"", final=True)
+        else:
+            buffer = buffer[pos:] + utf8.decode(data)
+        pos = 0
+        return True
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+            pos += 1
+        if pos >= len(buffer):
+            if read_more(0):
+                continue
+            if in_array:
+                raise BulkImportFormatError("Unexpected end of upload: JSON array is not closed")
+            return
+
+        char = buffer[pos]
+        if not in_array:
+            if char == "[":
+                # A top-level array contributes its items as tests
+                in_array = True
+                expect_separator = False
+                pos += 1
+                continue
+        elif char == "]":
+            in_array = False
+            pos += 1
+            continue
+        elif expect_separator:
+            if char != ",":
+                raise BulkImportFormatError(f"Expected ',' or ']' after test {count}")
+            expect_separator = False
+            pos += 1
+            continue
+
+        try:
+            document, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError as e:
+            pending = len(buffer) - pos
+            if pending > max_document_chars:
+                raise BulkImportFormatError(f"Test {count + 1} exceeds {max_document_chars} characters")
+            if read_more(pending):
+                continue
+            raise BulkImportFormatError(f"Invalid JSON in test {count + 1}: {e.msg}")
+
+        pos = end
+        count += 1
+        expect_separator = in_array
+        yield document
+
+
+def _ndjson(record: Dict[str, Any]) -> bytes:
+    return (json.dumps(record, default=str) + "\n").encode("utf-8")
+
+
+async def stream_import_results(
+    stream: BinaryIO,
+    import_one: Callable[[Any], Awaitable[Dict[str, Any]]]
+) -> AsyncIterator[bytes]:
+    """
+    Import the tests of an upload one at a time and yield one NDJSON line
+    per test, followed by a summary line.
+
+    import_one() returns the result record of one test and must include a
+    "status" of "success" or "failed". Each test is committed on its own:
+    a bad test is reported and skipped, and a malformed upload stops the
+    run after the tests decoded before the error. A test whose import has
+    started is completed even if the client disconnects meanwhile.
+    """
+    total = succeeded = 0
+    error = None
+    try:
+        for document in iter_json_documents(stream):
+            total += 1
+            try:
+                result = await asyncio.shield(import_one(document))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Bulk import of test {total} failed: {e}")
+                result = {"status": "failed", "errors": [str(e)]}
+            if result.get("status") == "success":
+                succeeded += 1
+            yield _ndjson({"position": total, **result})
+    except BulkImportFormatError as e:
+        error = str(e)
+    finally:
+        stream.close()
+
+    summary: Dict[str, Any] = {"total": total, "succeeded": succeeded, "failed": total - succeeded}
+    if error:
+        summary["error"] = error
+    yield _ndjson({"summary": summary})
+
+
+async def bulk_import_response(
+    request: Request,
+    import_one: Callable[[Any], Awaitable[Dict[str, Any]]]
+) -> StreamingResponse:
+    """Spool the upload and stream its per-test import results as NDJSON"""
+    stream = await spool_request_body(request)
+    return StreamingResponse(stream_import_results(stream, import_one), media_type="application/x-ndjson")
+
@@ -0,0 +1,233 @@
+"""
+Database Index Registry
+Declares every index the API relies on, reconciles them at startup and
+checks the query plans of the hot API queries
+"""
+
+import logging
+from typing import Any, Dict, List, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# INDEX REGISTRY
+# ============================================
+
+# collection -> list of {"keys": [(field, direction), ...], **index options}
+INDEX_REGISTRY: Dict[str, List[Dict[str, Any]]] = {
+    "exams": [
+        {"keys": [("id", 1)], "unique": True},
+        {"keys": [("published", 1), ("is_visible", 1)]},
+    ],
+    "sections": [
+        {"keys": [("id", 1)], "unique": True},
+        {"keys": [("exam_id", 1), ("index", 1)]},
+    ],
+    "questions": [
+        {"keys": [("id", 1)], "unique": True},
+        {"keys": [("section_id", 1), ("index", 1)]},
+        {"keys": [("exam_id", 1)]},
+    ],
+    "submissions": [
+        {"keys": [("id", 1)], "unique": True},
+        # One attempt per student per exam
+        {"keys": [("exam_id", 1), ("user_id_or_session", 1)], "unique": True},
+        {"keys": [("user_id_or_session", 1)]},
+        # Admin listing sorts (SUBMISSION_SORT_FIELDS), optionally per exam
+        {"keys": [("finished_at", -1), ("id", -1)]},
+        {"keys": [("exam_id", 1), ("finished_at", -1), ("id", -1)]},
+        {"keys": [("started_at", -1), ("id", -1)]},
+        {"keys": [("exam_id", 1), ("started_at", -1), ("id", -1)]},
+        {"keys": [("score", -1), ("id", -1)]},
+        {"keys": [("exam_id", 1), ("score", -1), ("id", -1)]},
+        # Grading queue sweep for pending submissions without a job
+        {"keys": [("grading_status", 1)], "partialFilterExpression": {"grading_status": "pending"}},
+    ],
+    "submission_drafts": [
+        {"keys": [("id", 1)], "unique": True},
+        # Abandoned drafts expire a week after their last autosave
+        {"keys": [("touched_at", 1)], "expireAfterSeconds": 7 * 24 * 3600},
+    ],
+    "grading_jobs": [
+        # One job per submission (enqueue is idempotent)
+        {"keys": [("submission_id", 1)], "unique": True},
+        {"keys": [("status", 1), ("available_at", 1)]},
+        {"keys": [("status", 1), ("lease_expires_at", 1)]},
+    ],
+    "regrade_jobs": [
+        {"keys": [("id", 1)], "unique": True},
+        {"keys": [("exam_id", 1), ("status", 1)]},
+        # At most one queued or running job per exam (regrade_service.ACTIVE_STATUSES)
+        {"keys": [("exam_id", 1)], "unique": True,
+         "partialFilterExpression": {"status": {"$in": ["queued", "running"]}}},
+    ],
+    "sessions": [
+        {"keys": [("session_token", 1)], "unique": True},
+        {"keys": [("user_id", 1)]},
+        # Expired sessions are removed by MongoDB (expires_at is a native date)
+        {"keys": [("expires_at", 1)], "expireAfterSeconds": 0},
+    ],
+    "revoked_sessions": [
+        {"keys": [("expires_at", 1)], "expireAfterSeconds": 0},
+    ],
+    "students": [
+        {"keys": [("id", 1)], "unique": True},
+        {"keys": [("email", 1)]},
+        {"keys": [("institution", 1)]},
+        {"keys": [("created_at", -1), ("id", -1)]},
+        # Admin student search
+        {"keys": [("full_name", "text"), ("email", "text"), ("institution", "text")]},
+    ],
+    "tracks": [
+        {"keys": [("track_type", 1), ("status", 1)]},
+        {"keys": [("created_by", 1)]},
+        {"keys": [("exam_id", 1)]},
+    ],
+}
+
+# Options compared when deciding whether an existing index matches its spec
+COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+
+def _key_tuple(keys) -> Tuple:
+    return tuple((field, direction) for field, direction in keys)
+
+
+def _existing_key(index_info: Dict[str, Any]) -> Tuple:
+    """Key tuple of an index returned by list_indexes(); text indexes are keyed by their weights"""
+    if "weights" in index_info:
+        return tuple((field, "text") for field in sorted(index_info["weights"]))
+    return _key_tuple(index_info["key"].items())
+
+
+def _spec_key(spec: Dict[str, Any]) -> Tuple:
+    keys = spec["keys"]
+    if any(direction == "text" for _, direction in keys):
+        return tuple((field, "text") for field in sorted(field for field, _ in keys))
+    return _key_tuple(keys)
+
+
+async def reconcile_indexes(db: AsyncIOMotorDatabase) -> Dict[str, Any]:
+    """
+    Create missing registry indexes and report the rest.
+
+    Never drops anything: indexes that exist but are not declared are listed
+    under "extra", and declared indexes whose options differ are listed
+    under "mismatched" for an operator to resolve.
+
+    Returns:
+        Dict with "created", "extra", "mismatched" and "errors" lists
+    """
+    report = {"created": [], "extra": [], "mismatched": [], "errors": []}
+
+    for collection_name, specs in INDEX_REGISTRY.items():
+        collection = db[collection_name]
+        existing = {}
+        async for index_info in collection.list_indexes():
+            existing[_existing_key(index_info)] = index_info
+
+        declared = set()
+        for spec in specs:
+            key = _spec_key(spec)
+            declared.add(key)
+            options = {k: v for k, v in spec.items() if k != "keys"}
+            current = existing.get(key)
+
+            if current is None:
+                try:
+                    name = await collection.create_index(spec["keys"], **options)
+                    report["created"].append(f"{collection_name}.{name}")
+                except OperationFailure as e:
+                    # Typically duplicates blocking a unique index
+                    report["errors"].append(f"{collection_name} {list(key)}: {e}")
+                continue
+
+            for option in COMPARED_OPTIONS:
+                if current.get(option) != options.get(option) and (current.get(option) or options.get(option)):
+                    report["mismatched"].append(
+                        f"{collection_name}.{current['name']}: {option} is {current.get(option)!r}, "
+                        f"expected {options.get(option)!r}"
+                    )
+
+        for key, index_info in existing.items():
+            if index_info["name"] != "_id_" and key not in declared:
+                report["extra"].append(f"{collection_name}.{index_info['name']}")
+
+    return report
+
+
+# ============================================
+# QUERY PLAN REPORT
+# ============================================
+
+# Representative filters (and sorts) of the queries the API issues
+API_QUERIES: List[Dict[str, Any]] = [
+    {"name": "exam by id", "collection": "exams", "filter": {"id": "x"}},
+    {"name": "published exams", "collection": "exams", "filter": {"published": True, "is_visible": {"$ne": False}}},
+    {"name": "exam statuses", "collection": "exams", "filter": {"id": {"$in": ["x", "y"]}}},
+    {"name": "sections of exam", "collection": "sections", "filter": {"exam_id": "x"}, "sort": {"index": 1}},
+    {"name": "section by id", "collection": "sections", "filter": {"id": "x"}},
+    {"name": "questions of section", "collection": "questions", "filter": {"section_id": "x"}, "sort": {"index": 1}},
+    {"name": "questions of sections", "collection": "questions", "filter": {"section_id": {"$in": ["x", "y"]}}},
+    {"name": "question by id", "collection": "questions", "filter": {"id": "x"}},
+    {"name": "submission by id", "collection": "submissions", "filter": {"id": "x"}},
+    {"name": "submissions of exam", "collection": "submissions", "filter": {"exam_id": "x"}},
+    {"name": "existing attempt", "collection": "submissions", "filter": {"exam_id": "x", "user_id_or_session": "u"}},
+    {"name": "admin submissions page", "collection": "submissions", "filter": {}, "sort": {"finished_at": -1, "id": -1}},
+    {"name": "admin submissions of exam", "collection": "submissions", "filter": {"exam_id": "x"}, "sort": {"finished_at": -1, "id": -1}},
+    {"name": "admin submissions by start", "collection": "submissions", "filter": {}, "sort": {"started_at": 1, "id": 1}},
+    {"name": "admin submissions of exam by score", "collection": "submissions", "filter": {"exam_id": "x"}, "sort": {"score": -1, "id": -1}},
+    {"name": "admin students page", "collection": "students", "filter": {}, "sort": {"created_at": -1, "id": -1}},
+    {"name": "admin student search", "collection": "students", "filter": {"$text": {"$search": "dhaka"}}},
+    {"name": "students of institution", "collection": "students", "filter": {"institution": "i"}},
+    {"name": "submissions of student", "collection": "submissions", "filter": {"user_id_or_session": "u"}},
+    {"name": "draft by id", "collection": "submission_drafts", "filter": {"id": "x"}},
+    {"name": "pending submissions", "collection": "submissions", "filter": {"grading_status": "pending"}},
+    {"name": "due grading job", "collection": "grading_jobs", "filter": {"status": "pending", "available_at": {"$lte": 0}}, "sort": {"available_at": 1}},
+    {"name": "active regrade of exam", "collection": "regrade_jobs", "filter": {"exam_id": "x", "status": {"$in": ["queued", "running"]}}},
+    {"name": "session by token", "collection": "sessions", "filter": {"session_token": "t"}},
+    {"name": "sessions of user", "collection": "sessions", "filter": {"user_id": "u"}},
+    {"name": "student by id", "collection": "students", "filter": {"id": "u"}},
+    {"name": "student by email", "collection": "students", "filter": {"email": "e"}},
+    {"name": "tracks by type", "collection": "tracks", "filter": {"track_type": "listening", "status": "published"}},
+    {"name": "track of exam", "collection": "tracks", "filter": {"exam_id": "x"}},
+]
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """Flatten the stage names of a winning plan tree"""
+    stages = [plan.get("stage", "?")]
+    for child_key in ("inputStage", "queryPlan"):
+        if child_key in plan:
+            stages.extend(_plan_stages(plan[child_key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+async def explain_api_queries(db: AsyncIOMotorDatabase) -> List[Dict[str, Any]]:
+    """
+    Explain every query in API_QUERIES (queryPlanner verbosity).
+
+    Returns one entry per query with the winning plan's stages and flags
+    for collection scans and blocking in-memory sorts.
+    """
+    results = []
+    for query in API_QUERIES:
+        command = {"find": query["collection"], "filter": query["filter"]}
+        if "sort" in query:
+            command["sort"] = query["sort"]
+
+        explanation = await db.command("explain", command, verbosity="queryPlanner")
+        stages = _plan_stages(explanation["queryPlanner"]["winningPlan"])
+        results.append({
+            "name": query["name"],
+            "collection": query["collection"],
+            "stages": stages,
+            "collection_scan": "COLLSCAN" in stages,
+            "in_memory_sort": "SORT" in stages,
+        })
+    return results
@@ -0,0 +1,211 @@
+"""
+Draft Answer Autosave
+Write-behind buffer for in-progress answers: PATCHes are merged in memory
+per draft and written to the submission_drafts collection in periodic
+bulk_write batches
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+
+class DraftConflict(Exception):
+    """A draft belongs to another user or exam, or was already submitted"""
+
+
+class _PendingDraft:
+    __slots__ = ("exam_id", "owner", "answers", "fields")
+
+    def __init__(self, exam_id: str, owner: Optional[str]):
+        self.exam_id = exam_id
+        self.owner = owner
+        # question key -> value, None meaning "remove the answer"
+        self.answers: Dict[str, Any] = {}
+        self.fields: Dict[str, Any] = {}
+
+    def merge_under(self, newer: "_PendingDraft"):
+        """Fold this (older) pending write beneath a newer one"""
+        newer.answers = {**self.answers, **newer.answers}
+        newer.fields = {**self.fields, **newer.fields}
+
+
+class DraftAutosaver:
+    """
+    Coalesces draft answer updates per draft and flushes them in batches.
+
+    However often a candidate's client saves, each draft costs at most one
+    upsert per flush_interval, and all drafts changed during an interval are
+    written with a single unordered bulk_write. A flush also starts early
+    once max_pending drafts are waiting. Updates are therefore at most about
+    flush_interval seconds behind in the database; load() flushes the
+    requested draft first, so reads in the same process are never stale.
+
+    Buffers are per process: a draft that is finalized by another API
+    process may miss the last flush_interval of updates, which is why
+    finalization also accepts answers that were not yet acknowledged.
+    """
+
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        flush_interval: float = 2.0,
+        max_pending: int = 500,
+        known_drafts: int = 10000
+    ):
+        """
+        Args:
+            db: Database holding submission_drafts and submissions
+            flush_interval: Maximum seconds an update waits in memory
+            max_pending: Number of waiting drafts that triggers an early flush
+            known_drafts: Number of draft owners remembered to skip ownership reads
+        """
+        self.db = db
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.known_drafts = known_drafts
+        self._pending: Dict[str, _PendingDraft] = {}
+        self._known: Dict[str, tuple] = {}
+        self._flush_now = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        """Stop the flush loop and write whatever is still buffered"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def _check_owner(self, draft_id: str, exam_id: str, owner: Optional[str]):
+        known = self._known.get(draft_id)
+        if known is None:
+            if await self.db.submissions.find_one({"id": draft_id}, {"_id": 1}):
+                raise DraftConflict("This attempt has already been submitted")
+            draft = await self.db.submission_drafts.find_one(
+                {"id": draft_id}, {"_id": 0, "exam_id": 1, "user_id_or_session": 1}
+            )
+            known = (draft["exam_id"], draft.get("user_id_or_session")) if draft else (exam_id, owner)
+            if len(self._known) >= self.known_drafts:
+                self._known.clear()
+            self._known[draft_id] = known
+
+        if known[0] != exam_id:
+            raise DraftConflict("Draft belongs to another exam")
+        if known[1] != owner:
+            raise DraftConflict("Draft belongs to another user")
+
+    async def record(
+        self,
+        draft_id: str,
+        exam_id: str,
+        owner: Optional[str],
+        answers: Dict[str, Any],
+        fields: Dict[str, Any]
+    ) -> int:
+        """
+        Buffer an update of a draft.
+
+        Args:
+            draft_id: Client-chosen id, reused as the submission id on finalization
+            exam_id: Exam the draft belongs to
+            owner: Authenticated user id, None for anonymous candidates
+            answers: Changed answers by question key (None removes an answer)
+            fields: Other draft fields to set (last_playback_time, progress_percent)
+
+        Returns:
+            Number of drafts waiting for the next flush
+        """
+        await self._check_owner(draft_id, exam_id, owner)
+
+        pending = self._pending.get(draft_id)
+        if pending is None:
+            pending = self._pending[draft_id] = _PendingDraft(exam_id, owner)
+        pending.answers.update(answers)
+        pending.fields.update(fields)
+
+        if len(self._pending) >= self.max_pending:
+            self._flush_now.set()
+        return len(self._pending)
+
+    def discard(self, draft_id: str):
+        """Forget a draft (after it has been finalized)"""
+        self._pending.pop(draft_id, None)
+        self._known.pop(draft_id, None)
+
+    async def load(self, draft_id: str) -> Optional[Dict[str, Any]]:
+        """Flush a draft's buffered updates and return the stored draft"""
+        await self.flush([draft_id])
+        return await self.db.submission_drafts.find_one({"id": draft_id}, {"_id": 0})
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"Draft autosave flush failed: {e}")
+
+    async def flush(self, draft_ids: Optional[List[str]] = None):
+        """Write buffered updates (all, or only draft_ids) with one bulk_write"""
+        async with self._flush_lock:
+            if draft_ids is None:
+                batch, self._pending = self._pending, {}
+            else:
+                batch = {
+                    draft_id: self._pending.pop(draft_id)
+                    for draft_id in draft_ids if draft_id in self._pending
+                }
+            if not batch:
+                return
+
+            now = datetime.now(timezone.utc)
+            operations = [self._operation(draft_id, pending, now) for draft_id, pending in batch.items()]
+            try:
+                await self.db.submission_drafts.bulk_write(operations, ordered=False)
+            except Exception:
+                # Put the batch back beneath anything recorded meanwhile
+                for draft_id, pending in batch.items():
+                    newer = self._pending.get(draft_id)
+                    if newer is not None:
+                        pending.merge_under(newer)
+                    else:
+                        self._pending[draft_id] = pending
+                raise
+
+    @staticmethod
+    def _operation(draft_id: str, pending: _PendingDraft, now: datetime) -> UpdateOne:
+        to_set: Dict[str, Any] = {"updated_at": now.isoformat(), "touched_at": now, **pending.fields}
+        to_unset: Dict[str, Any] = {}
+        for key, value in pending.answers.items():
+            if value is None:
+                to_unset[f"answers.{key}"] = ""
+            else:
+                to_set[f"answers.{key}"] = value
+
+        update = {
+            "$set": to_set,
+            "$setOnInsert": {
+                "exam_id": pending.exam_id,
+                "user_id_or_session": pending.owner,
+                "created_at": now.isoformat(),
+            },
+        }
+        if to_unset:
+            update["$unset"] = to_unset
+        return UpdateOne({"id": draft_id}, update, upsert=True)
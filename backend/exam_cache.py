@@ -0,0 +1,367 @@
+"""
+Exam Tree Cache
+In-process LRU cache of assembled exam documents (exam + sections + questions)
+and their pre-encoded HTTP response bodies
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+try:
+    import brotli
+except ImportError:  # Optional dependency: responses fall back to gzip
+    brotli = None
+
+
+# Cache key of the published exam listing, invalidated by every exam write
+PUBLISHED_EXAMS_KEY = "__published__"
+
+
+class EncodedPayload:
+    """
+    JSON response body encoded once, with compressed variants and a strong ETag.
+    Repeat requests are answered with a hash comparison instead of a full encode.
+    """
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.gzip_body = gzip.compress(body, compresslevel=6, mtime=0)
+        self.brotli_body = brotli.compress(body, quality=5) if brotli else None
+
+    @classmethod
+    def from_data(cls, data: Any) -> "EncodedPayload":
+        """Encode data the same way FastAPI's JSONResponse would"""
+        body = json.dumps(
+            jsonable_encoder(data),
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+        return cls(body)
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """Check an If-None-Match header against this payload's ETag"""
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*" or tag.removeprefix("W/") == self.etag:
+                return True
+        return False
+
+    def to_response(self, request: Request) -> Response:
+        """Build a 200 (best accepted encoding) or 304 response for request"""
+        headers = {
+            "ETag": self.etag,
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if self.matches(request.headers.get("if-none-match")):
+            return Response(status_code=304, headers=headers)
+
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        if self.brotli_body is not None and "br" in accepted:
+            headers["Content-Encoding"] = "br"
+            body = self.brotli_body
+        elif "gzip" in accepted:
+            headers["Content-Encoding"] = "gzip"
+            body = self.gzip_body
+        else:
+            body = self.body
+        return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _accepted_encodings(accept_encoding: str) -> set:
+    """Content codings from an Accept-Encoding header, ignoring q=0 entries"""
+    accepted = set()
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        params = params.replace(" ", "")
+        if coding and params not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.lower())
+    return accepted
+
+
+class _Entry:
+    __slots__ = ("version", "stored_at", "checked_at", "value", "derived")
+
+    def __init__(self, version: str, value: Any):
+        self.version = version
+        self.stored_at = self.checked_at = time.monotonic()
+        self.value = value
+        self.derived: Dict[str, Any] = {}
+
+
+class ExamTreeCache:
+    """
+    LRU cache of exam trees keyed by exam id and the exam's updated_at.
+
+    Every write path calls invalidate(exam_id). Invalidating an exam that is
+    being loaded bumps its generation, so the tree read before the write is
+    discarded instead of being stored stale (generations are only kept while
+    a load is in flight). Concurrent misses for the same exam share one load
+    (single flight), so a cohort pressing "start" together costs one database
+    round trip. Values derived from a tree (such as its encoded response) are
+    memoized on the entry and dropped with it.
+
+    Writes made by another API process are caught by revalidation: when
+    get_or_load() is given a version_loader, a hit older than
+    revalidate_seconds compares the entry's updated_at with the database
+    (one projection read shared by concurrent requests) and reloads the
+    tree if it changed.
+
+    Cached trees are shared between requests and must be treated as read-only.
+    
+    A second, lighter map holds exam metadata (title, description, ...) for
+    listings that only need those fields; it shares the TTL and is cleared by
+    the same invalidate() calls.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 0, revalidate_seconds: float = 1.0):
+        """
+        Args:
+            max_entries: Maximum number of exams kept in memory (LRU eviction)
+            ttl_seconds: Optional upper bound on entry age, 0 to disable
+            revalidate_seconds: Age after which a hit re-checks the exam's
+                updated_at (0 checks on every hit)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.revalidate_seconds = revalidate_seconds
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._loading: Dict[str, int] = {}
+        self._inflight: Dict[str, "asyncio.Future[Any]"] = {}
+        self._checks: Dict[str, "asyncio.Future[Optional[str]]"] = {}
+        self._metadata: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _entry(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        if self.ttl_seconds and time.monotonic() - entry.stored_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, exam_id: str) -> Optional[Dict[str, Any]]:
+        """Return the cached tree or None"""
+        entry = self._entry(exam_id)
+        return entry.value if entry else None
+
+    def generation(self, exam_id: str) -> int:
+        """Current invalidation generation for an exam"""
+        return self._generations.get(exam_id, 0)
+
+    def _begin_load(self, key: str) -> int:
+        """Register a load of key and return the generation it must still match"""
+        self._loading[key] = self._loading.get(key, 0) + 1
+        return self.generation(key)
+
+    def _end_load(self, key: str):
+        remaining = self._loading.pop(key) - 1
+        if remaining:
+            self._loading[key] = remaining
+        else:
+            # Nothing left to fence off
+            self._generations.pop(key, None)
+
+    @staticmethod
+    def _version(tree: Any) -> str:
+        if isinstance(tree, dict):
+            return tree.get("exam", {}).get("updated_at") or ""
+        return ""
+
+    def put(self, exam_id: str, tree: Any, generation: int) -> bool:
+        """
+        Store a tree loaded at the given generation.
+
+        Returns False (and stores nothing) if the exam was invalidated since.
+        """
+        if generation != self.generation(exam_id):
+            return False
+
+        self._entries[exam_id] = _Entry(self._version(tree), tree)
+        self._entries.move_to_end(exam_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return True
+
+    async def _is_current(
+        self,
+        exam_id: str,
+        entry: _Entry,
+        version_loader: Callable[[str], Awaitable[Optional[str]]]
+    ) -> bool:
+        """Whether entry still matches the exam's updated_at in the database"""
+        if time.monotonic() - entry.checked_at < self.revalidate_seconds:
+            return True
+
+        check = self._checks.get(exam_id)
+        if check is None:
+            check = asyncio.ensure_future(version_loader(exam_id))
+            self._checks[exam_id] = check
+            check.add_done_callback(lambda _: self._checks.pop(exam_id, None))
+        try:
+            version = await asyncio.shield(check)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Keep serving the cached tree while the check cannot be made (the TTL still applies)
+            return True
+
+        if version is None or version != entry.version:
+            return False
+        entry.checked_at = time.monotonic()
+        return True
+
+    async def get_or_load(
+        self,
+        exam_id: str,
+        loader: Callable[[str], Awaitable[Any]],
+        version_loader: Optional[Callable[[str], Awaitable[Optional[str]]]] = None
+    ) -> Any:
+        """
+        Return the cached tree, loading it with loader(exam_id) on a miss.
+        Missing exams (loader returns None) are not cached.
+
+        version_loader(exam_id) returns the exam's current updated_at (None
+        if it no longer exists); with it, hits are revalidated as described
+        in the class docstring.
+        """
+        entry = self._entry(exam_id)
+        if entry is not None and version_loader is not None and not await self._is_current(exam_id, entry, version_loader):
+            # Changed by another process: drop it unless a newer tree replaced it meanwhile
+            if self._entries.get(exam_id) is entry:
+                del self._entries[exam_id]
+            entry = self._entry(exam_id)
+        if entry is not None:
+            self.hits += 1
+            return entry.value
+
+        self.misses += 1
+        inflight = self._inflight.get(exam_id)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[exam_id] = future
+        generation = self._begin_load(exam_id)
+        try:
+            tree = await loader(exam_id)
+            if tree is not None:
+                self.put(exam_id, tree, generation)
+            future.set_result(tree)
+            return tree
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(exam_id, None)
+            self._end_load(exam_id)
+
+    def derive(self, exam_id: str, name: str, value: Any, builder: Callable[[Any], Any]) -> Any:
+        """
+        Return builder(value), memoized on the cache entry under name.
+
+        Only memoized while value is still the cached tree for exam_id, so a
+        caller holding a tree that was invalidated meanwhile gets a fresh build.
+        """
+        entry = self._entry(exam_id)
+        if entry is None or entry.value is not value:
+            return builder(value)
+
+        if name not in entry.derived:
+            entry.derived[name] = builder(value)
+        return entry.derived[name]
+
+    async def get_metadata_many(
+        self,
+        exam_ids: List[str],
+        loader: Callable[[List[str]], Awaitable[List[Dict[str, Any]]]]
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Metadata of several exams keyed by id, loading all misses with one
+        loader(missing_ids) call. Exams the loader does not return are left out.
+        """
+        now = time.monotonic()
+        found: Dict[str, Dict[str, Any]] = {}
+        missing = []
+        for exam_id in dict.fromkeys(exam_ids):
+            cached = self._metadata.get(exam_id)
+            if cached and not (self.ttl_seconds and now - cached[0] > self.ttl_seconds):
+                found[exam_id] = cached[1]
+                self._metadata.move_to_end(exam_id)
+            else:
+                missing.append(exam_id)
+        
+        if missing:
+            generations = {exam_id: self._begin_load(exam_id) for exam_id in missing}
+            try:
+                for metadata in await loader(missing):
+                    exam_id = metadata["id"]
+                    found[exam_id] = metadata
+                    if generations.get(exam_id) == self.generation(exam_id):
+                        self._metadata[exam_id] = (time.monotonic(), metadata)
+                        self._metadata.move_to_end(exam_id)
+            finally:
+                for exam_id in missing:
+                    self._end_load(exam_id)
+            while len(self._metadata) > self.max_entries:
+                self._metadata.popitem(last=False)
+        return found
+
+    def invalidate(self, exam_id: str):
+        """Drop an exam (and the published listing) and fence off in-flight loads"""
+        self._metadata.pop(exam_id, None)
+        for key in (exam_id, PUBLISHED_EXAMS_KEY):
+            self._entries.pop(key, None)
+            if key in self._loading:
+                self._generations[key] = self.generation(key) + 1
+
+    def clear(self):
+        """Drop every cached exam"""
+        for exam_id in list(self._entries) + list(self._metadata):
+            self.invalidate(exam_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters for diagnostics"""
+        return {
+            "entries": len(self._entries),
+            "metadata_entries": len(self._metadata),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "versions": {key: entry.version for key, entry in self._entries.items()},
+        }
+
+
+# Assembled exam trees served to students, shared by every module that
+# reads or writes exams and invalidated by every exam write
+exam_tree_cache = ExamTreeCache(
+    max_entries=int(os.environ.get('EXAM_CACHE_MAX_ENTRIES', '256')),
+    ttl_seconds=float(os.environ.get('EXAM_CACHE_TTL_SECONDS', '300')),
+    revalidate_seconds=float(os.environ.get('EXAM_CACHE_REVALIDATE_SECONDS', '1'))
+)
+
+
+def invalidate_exam_cache(exam_id: str):
+    """Drop an exam written outside server.py (imports, tracks) from the exam tree cache"""
+    exam_tree_cache.invalidate(exam_id)
@@ -0,0 +1,228 @@
+"""
+Exam Status Broadcasting
+Push exam start/stop/publish transitions to connected students over
+server-sent events instead of per-client polling
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+# Exam fields that make up its public status. Writes that change any of them
+# also set status_updated_at, which versions the status.
+STATUS_FIELDS = ("is_active", "started_at", "stopped_at", "published", "is_visible")
+
+
+def exam_status_payload(exam: Dict[str, Any]) -> Dict[str, Any]:
+    """Public status fields of an exam document"""
+    return {
+        "exam_id": exam["id"],
+        "is_active": exam.get("is_active", False),
+        "started_at": exam.get("started_at"),
+        "stopped_at": exam.get("stopped_at"),
+        "published": exam.get("published", False),
+        "is_visible": exam.get("is_visible", True),
+        "status_updated_at": exam.get("status_updated_at"),
+    }
+
+
+def status_version(status: Dict[str, Any]) -> int:
+    """
+    Version of a status payload: its exam's status_updated_at in epoch
+    milliseconds (0 if the status was never changed). Derived from the
+    database, so every API process agrees on it, and unaffected by edits
+    and submissions that leave the status alone.
+    """
+    updated_at = status.get("status_updated_at")
+    if not updated_at:
+        return 0
+    try:
+        return int(datetime.fromisoformat(updated_at).timestamp() * 1000)
+    except (TypeError, ValueError):
+        return 0
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> bytes:
+    """Encode one server-sent event frame"""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode("utf-8")
+
+
+class ExamStatusSnapshot:
+    """
+    In-memory status of recently requested exams for batched polling.
+
+    Entries are refreshed from the database once they are older than
+    max_age seconds, with one query for all stale ids of a request, and
+    are updated immediately by writes made in this process. Beyond
+    max_entries the least recently refreshed exam is dropped.
+    """
+
+    def __init__(
+        self,
+        status_loader: Callable[[List[str]], Awaitable[List[Dict[str, Any]]]],
+        max_age: float = 2.0,
+        max_entries: int = 1000
+    ):
+        self.status_loader = status_loader
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def update(self, status: Dict[str, Any]):
+        exam_id = status["exam_id"]
+        self._entries[exam_id] = (time.monotonic(), status)
+        self._entries.move_to_end(exam_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_many(self, exam_ids: List[str]) -> List[Dict[str, Any]]:
+        """Statuses of the given exams (unknown ids are left out)"""
+        now = time.monotonic()
+        stale = [
+            exam_id for exam_id in exam_ids
+            if exam_id not in self._entries or now - self._entries[exam_id][0] > self.max_age
+        ]
+        if stale:
+            for status in await self.status_loader(stale):
+                self.update(status)
+        return [self._entries[exam_id][1] for exam_id in exam_ids if exam_id in self._entries]
+
+
+class ExamStatusBroadcaster:
+    """
+    One channel per exam with a set of subscriber queues.
+
+    A transition is encoded once and handed to every subscriber of that exam,
+    so the cost of a status change does not depend on how many students are
+    watching. Subscribers only ever need the latest status, so each queue
+    keeps at most one pending frame per exam.
+
+    Writes made by another API process never reach this process's channels.
+    While anyone is subscribed, a single background task re-reads the status
+    of all watched exams every resync_interval seconds (one query for all of
+    them) and publishes whatever changed.
+    """
+
+    def __init__(
+        self,
+        status_loader: Callable[[List[str]], Awaitable[List[Dict[str, Any]]]],
+        resync_interval: float = 15.0
+    ):
+        """
+        Args:
+            status_loader: Coroutine returning status payloads for a list of exam ids
+            resync_interval: Seconds between shared re-reads, 0 to disable
+        """
+        self.status_loader = status_loader
+        self.resync_interval = resync_interval
+        self._channels: Dict[str, Set["_Subscriber"]] = {}
+        self._latest: Dict[str, Dict[str, Any]] = {}
+        self._resync_task: Optional[asyncio.Task] = None
+
+    def publish(self, status: Dict[str, Any]):
+        """Fan a status payload out to all subscribers of its exam"""
+        exam_id = status["exam_id"]
+        if self._latest.get(exam_id) == status:
+            return
+        self._latest[exam_id] = status
+
+        subscribers = self._channels.get(exam_id)
+        if not subscribers:
+            return
+        frame = format_sse("status", status)
+        for subscriber in subscribers:
+            subscriber.push(exam_id, frame)
+
+    async def subscribe(self, exam_ids: Iterable[str]) -> "_Subscriber":
+        """Register a subscriber and queue the current status of each exam"""
+        subscriber = _Subscriber()
+        exam_ids = list(dict.fromkeys(exam_ids))
+        # Exams nobody is watching yet are not being resynced, so read them now
+        missing = [exam_id for exam_id in exam_ids if not self._channels.get(exam_id)]
+        for exam_id in exam_ids:
+            self._channels.setdefault(exam_id, set()).add(subscriber)
+        subscriber.exam_ids = exam_ids
+
+        for exam_id in exam_ids:
+            if exam_id not in missing and exam_id in self._latest:
+                subscriber.push(exam_id, format_sse("status", self._latest[exam_id]))
+
+        if missing:
+            try:
+                statuses = await self.status_loader(missing)
+            except BaseException:
+                # Nobody will drain this subscriber, so it must not stay registered
+                self.unsubscribe(subscriber)
+                raise
+            for status in statuses:
+                # Deliver to everyone who joined the channel while this read ran
+                self._latest[status["exam_id"]] = status
+                frame = format_sse("status", status)
+                for channel_subscriber in self._channels.get(status["exam_id"], ()):
+                    channel_subscriber.push(status["exam_id"], frame)
+
+        self._ensure_resync()
+        return subscriber
+
+    def unsubscribe(self, subscriber: "_Subscriber"):
+        for exam_id in subscriber.exam_ids:
+            subscribers = self._channels.get(exam_id)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._channels[exam_id]
+                self._latest.pop(exam_id, None)
+
+    def _ensure_resync(self):
+        if self.resync_interval and (self._resync_task is None or self._resync_task.done()):
+            self._resync_task = asyncio.create_task(self._resync_loop())
+
+    async def _resync_loop(self):
+        while self._channels:
+            await asyncio.sleep(self.resync_interval)
+            exam_ids = list(self._channels)
+            if not exam_ids:
+                break
+            try:
+                for status in await self.status_loader(exam_ids):
+                    self.publish(status)
+            except Exception as e:
+                logger.warning(f"Exam status resync failed: {e}")
+
+    async def close(self):
+        if self._resync_task:
+            self._resync_task.cancel()
+            self._resync_task = None
+        self._channels.clear()
+
+
+class _Subscriber:
+    """Per-connection mailbox holding the newest pending frame of each exam"""
+
+    def __init__(self):
+        self.exam_ids: List[str] = []
+        self._pending: Dict[str, bytes] = {}
+        self._ready = asyncio.Event()
+
+    def push(self, exam_id: str, frame: bytes):
+        self._pending[exam_id] = frame
+        self._ready.set()
+
+    async def next_frames(self, timeout: float) -> List[bytes]:
+        """Wait up to timeout seconds for pending frames (empty list on timeout)"""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._ready.clear()
+        frames = list(self._pending.values())
+        self._pending.clear()
+        return frames
@@ -4,9 +4,45 @@ Handles automatic grading of student submissions for all question types
 """
 
 from typing import List, Dict, Any, Optional
-from new_question_type_schemas import get_grading_method, is_auto_gradable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from new_question_type_schemas import is_auto_gradable
+import asyncio
+import multiprocessing
 import re
 
+import numpy as np
+
+
+_WHITESPACE = re.compile(r'\s+')
+
+# Question types graded by exact match after normalization
+# (multiple choice, matching, fill in gaps, form completion, ...)
+EXACT_MATCH_TYPES = frozenset([
+    "multiple_choice", "matching_headings", "matching_information",
+    "matching_features", "matching_sentence_endings", "matching_names",
+    "true_false_not_given", "yes_no_not_given", "diagram_labeling",
+    "multiple_choice_multiple_answers",
+    "fill_in_gaps", "form_completion", "plan_map_diagram_labeling"
+])
+
+# Question types where the student answer may contain the key or vice versa
+# (short answer and sentence completion allow minor variations)
+FLEXIBLE_MATCH_TYPES = frozenset([
+    "short_answer_reading", "short_answer_listening",
+    "sentence_completion", "sentence_completion_wordlist",
+    "note_completion", "flow_chart_completion",
+    "table_completion", "summary_completion"
+])
+
+EXACT_MATCH = "exact"
+CONTAINS_MATCH = "contains"
+
+# (minimum percentage, band) from the top band down
+BAND_THRESHOLDS = [
+    (90, 9.0), (85, 8.5), (80, 8.0), (75, 7.5), (70, 7.0), (65, 6.5),
+    (60, 6.0), (55, 5.5), (50, 5.0), (40, 4.5), (30, 4.0), (20, 3.5), (10, 3.0)
+]
+
 
 def normalize_answer(answer: str) -> str:
     """Normalize answer for comparison"""
@@ -15,10 +51,42 @@ def normalize_answer(answer: str) -> str:
     # Convert to lowercase and strip whitespace
     normalized = str(answer).lower().strip()
     # Remove extra spaces
-    normalized = re.sub(r'\s+', ' ', normalized)
+    normalized = _WHITESPACE.sub(' ', normalized)
     return normalized
 
 
+def get_match_mode(question_type: str) -> str:
+    """Matching strategy for a question type (exact by default)"""
+    if question_type in FLEXIBLE_MATCH_TYPES:
+        return CONTAINS_MATCH
+    return EXACT_MATCH
+
+
+def _match_exact(student_norm: str, keys: tuple) -> bool:
+    return student_norm in keys
+
+
+def _match_contains(student_norm: str, keys: tuple) -> bool:
+    return any(key in student_norm or student_norm in key for key in keys)
+
+
+# Dispatch table used by compiled grading plans
+MATCHERS = {
+    EXACT_MATCH: _match_exact,
+    CONTAINS_MATCH: _match_contains,
+}
+
+
+def normalize_answer_key(answer_key: Any) -> tuple:
+    """
+    Normalized accepted answers of an answer key.
+    A list or tuple key is a set of alternative answers.
+    """
+    if isinstance(answer_key, (list, tuple)):
+        return tuple(dict.fromkeys(normalize_answer(key) for key in answer_key))
+    return (normalize_answer(answer_key),)
+
+
 def check_answer_match(student_answer: str, correct_answer: str, question_type: str) -> bool:
     """
     Check if student answer matches correct answer based on question type
@@ -31,90 +99,104 @@ def check_answer_match(student_answer: str, correct_answer: str, question_type:
     Returns:
         bool: True if answer is correct, False otherwise
     """
-    # Normalize both answers
     student_norm = normalize_answer(student_answer)
-    correct_norm = normalize_answer(correct_answer)
-    
     if not student_norm:
         return False
     
-    # For multiple choice, matching, etc. - exact match after normalization
-    if question_type in [
-        "multiple_choice", "matching_headings", "matching_information",
-        "matching_features", "matching_sentence_endings", "matching_names",
-        "true_false_not_given", "yes_no_not_given", "diagram_labeling",
-        "multiple_choice_multiple_answers"
-    ]:
-        return student_norm == correct_norm
-    
-    # For short answer and sentence completion - allow flexible matching
-    if question_type in [
-        "short_answer_reading", "short_answer_listening",
-        "sentence_completion", "sentence_completion_wordlist",
-        "note_completion", "flow_chart_completion",
-        "table_completion", "summary_completion"
-    ]:
-        # Check if student answer contains the correct answer or vice versa
-        # This allows for minor variations
-        return correct_norm in student_norm or student_norm in correct_norm
-    
-    # For fill in gaps and form completion - exact match
-    if question_type in [
-        "fill_in_gaps", "form_completion", "plan_map_diagram_labeling"
-    ]:
-        return student_norm == correct_norm
-    
-    # Default: exact match
-    return student_norm == correct_norm
+    matcher = MATCHERS[get_match_mode(question_type)]
+    return matcher(student_norm, normalize_answer_key(correct_answer))
 
 
-def grade_submission(
+def compile_grading_plan(
     questions: List[Dict[str, Any]],
-    student_answers: Dict[str, str],
     exam_type: Optional[str] = None
 ) -> Dict[str, Any]:
     """
-    Grade a student submission
+    Compile an exam's questions into a grading plan
+    
+    Everything that does not depend on the student is resolved once here:
+    auto-gradability, the matching strategy of each question type and the
+    normalized answer keys. The plan only holds plain tuples and strings,
+    so it can be cached with the exam and sent to a grading process.
     
     Args:
         questions: List of question dictionaries
-        student_answers: Dict mapping question_id to student's answer
         exam_type: Type of exam (listening, reading, writing, speaking)
         
     Returns:
-        Dict containing:
-            - score: Total score (0-9 for IELTS scale)
-            - correct_answers: Number of correct answers
-            - total_questions: Total number of gradable questions
-            - details: List of per-question results
+        Dict with "exam_type" and "questions", one tuple per question:
+        (question_id, type, raw answer_key, match mode or None, normalized keys)
     """
-    results = []
-    correct_count = 0
-    total_gradable = 0
+    compiled = []
+    gradable_by_type: Dict[str, bool] = {}
     
     for question in questions:
-        question_id = question.get("id", "")
         question_type = question.get("type", "")
         answer_key = question.get("answer_key", "")
         
-        # Check if question is auto-gradable
-        if not is_auto_gradable(question_type):
-            # Skip writing and speaking questions
+        if question_type not in gradable_by_type:
+            gradable_by_type[question_type] = is_auto_gradable(question_type)
+        
+        if gradable_by_type[question_type]:
+            mode = get_match_mode(question_type)
+            keys = normalize_answer_key(answer_key)
+        else:
+            # Writing and speaking questions need manual grading
+            mode = None
+            keys = ()
+        
+        compiled.append((question.get("id", ""), question_type, answer_key, mode, keys))
+    
+    return {"exam_type": exam_type, "questions": compiled}
+
+
+def band_score_for(correct_count: int, total_gradable: int) -> float:
+    """
+    Convert a raw score to an IELTS band (0-9)
+    This is a simplified conversion - real IELTS has specific conversion tables
+    """
+    if total_gradable <= 0:
+        return 0.0
+    
+    percentage = (correct_count / total_gradable) * 100
+    for minimum, band in BAND_THRESHOLDS:
+        if percentage >= minimum:
+            return band
+    return 2.5
+
+
+def grade_with_plan(plan: Dict[str, Any], student_answers: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Grade a student submission against a compiled grading plan
+    
+    Args:
+        plan: Result of compile_grading_plan()
+        student_answers: Dict mapping question_id to student's answer
+        
+    Returns:
+        Same structure as grade_submission()
+    """
+    results = []
+    correct_count = 0
+    total_gradable = 0
+    
+    for question_id, question_type, answer_key, mode, keys in plan["questions"]:
+        student_answer = student_answers.get(question_id, "")
+        
+        if mode is None:
             results.append({
                 "question_id": question_id,
                 "type": question_type,
                 "is_correct": None,
-                "student_answer": student_answers.get(question_id, ""),
+                "student_answer": student_answer,
                 "correct_answer": answer_key,
                 "requires_manual_grading": True
             })
             continue
         
         total_gradable += 1
-        student_answer = student_answers.get(question_id, "")
-        
-        # Check if answer is correct
-        is_correct = check_answer_match(student_answer, answer_key, question_type)
+        student_norm = normalize_answer(student_answer)
+        is_correct = bool(student_norm) and MATCHERS[mode](student_norm, keys)
         
         if is_correct:
             correct_count += 1
@@ -128,47 +210,164 @@ def grade_submission(
             "requires_manual_grading": False
         })
     
-    # Calculate IELTS band score based on percentage
-    # This is a simplified conversion - real IELTS has specific conversion tables
-    if total_gradable > 0:
-        percentage = (correct_count / total_gradable) * 100
-        
-        # Convert percentage to IELTS band (0-9)
-        if percentage >= 90:
-            band_score = 9.0
-        elif percentage >= 85:
-            band_score = 8.5
-        elif percentage >= 80:
-            band_score = 8.0
-        elif percentage >= 75:
-            band_score = 7.5
-        elif percentage >= 70:
-            band_score = 7.0
-        elif percentage >= 65:
-            band_score = 6.5
-        elif percentage >= 60:
-            band_score = 6.0
-        elif percentage >= 55:
-            band_score = 5.5
-        elif percentage >= 50:
-            band_score = 5.0
-        elif percentage >= 40:
-            band_score = 4.5
-        elif percentage >= 30:
-            band_score = 4.0
-        elif percentage >= 20:
-            band_score = 3.5
-        elif percentage >= 10:
-            band_score = 3.0
-        else:
-            band_score = 2.5
-    else:
-        band_score = 0.0
-    
     return {
-        "score": band_score,
+        "score": band_score_for(correct_count, total_gradable),
         "correct_answers": correct_count,
         "total_questions": total_gradable,
         "details": results,
         "percentage": round((correct_count / total_gradable * 100) if total_gradable > 0 else 0, 2)
     }
+
+
+def grade_submission(
+    questions: List[Dict[str, Any]],
+    student_answers: Dict[str, str],
+    exam_type: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Grade a student submission
+    
+    Args:
+        questions: List of question dictionaries
+        student_answers: Dict mapping question_id to student's answer
+        exam_type: Type of exam (listening, reading, writing, speaking)
+        
+    Returns:
+        Dict containing:
+            - score: Total score (0-9 for IELTS scale)
+            - correct_answers: Number of correct answers
+            - total_questions: Total number of gradable questions
+            - details: List of per-question results
+    """
+    return grade_with_plan(compile_grading_plan(questions, exam_type), student_answers)
+
+
+def grade_batch_with_plan(plan: Dict[str, Any], answers_batch: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """
+    Grade many submissions of one exam at once
+    
+    Normalized answers form a (submissions x gradable questions) matrix that is
+    compared column by column against the plan's keys; scores and bands are
+    then computed for the whole batch with array operations. Identical answers
+    within a batch are normalized only once.
+    
+    Args:
+        plan: Result of compile_grading_plan()
+        answers_batch: One answers dict per submission
+        
+    Returns:
+        Dict of arrays aligned with answers_batch: "score", "correct_answers",
+        "total_questions" and "percentage"
+    """
+    gradable = [(question_id, mode, keys) for question_id, _, _, mode, keys in plan["questions"] if mode is not None]
+    count = len(answers_batch)
+    total = len(gradable)
+    
+    if total == 0 or count == 0:
+        zeros = np.zeros(count)
+        return {
+            "score": zeros,
+            "correct_answers": zeros.astype(int),
+            "total_questions": np.full(count, total),
+            "percentage": zeros,
+        }
+    
+    normalized: Dict[Any, str] = {}
+    correct = np.zeros((count, total), dtype=bool)
+    
+    for column, (question_id, mode, keys) in enumerate(gradable):
+        values = []
+        for answers in answers_batch:
+            answer = answers.get(question_id, "")
+            try:
+                value = normalized[answer]
+            except KeyError:
+                value = normalized[answer] = normalize_answer(answer)
+            except TypeError:  # Unhashable answer (list, dict)
+                value = normalize_answer(answer)
+            values.append(value)
+        
+        answer_column = np.array(values, dtype=str)
+        if mode == EXACT_MATCH:
+            matches = np.isin(answer_column, np.array(keys, dtype=str))
+        else:
+            matches = np.zeros(count, dtype=bool)
+            for key in keys:
+                matches |= np.char.find(answer_column, key) >= 0
+                matches |= np.char.find(np.full(count, key), answer_column) >= 0
+        
+        correct[:, column] = matches & (answer_column != "")
+    
+    correct_counts = correct.sum(axis=1)
+    percentage = correct_counts / total * 100
+    
+    thresholds = np.array([minimum for minimum, _ in reversed(BAND_THRESHOLDS)], dtype=float)
+    bands = np.array([2.5] + [band for _, band in reversed(BAND_THRESHOLDS)])
+    scores = bands[np.searchsorted(thresholds, percentage, side="right")]
+    
+    return {
+        "score": scores,
+        "correct_answers": correct_counts,
+        "total_questions": np.full(count, total),
+        "percentage": np.round(percentage, 2),
+    }
+
+
+# ============================================
+# GRADING WORKER POOL
+# ============================================
+
+_grading_executor: Optional[Executor] = None
+
+
+def start_grading_executor(kind: str = "thread", workers: Optional[int] = None) -> Optional[Executor]:
+    """
+    Create the pool that grade_submission_async() dispatches to
+
+    Args:
+        kind: "thread", "process" or "inline" (grade on the event loop, no pool)
+        workers: Pool size, defaults to the executor's own default
+
+    Returns:
+        The executor, or None for inline grading
+    """
+    global _grading_executor
+    shutdown_grading_executor()
+
+    if kind == "process":
+        # spawn: workers only import this module, never a copy of the running server
+        _grading_executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    elif kind == "thread":
+        _grading_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="grading")
+    elif kind != "inline":
+        raise ValueError(f"Unknown grading executor kind: {kind}")
+
+    return _grading_executor
+
+
+def shutdown_grading_executor():
+    """Stop the grading pool, waiting for in-flight gradings"""
+    global _grading_executor
+    if _grading_executor is not None:
+        _grading_executor.shutdown(wait=True)
+        _grading_executor = None
+
+
+async def run_in_grading_pool(func, *args):
+    """Run func(*args) in the grading pool, or inline when no pool has been started"""
+    if _grading_executor is None:
+        return func(*args)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_grading_executor, func, *args)
+
+
+async def grade_submission_async(plan: Dict[str, Any], student_answers: Dict[str, str]) -> Dict[str, Any]:
+    """
+    grade_with_plan() run in the grading pool so the event loop keeps
+    serving other requests.
+    """
+    return await run_in_grading_pool(grade_with_plan, plan, student_answers)
@@ -0,0 +1,279 @@
+"""
+Grading Queue
+Durable, Mongo-backed queue of grading jobs so submissions can be stored
+immediately and graded by background consumers
+"""
+
+import asyncio
+import logging
+import os
+import random
+import socket
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from grading_engine import grade_submission_async
+
+logger = logging.getLogger(__name__)
+
+# Submission grading_status values
+GRADING_PENDING = "pending"
+GRADING_DONE = "graded"
+GRADING_FAILED = "failed"
+
+LEASE_SECONDS = 60
+MAX_ATTEMPTS = 5
+# Seconds between sweeps for pending submissions that never got a job
+SWEEP_INTERVAL_SECONDS = 300
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def enqueue_grading(db: AsyncIOMotorDatabase, submission_id: str, exam_id: str) -> bool:
+    """
+    Queue a submission for grading.
+
+    Jobs are keyed on the submission id, so enqueueing the same submission
+    twice is a no-op. Returns True if a new job was created.
+    """
+    now = _now()
+    try:
+        result = await db.grading_jobs.update_one(
+            {"submission_id": submission_id},
+            {"$setOnInsert": {
+                "submission_id": submission_id,
+                "exam_id": exam_id,
+                "status": "pending",
+                "attempts": 0,
+                "available_at": now,
+                "lease_expires_at": None,
+                "worker": None,
+                "last_error": None,
+                "created_at": now,
+                "finished_at": None,
+            }},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Lost a race with a concurrent enqueue of the same submission
+        return False
+    return result.upserted_id is not None
+
+
+async def enqueue_orphaned_submissions(db: AsyncIOMotorDatabase) -> int:
+    """
+    Queue every pending submission that has no grading job.
+
+    POST /submissions stores the submission before it enqueues the job, so a
+    crash or error between the two writes leaves a submission nobody grades.
+    Enqueueing is idempotent, so sweeping while submissions are being
+    created is harmless. Returns the number of jobs created.
+    """
+    orphans = db.submissions.aggregate([
+        {"$match": {"grading_status": GRADING_PENDING}},
+        {"$lookup": {
+            "from": "grading_jobs",
+            "localField": "id",
+            "foreignField": "submission_id",
+            "as": "job",
+        }},
+        {"$match": {"job": {"$size": 0}}},
+        {"$project": {"_id": 0, "id": 1, "exam_id": 1}},
+    ])
+    created = 0
+    async for submission in orphans:
+        if await enqueue_grading(db, submission["id"], submission["exam_id"]):
+            created += 1
+    return created
+
+
+class GradingQueueWorker:
+    """
+    Background consumer of the grading_jobs collection.
+
+    Each consumer task claims one due job at a time with an atomic
+    find_one_and_update that sets a lease. A job whose lease expires (its
+    worker died mid-grading) becomes claimable again, and failures are
+    retried with exponential backoff up to MAX_ATTEMPTS. Grading is
+    deterministic and results are written with $set, so grading a
+    submission twice leaves it in the same state.
+
+    Any number of workers, in API processes or standalone, can consume the
+    same collection. Each also sweeps for pending submissions without a job
+    at start and every sweep_interval seconds.
+    """
+
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        plan_loader: Callable[[str], Awaitable[Optional[Dict[str, Any]]]],
+        concurrency: int = 4,
+        poll_interval: float = 1.0,
+        sweep_interval: float = SWEEP_INTERVAL_SECONDS
+    ):
+        """
+        Args:
+            db: Database holding submissions and grading_jobs
+            plan_loader: Coroutine returning the grading plan of an exam id (None if missing)
+            concurrency: Number of jobs graded at the same time by this worker
+            poll_interval: Seconds between polls when the queue is empty
+            sweep_interval: Seconds between sweeps for orphaned submissions
+        """
+        self.db = db
+        self.plan_loader = plan_loader
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.sweep_interval = sweep_interval
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._consume()) for _ in range(self.concurrency)]
+        self._tasks.append(asyncio.create_task(self._sweep()))
+        logger.info(f"Grading queue worker {self.name} started ({self.concurrency} consumers)")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """Wake idle consumers after a job was enqueued in this process"""
+        self._wakeup.set()
+
+    async def _sweep(self):
+        while True:
+            try:
+                created = await enqueue_orphaned_submissions(self.db)
+                if created:
+                    logger.warning(f"Queued grading of {created} pending submission(s) that had no job")
+                    self.notify()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Grading queue sweep failed: {e}")
+            await asyncio.sleep(self.sweep_interval)
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        now = _now()
+        return await self.db.grading_jobs.find_one_and_update(
+            {"$or": [
+                {"status": "pending", "available_at": {"$lte": now}},
+                {"status": "running", "lease_expires_at": {"$lt": now}},
+            ]},
+            {
+                "$set": {
+                    "status": "running",
+                    "worker": self.name,
+                    "lease_expires_at": now + timedelta(seconds=LEASE_SECONDS),
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("available_at", 1)],
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _consume(self):
+        while True:
+            try:
+                job = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Grading queue claim failed: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._process(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Recording the outcome failed; the lease expiry retries the job
+                logger.error(f"Grading queue bookkeeping failed for {job['submission_id']}: {e}")
+
+    async def _process(self, job: Dict[str, Any]):
+        submission_id = job["submission_id"]
+        try:
+            await self._grade(job)
+            await self.db.grading_jobs.update_one(
+                {"submission_id": submission_id},
+                {"$set": {"status": "done", "finished_at": _now(), "lease_expires_at": None, "last_error": None}}
+            )
+        except asyncio.CancelledError:
+            # The lease expires and another consumer picks the job up
+            raise
+        except Exception as e:
+            attempts = job.get("attempts", 1)
+            if attempts >= MAX_ATTEMPTS:
+                logger.error(f"Grading of submission {submission_id} failed permanently: {e}")
+                await self.db.grading_jobs.update_one(
+                    {"submission_id": submission_id},
+                    {"$set": {"status": "failed", "last_error": str(e), "finished_at": _now()}}
+                )
+                await self.db.submissions.update_one(
+                    {"id": submission_id}, {"$set": {"grading_status": GRADING_FAILED}}
+                )
+                return
+
+            delay = min(300, 2 ** attempts) * random.uniform(0.5, 1.5)
+            logger.warning(f"Grading of submission {submission_id} failed (attempt {attempts}), retrying in {delay:.0f}s: {e}")
+            await self.db.grading_jobs.update_one(
+                {"submission_id": submission_id},
+                {"$set": {
+                    "status": "pending",
+                    "available_at": _now() + timedelta(seconds=delay),
+                    "lease_expires_at": None,
+                    "last_error": str(e),
+                }}
+            )
+
+    async def _grade(self, job: Dict[str, Any]):
+        submission = await self.db.submissions.find_one(
+            {"id": job["submission_id"]}, {"_id": 0, "id": 1, "exam_id": 1, "answers": 1}
+        )
+        if submission is None:
+            # Deleted before it was graded; nothing to do
+            return
+
+        plan = await self.plan_loader(submission["exam_id"])
+        if plan is None:
+            raise ValueError(f"Exam {submission['exam_id']} not found")
+
+        results = await grade_submission_async(plan, submission.get("answers") or {})
+        await self.db.submissions.update_one(
+            # Never overwrite a score an admin has set, or a regrade has written, in the meantime
+            {"id": submission["id"], "manually_graded": {"$ne": True}, "grading_status": {"$ne": GRADING_DONE}},
+            {"$set": {
+                "score": results["score"],
+                "correct_answers": results["correct_answers"],
+                "total_questions": results["total_questions"],
+                "grading_status": GRADING_DONE,
+                "auto_graded_at": _now().isoformat(),
+            }}
+        )
+
+    async def stats(self) -> Dict[str, int]:
+        """Number of jobs per status"""
+        counts = {}
+        async for row in self.db.grading_jobs.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            counts[row["_id"]] = row["count"]
+        return counts
@@ -0,0 +1,67 @@
+"""
+Cursor Pagination
+Keyset pagination helpers for admin listings: opaque cursors and the
+filters that resume a sorted query after the last row of a page
+"""
+
+import base64
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+
+def encode_cursor(value: Any, row_id: str) -> str:
+    """Opaque cursor pointing after a row with the given sort value and id"""
+    raw = json.dumps([value, row_id], separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    """Inverse of encode_cursor(); raises 400 for malformed cursors"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(row_id, str):
+            raise ValueError
+        return value, row_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_filter(field: str, direction: int, value: Any, row_id: str) -> Dict[str, Any]:
+    """
+    Filter matching the rows that follow (value, row_id) in a query sorted
+    by {field: direction, "id": direction}.
+
+    MongoDB sorts null (and missing) values before everything else, while
+    range operators never match them, so nulls get their own branches.
+    """
+    after = "$gt" if direction == 1 else "$lt"
+    same_value_later_id = {field: value, "id": {after: row_id}}
+
+    if value is None:
+        if direction == 1:
+            return {"$or": [{field: {"$ne": None}}, same_value_later_id]}
+        return same_value_later_id
+
+    branches: List[Dict[str, Any]] = [{field: {after: value}}, same_value_later_id]
+    if direction == -1:
+        branches.append({field: None})
+    return {"$or": branches}
+
+
+def page_with_cursor(
+    rows: List[Dict[str, Any]],
+    limit: int,
+    sort_field: str
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Split rows fetched with limit + 1 into the page and the next cursor
+    (None on the last page)
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last.get(sort_field), last["id"])
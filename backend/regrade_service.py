@@ -0,0 +1,209 @@
+"""
+Bulk Re-grading Service
+Re-grades every submission of an exam against its current answer keys,
+in batches, with progress recorded in the regrade_jobs collection
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from grading_engine import grade_batch_with_plan, run_in_grading_pool
+from grading_queue import GRADING_DONE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+ACTIVE_STATUSES = ("queued", "running")
+# Active jobs without progress for this long are treated as abandoned
+STALE_JOB_SECONDS = 600
+
+
+def _timestamp() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _active_job_filter() -> Dict[str, Any]:
+    cutoff = (datetime.now(timezone.utc) - timedelta(seconds=STALE_JOB_SECONDS)).isoformat()
+    return {"status": {"$in": list(ACTIVE_STATUSES)}, "heartbeat_at": {"$gte": cutoff}}
+
+
+def _submission_filter(exam_id: str, include_manual: bool) -> Dict[str, Any]:
+    query: Dict[str, Any] = {"exam_id": exam_id}
+    if not include_manual:
+        # Scores set by an admin are left alone unless explicitly requested
+        query["manually_graded"] = {"$ne": True}
+    return query
+
+
+def _public_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    job = {k: v for k, v in job.items() if k != "_id"}
+    total = job.get("total") or 0
+    job["progress"] = round(job.get("processed", 0) / total * 100, 1) if total else (
+        100.0 if job.get("status") == "completed" else 0.0
+    )
+    return job
+
+
+async def create_regrade_job(
+    db: AsyncIOMotorDatabase,
+    job_id: str,
+    exam_id: str,
+    include_manual: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    created_by: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Record a queued re-grade job for an exam.
+
+    Returns None if a job for the exam is already queued or running.
+    """
+    # Abandoned jobs would otherwise hold the exam's active-job index slot
+    await fail_abandoned_jobs(db, exam_id)
+    if await db.regrade_jobs.find_one({"exam_id": exam_id, **_active_job_filter()}):
+        return None
+
+    total = await db.submissions.count_documents(_submission_filter(exam_id, include_manual))
+    job = {
+        "id": job_id,
+        "exam_id": exam_id,
+        "status": "queued",
+        "include_manual": include_manual,
+        "batch_size": batch_size,
+        "total": total,
+        "processed": 0,
+        "updated": 0,
+        "created_by": created_by,
+        "created_at": _timestamp(),
+        "heartbeat_at": _timestamp(),
+        "started_at": None,
+        "finished_at": None,
+        "error": None,
+    }
+    try:
+        await db.regrade_jobs.insert_one(job)
+    except DuplicateKeyError:
+        # A concurrent request queued a job for this exam after the check above
+        return None
+    return _public_job(job)
+
+
+async def get_regrade_job(db: AsyncIOMotorDatabase, job_id: str) -> Optional[Dict[str, Any]]:
+    job = await db.regrade_jobs.find_one({"id": job_id}, {"_id": 0})
+    return _public_job(job) if job else None
+
+
+async def _write_batch(
+    db: AsyncIOMotorDatabase,
+    plan: Dict[str, Any],
+    batch: List[Dict[str, Any]],
+    graded_at: str
+) -> int:
+    """
+    Grade one batch as a matrix and write the scores back in one bulk_write.
+    The batch's grading queue jobs are closed, so a pending retry cannot
+    overwrite the new scores.
+    """
+    results = await run_in_grading_pool(
+        grade_batch_with_plan, plan, [submission.get("answers") or {} for submission in batch]
+    )
+
+    operations = [
+        UpdateOne(
+            {"id": submission["id"]},
+            {"$set": {
+                "score": float(results["score"][row]),
+                "correct_answers": int(results["correct_answers"][row]),
+                "total_questions": int(results["total_questions"][row]),
+                "grading_status": GRADING_DONE,
+                "regraded_at": graded_at,
+            }}
+        )
+        for row, submission in enumerate(batch)
+    ]
+    result = await db.submissions.bulk_write(operations, ordered=False)
+    await db.grading_jobs.update_many(
+        {"submission_id": {"$in": [submission["id"] for submission in batch]}, "status": {"$ne": "done"}},
+        {"$set": {"status": "done", "finished_at": datetime.now(timezone.utc), "lease_expires_at": None, "last_error": None}}
+    )
+    return result.modified_count
+
+
+async def run_regrade_job(db: AsyncIOMotorDatabase, job_id: str, plan: Dict[str, Any]):
+    """
+    Stream the job's submissions in batches, grade and write each batch,
+    and record progress after every batch. Failures are stored on the job.
+    """
+    job = await db.regrade_jobs.find_one({"id": job_id}, {"_id": 0})
+    if not job:
+        return
+
+    batch_size = job.get("batch_size") or DEFAULT_BATCH_SIZE
+    graded_at = _timestamp()
+    processed = updated = 0
+    await db.regrade_jobs.update_one(
+        {"id": job_id}, {"$set": {"status": "running", "started_at": graded_at, "heartbeat_at": graded_at}}
+    )
+
+    try:
+        cursor = db.submissions.find(
+            _submission_filter(job["exam_id"], job.get("include_manual", False)),
+            {"_id": 0, "id": 1, "answers": 1}
+        ).batch_size(batch_size)
+
+        batch: List[Dict[str, Any]] = []
+        async for submission in cursor:
+            batch.append(submission)
+            if len(batch) < batch_size:
+                continue
+            updated += await _write_batch(db, plan, batch, graded_at)
+            processed += len(batch)
+            batch = []
+            await db.regrade_jobs.update_one(
+                {"id": job_id},
+                {"$set": {"processed": processed, "updated": updated, "heartbeat_at": _timestamp()}}
+            )
+
+        if batch:
+            updated += await _write_batch(db, plan, batch, graded_at)
+            processed += len(batch)
+
+        await db.regrade_jobs.update_one({"id": job_id}, {"$set": {
+            "status": "completed",
+            "processed": processed,
+            "updated": updated,
+            # Submissions may have been added or removed since the job was queued
+            "total": processed,
+            "finished_at": _timestamp(),
+        }})
+        logger.info(f"Regrade {job_id} of exam {job['exam_id']}: {processed} graded, {updated} changed")
+    except Exception as e:
+        logger.error(f"Regrade {job_id} failed after {processed} submissions: {e}")
+        await db.regrade_jobs.update_one({"id": job_id}, {"$set": {
+            "status": "failed",
+            "processed": processed,
+            "updated": updated,
+            "error": str(e),
+            "finished_at": _timestamp(),
+        }})
+
+
+async def fail_abandoned_jobs(db: AsyncIOMotorDatabase, exam_id: Optional[str] = None) -> int:
+    """
+    Mark active jobs without a heartbeat for STALE_JOB_SECONDS as failed,
+    e.g. jobs whose process was restarted. Jobs still making progress in
+    another API process are left alone. Limited to one exam if exam_id is given.
+    """
+    cutoff = (datetime.now(timezone.utc) - timedelta(seconds=STALE_JOB_SECONDS)).isoformat()
+    query: Dict[str, Any] = {"status": {"$in": list(ACTIVE_STATUSES)}, "heartbeat_at": {"$lt": cutoff}}
+    if exam_id is not None:
+        query["exam_id"] = exam_id
+    result = await db.regrade_jobs.update_many(
+        query,
+        {"$set": {"status": "failed", "error": "Abandoned (no progress)", "finished_at": _timestamp()}}
+    )
+    return result.modified_count
@@ -1,17 +1,17 @@
-from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Cookie, Request, Response
-from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, APIRouter, HTTPException, Cookie, Request, Response, BackgroundTasks, Query
+from fastapi.responses import StreamingResponse, FileResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
+import math
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional, Dict, Any
 import uuid
+import re
 from datetime import datetime, timezone
-import shutil
 # from init_ielts_test import init_ielts_test
 # from init_reading_test import init_reading_test
 # from init_writing_test import init_writing_test
@@ -28,7 +28,18 @@ from new_question_type_schemas import (
     is_auto_gradable,
     get_all_question_types
 )
-from grading_engine import grade_submission
+from grading_engine import compile_grading_plan, grade_submission_async, start_grading_executor, shutdown_grading_executor
+from exam_cache import exam_tree_cache, EncodedPayload, PUBLISHED_EXAMS_KEY
+from db_indexes import reconcile_indexes
+from exam_status import STATUS_FIELDS, ExamStatusBroadcaster, ExamStatusSnapshot, exam_status_payload, status_version
+from regrade_service import create_regrade_job, get_regrade_job, run_regrade_job, fail_abandoned_jobs
+from grading_queue import GradingQueueWorker, enqueue_grading, GRADING_PENDING, GRADING_DONE
+from pagination import decode_cursor, keyset_filter, page_with_cursor
+from draft_autosave import DraftAutosaver, DraftConflict
+from audio_delivery import AudioLibrary, AudioTranscoder
+from audio_upload import receive_track_upload, ResumableUploads, UploadNotFound, UploadBusy, OffsetMismatch
+from audio_analysis import AudioAnalyzer
+from pymongo.errors import DuplicateKeyError
 # from auto_import_handler import AutoImportHandler  # TODO: Fix missing functions before re-enabling
 
 
@@ -44,6 +55,31 @@ db = client[os.environ['DB_NAME']]
 LISTENING_TRACKS_DIR = Path("/app/listening_tracks")
 LISTENING_TRACKS_DIR.mkdir(exist_ok=True)
 
+# Listening tracks are served with byte ranges and transcoded into
+# lower-bitrate renditions; AUDIO_UPLINK_MBPS lets the rendition choice
+# share the server's uplink between concurrent listeners
+audio_library = AudioLibrary(
+    LISTENING_TRACKS_DIR,
+    rendition_kbps=[int(kbps) for kbps in os.environ.get('AUDIO_RENDITION_KBPS', '48,96,160').split(',') if kbps.strip()],
+    uplink_kbps=int(float(os.environ.get('AUDIO_UPLINK_MBPS', '0')) * 1000)
+)
+AUDIO_UPLOAD_EXTENSIONS = ['.mp3', '.wav', '.m4a', '.ogg', '.flac']
+# Partial resumable uploads are deleted after AUDIO_UPLOAD_EXPIRY_HOURS without progress
+resumable_uploads = ResumableUploads(
+    LISTENING_TRACKS_DIR,
+    AUDIO_UPLOAD_EXTENSIONS,
+    expiry_seconds=float(os.environ.get('AUDIO_UPLOAD_EXPIRY_HOURS', '24')) * 3600
+)
+# Duration, levels, section gaps and waveform peaks of each stored track
+audio_analyzer = AudioAnalyzer(
+    LISTENING_TRACKS_DIR,
+    concurrency=int(os.environ.get('AUDIO_ANALYSIS_CONCURRENCY', '2'))
+)
+audio_transcoder = AudioTranscoder(
+    audio_library,
+    concurrency=int(os.environ.get('AUDIO_TRANSCODE_CONCURRENCY', '1'))
+)
+
 # Create the main app without a prefix
 app = FastAPI(title="IELTS Listening Test Platform API")
 
@@ -92,6 +128,7 @@ class Exam(BaseModel):
     exam_type: Optional[str] = "listening"  # "listening" or "reading"
     audio_url: Optional[str] = None
     audio_source_method: Optional[str] = None
+    audio_analysis: Optional[Dict[str, Any]] = None  # Set for uploaded tracks, see audio_analysis.py
     loop_audio: bool = False
     duration_seconds: int = 1800
     published: bool = False
@@ -146,6 +183,18 @@ class SubmissionCreate(BaseModel):
     started_at: Optional[str] = None
     finished_at: Optional[str] = None
     progress_percent: int = 100
+    # Autosaved draft to finalize; its answers are merged beneath `answers`
+    draft_id: Optional[str] = None
+
+class AudioUploadCreate(BaseModel):
+    filename: str
+    size: int  # Total bytes the client will send
+
+class DraftAnswersUpdate(BaseModel):
+    exam_id: str
+    answers: Dict[str, Any] = {}
+    last_playback_time: Optional[int] = None
+    progress_percent: Optional[int] = None
 
 class Submission(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -162,6 +211,7 @@ class Submission(BaseModel):
     score: Optional[int] = None
     total_questions: Optional[int] = None
     correct_answers: Optional[int] = None
+    grading_status: Optional[str] = None
     student_name: Optional[str] = None
     student_email: Optional[str] = None
     is_published: bool = False
@@ -220,6 +270,108 @@ def generate_id():
 def get_timestamp():
     return datetime.now(timezone.utc).isoformat()
 
+async def load_exam_tree(exam_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Load an exam with its sections and questions in a single round trip.
+    Both $lookup stages join on indexed equality fields, and the flat
+    question list is grouped per section in memory.
+    Returns {"exam": ..., "sections": [...]} or None if the exam is missing.
+    """
+    pipeline = [
+        {"$match": {"id": exam_id}},
+        {"$limit": 1},
+        {"$lookup": {"from": "sections", "localField": "id", "foreignField": "exam_id", "as": "sections"}},
+        {"$lookup": {"from": "questions", "localField": "sections.id", "foreignField": "section_id", "as": "questions"}},
+        {"$project": {"_id": 0, "sections._id": 0, "questions._id": 0}},
+    ]
+    docs = await db.exams.aggregate(pipeline).to_list(1)
+    if not docs:
+        return None
+
+    exam = docs[0]
+    sections = sorted(exam.pop("sections"), key=lambda s: s.get("index", 0))
+    questions_by_section: Dict[str, List[Dict[str, Any]]] = {section["id"]: [] for section in sections}
+    for question in exam.pop("questions"):
+        questions_by_section.setdefault(question["section_id"], []).append(question)
+
+    for section in sections:
+        section["questions"] = sorted(questions_by_section[section["id"]], key=lambda q: q.get("index", 0))
+
+    return {"exam": exam, "sections": sections}
+
+async def load_exam_version(exam_id: str) -> Optional[str]:
+    """updated_at of an exam (None if it does not exist), to revalidate cached trees"""
+    exam = await db.exams.find_one({"id": exam_id}, {"_id": 0, "updated_at": 1})
+    return exam.get("updated_at", "") if exam else None
+
+async def get_exam_tree(exam_id: str) -> Optional[Dict[str, Any]]:
+    """Cached load_exam_tree(). The returned tree is shared and must not be mutated."""
+    return await exam_tree_cache.get_or_load(exam_id, load_exam_tree, load_exam_version)
+
+def build_grading_plan(exam_tree: Dict[str, Any]) -> Dict[str, Any]:
+    questions = [question for section in exam_tree["sections"] for question in section["questions"]]
+    return compile_grading_plan(questions, exam_tree["exam"].get("exam_type"))
+
+def get_grading_plan(exam_id: str, exam_tree: Dict[str, Any]) -> Dict[str, Any]:
+    """Compiled grading plan of an exam, built once per saved version and cached with its tree"""
+    return exam_tree_cache.derive(exam_id, "grading_plan", exam_tree, build_grading_plan)
+
+EXAM_STATUS_PROJECTION = {
+    "_id": 0, "id": 1, "is_active": 1, "started_at": 1, "stopped_at": 1,
+    "published": 1, "is_visible": 1, "status_updated_at": 1
+}
+
+async def load_exam_statuses(exam_ids: List[str]) -> List[Dict[str, Any]]:
+    """Status payloads for several exams in one query"""
+    exams = await db.exams.find({"id": {"$in": exam_ids}}, EXAM_STATUS_PROJECTION).to_list(len(exam_ids))
+    return [exam_status_payload(exam) for exam in exams]
+
+# Pushes start/stop/publish transitions to students watching the status stream
+exam_status_broadcaster = ExamStatusBroadcaster(
+    load_exam_statuses,
+    resync_interval=float(os.environ.get('EXAM_STATUS_RESYNC_SECONDS', '15'))
+)
+SSE_HEARTBEAT_SECONDS = 20
+
+# Answers batched status polling without a query per exam
+exam_status_snapshot = ExamStatusSnapshot(
+    load_exam_statuses,
+    max_age=float(os.environ.get('EXAM_STATUS_SNAPSHOT_SECONDS', '2'))
+)
+
+EXAM_METADATA_PROJECTION = {"_id": 0, "id": 1, "title": 1, "description": 1, "exam_type": 1}
+
+async def load_exam_metadata(exam_ids: List[str]) -> List[Dict[str, Any]]:
+    """Titles and descriptions of several exams in one query"""
+    return await db.exams.find({"id": {"$in": exam_ids}}, EXAM_METADATA_PROJECTION).to_list(len(exam_ids))
+
+async def load_grading_plan(exam_id: str) -> Optional[Dict[str, Any]]:
+    """Grading plan of an exam for the grading queue (None if the exam is missing)"""
+    exam_tree = await get_exam_tree(exam_id)
+    return get_grading_plan(exam_id, exam_tree) if exam_tree else None
+
+# Buffers draft answer autosaves and writes them in batches
+draft_autosaver = DraftAutosaver(
+    db,
+    flush_interval=float(os.environ.get('DRAFT_FLUSH_SECONDS', '2'))
+)
+DRAFT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+# GRADING_MODE=sync grades inside POST /submissions; GRADING_MODE=queue stores
+# the answers, queues a grading job and returns at once
+GRADING_MODE = os.environ.get('GRADING_MODE', 'sync')
+grading_queue_worker = GradingQueueWorker(
+    db,
+    load_grading_plan,
+    concurrency=int(os.environ.get('GRADING_QUEUE_CONSUMERS', '4'))
+)
+
+def notify_exam_status(exam: Dict[str, Any]):
+    """Push an exam's new status to the status stream and the polling snapshot"""
+    status = exam_status_payload(exam)
+    exam_status_snapshot.update(status)
+    exam_status_broadcaster.publish(status)
+
 # Exam Routes
 @api_router.post("/exams", response_model=Exam)
 async def create_exam(exam_data: ExamCreate):
@@ -239,6 +391,7 @@ async def create_exam(exam_data: ExamCreate):
             "published": False,
             "created_at": now,
             "updated_at": now,
+            "status_updated_at": now,
             "is_demo": exam_data.is_demo,
             "question_count": 0,
             "submission_count": 0,
@@ -278,16 +431,45 @@ async def get_all_exams():
         logger.error(f"Error fetching exams: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch exams")
 
+async def load_published_exams(_key: str) -> List[Dict[str, Any]]:
+    """Published AND visible exams, validated through the Exam model"""
+    exams = await db.exams.find({"published": True, "is_visible": {"$ne": False}}, {"_id": 0}).to_list(1000)
+    return [Exam(**exam).model_dump() for exam in exams]
+
 @api_router.get("/exams/published", response_model=List[Exam])
-async def get_published_exams():
+async def get_published_exams(request: Request):
     try:
-        # Filter for both published AND visible exams
-        exams = await db.exams.find({"published": True, "is_visible": {"$ne": False}}, {"_id": 0}).to_list(1000)
-        return [Exam(**exam) for exam in exams]
+        # Listing and its encoded body are cached until the next exam write
+        exams = await exam_tree_cache.get_or_load(PUBLISHED_EXAMS_KEY, load_published_exams)
+        payload = exam_tree_cache.derive(PUBLISHED_EXAMS_KEY, "payload", exams, EncodedPayload.from_data)
+        return payload.to_response(request)
     except Exception as e:
         logger.error(f"Error fetching published exams: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch published exams")
 
+@api_router.get("/exams/status")
+async def get_exam_statuses(ids: str, since: Optional[int] = None):
+    """
+    Public endpoint: status of several exams in one request, for polling.
+    version is the newest status_updated_at (epoch ms) among the exams; clients send it
+    back as since and get an empty 204 while nothing has changed.
+    """
+    exam_ids = list(dict.fromkeys(exam_id for exam_id in ids.split(",") if exam_id))[:50]
+    if not exam_ids:
+        raise HTTPException(status_code=400, detail="At least one exam id is required")
+    
+    try:
+        statuses = await exam_status_snapshot.get_many(exam_ids)
+    except Exception as e:
+        logger.error(f"Error fetching exam statuses: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch exam statuses")
+    
+    version = max((status_version(status) for status in statuses), default=0)
+    if since is not None and since >= version:
+        return Response(status_code=204)
+    
+    return {"version": version, "statuses": statuses}
+
 @api_router.get("/exams/{exam_id}", response_model=Exam)
 async def get_exam(exam_id: str):
     try:
@@ -301,11 +483,48 @@ async def get_exam(exam_id: str):
         logger.error(f"Error fetching exam: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch exam")
 
+async def exam_audio_summary(exam_id: str, source: Path, analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Analysis summary stored on an exam as audio_analysis"""
+    section_count = await db.sections.count_documents({"exam_id": exam_id})
+    return audio_analyzer.exam_summary(analysis, f"/api/audio/{source.name}/analysis", section_count)
+
+async def exam_audio_analysis(exam_id: str, audio_url: str) -> Optional[Dict[str, Any]]:
+    """
+    audio_analysis for an exam whose audio_url is being set: the summary if
+    the track was analysed already, otherwise None and the analysis is
+    scheduled in the background and stored on the exam when it finishes.
+    External URLs are not analysed.
+    """
+    source = audio_library.source_for_url(audio_url)
+    if source is None:
+        return None
+    analysis = await audio_analyzer.cached(source)
+    if analysis is not None:
+        return await exam_audio_summary(exam_id, source, analysis)
+    
+    async def store_summary(analysis: Dict[str, Any]):
+        summary = await exam_audio_summary(exam_id, source, analysis)
+        # Only if the exam still uses this track
+        result = await db.exams.update_one(
+            {"id": exam_id, "audio_url": audio_url},
+            {"$set": {"audio_analysis": summary, "updated_at": get_timestamp()}}
+        )
+        if result.modified_count:
+            exam_tree_cache.invalidate(exam_id)
+    
+    audio_analyzer.schedule(source, store_summary)
+    return None
+
 @api_router.put("/exams/{exam_id}", response_model=Exam)
 async def update_exam(exam_id: str, exam_data: ExamUpdate):
     try:
         update_data = {k: v for k, v in exam_data.model_dump().items() if v is not None}
         update_data["updated_at"] = get_timestamp()
+        if any(field in update_data for field in STATUS_FIELDS):
+            update_data["status_updated_at"] = update_data["updated_at"]
+        
+        if "audio_url" in update_data:
+            update_data["audio_analysis"] = await exam_audio_analysis(exam_id, update_data["audio_url"])
         
         result = await db.exams.update_one(
             {"id": exam_id}, 
@@ -314,8 +533,10 @@ async def update_exam(exam_id: str, exam_data: ExamUpdate):
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Exam not found")
+        exam_tree_cache.invalidate(exam_id)
         
         exam = await db.exams.find_one({"id": exam_id}, {"_id": 0})
+        notify_exam_status(exam)
         return Exam(**exam)
     except HTTPException:
         raise
@@ -344,6 +565,7 @@ async def delete_exam(exam_id: str):
         await db.sections.delete_many({"exam_id": exam_id})
         if section_ids:
             await db.questions.delete_many({"section_id": {"$in": section_ids}})
+        exam_tree_cache.invalidate(exam_id)
         
         return {"message": "Exam deleted successfully"}
     except HTTPException:
@@ -396,6 +618,7 @@ async def create_question(question_data: QuestionCreate):
             {"id": question_data.exam_id},
             {"$inc": {"question_count": 1}, "$set": {"updated_at": get_timestamp()}}
         )
+        exam_tree_cache.invalidate(question_data.exam_id)
         
         return Question(**new_question)
     except HTTPException:
@@ -439,6 +662,7 @@ async def update_question(question_id: str, question_data: Dict[str, Any]):
             {"id": question["exam_id"]},
             {"$set": {"updated_at": get_timestamp()}}
         )
+        exam_tree_cache.invalidate(question["exam_id"])
         
         updated_question = await db.questions.find_one({"id": question_id}, {"_id": 0})
         return Question(**updated_question)
@@ -462,10 +686,10 @@ async def delete_question(question_id: str):
         # Delete question
         await db.questions.delete_one({"id": question_id})
         
-        # Update question count on exam and timestamp
+        # Update question count on exam
         await db.exams.update_one(
             {"id": question["exam_id"]},
-            {"$inc": {"question_count": -1}, "$set": {"updated_at": get_timestamp()}}
+            {"$inc": {"question_count": -1}}
         )
         
         # Re-index remaining questions in the section
@@ -481,6 +705,14 @@ async def delete_question(question_id: str):
                     {"$set": {"index": idx}}
                 )
         
+        # Bump the exam version only once the section is renumbered, so a
+        # revalidating cache never stores a half re-indexed tree under it
+        await db.exams.update_one(
+            {"id": question["exam_id"]},
+            {"$set": {"updated_at": get_timestamp()}}
+        )
+        exam_tree_cache.invalidate(question["exam_id"])
+        
         return {"message": "Question deleted successfully"}
     except HTTPException:
         raise
@@ -498,27 +730,16 @@ async def get_section_questions(section_id: str):
         raise HTTPException(status_code=500, detail="Failed to fetch questions")
 
 @api_router.get("/exams/{exam_id}/full")
-async def get_exam_with_sections_and_questions(exam_id: str):
+async def get_exam_with_sections_and_questions(exam_id: str, request: Request):
     try:
-        # Get exam
-        exam = await db.exams.find_one({"id": exam_id}, {"_id": 0})
-        if not exam:
+        # Served from memory; on a miss exam, sections and questions load in one round trip
+        exam_tree = await get_exam_tree(exam_id)
+        if not exam_tree:
             raise HTTPException(status_code=404, detail="Exam not found")
-        
-        # Get sections
-        sections = await db.sections.find({"exam_id": exam_id}, {"_id": 0}).sort("index", 1).to_list(1000)
-        
-        # Get questions for each section
-        sections_with_questions = []
-        for section in sections:
-            questions = await db.questions.find({"section_id": section["id"]}, {"_id": 0}).sort("index", 1).to_list(1000)
-            section["questions"] = questions
-            sections_with_questions.append(section)
-        
-        return {
-            "exam": exam,
-            "sections": sections_with_questions
-        }
+
+        # Pre-encoded body with gzip/brotli variants; If-None-Match gets a 304
+        payload = exam_tree_cache.derive(exam_id, "payload", exam_tree, EncodedPayload.from_data)
+        return payload.to_response(request)
     except HTTPException:
         raise
     except Exception as e:
@@ -533,10 +754,11 @@ async def create_submission(
     session_token: Optional[str] = Cookie(None)
 ):
     try:
-        # Check if exam exists
-        exam = await db.exams.find_one({"id": submission_data.exam_id}, {"_id": 0})
-        if not exam:
+        # Check if exam exists (exam, sections and questions come from the exam cache)
+        exam_tree = await get_exam_tree(submission_data.exam_id)
+        if not exam_tree:
             raise HTTPException(status_code=404, detail="Exam not found")
+        exam = exam_tree["exam"]
         
         # Get current user if authenticated
         user = await AuthService.get_current_user(request, db, session_token)
@@ -544,7 +766,8 @@ async def create_submission(
         # Use authenticated user ID or provided session ID
         user_id = user["id"] if user else (submission_data.user_id_or_session or f"anonymous_{generate_id()}")
         
-        # Check if student has already submitted this exam
+        # Check if student has already submitted this exam (friendly early
+        # answer; concurrent attempts are rejected by the unique attempt index)
         if user:
             existing_submission = await db.submissions.find_one({
                 "exam_id": submission_data.exam_id,
@@ -556,25 +779,36 @@ async def create_submission(
                     detail="You have already submitted this exam. Each student can attempt an exam only once."
                 )
         
-        # Get all questions for auto-grading
-        sections = await db.sections.find({"exam_id": submission_data.exam_id}, {"_id": 0}).to_list(1000)
-        all_questions = []
-        for section in sections:
-            questions = await db.questions.find({"section_id": section["id"]}, {"_id": 0}).to_list(1000)
-            all_questions.extend(questions)
-        
-        # Use new grading engine for all question types
-        grading_results = grade_submission(
-            questions=all_questions,
-            student_answers=submission_data.answers,
-            exam_type=exam.get("exam_type")
-        )
-        
-        score = grading_results["score"]
-        correct_count = grading_results["correct_answers"]
-        total_questions = grading_results["total_questions"]
-        
+        # Finalize from the autosaved draft: the request only needs to carry
+        # answers the draft endpoint has not acknowledged yet
+        answers = submission_data.answers
+        last_playback_time = 0
         submission_id = generate_id()
+        if submission_data.draft_id:
+            if not DRAFT_ID_PATTERN.match(submission_data.draft_id):
+                raise HTTPException(status_code=400, detail="Invalid draft id")
+            draft = await draft_autosaver.load(submission_data.draft_id)
+            if draft:
+                if draft["exam_id"] != submission_data.exam_id or draft.get("user_id_or_session") != (user["id"] if user else None):
+                    raise HTTPException(status_code=409, detail="Draft belongs to another exam or user")
+                answers = {**draft.get("answers", {}), **answers}
+                last_playback_time = draft.get("last_playback_time") or 0
+            submission_id = submission_data.draft_id
+        
+        if GRADING_MODE == "queue":
+            # Graded later by a grading queue consumer
+            score = correct_count = total_questions = None
+            grading_status = GRADING_PENDING
+        else:
+            # Grade against the exam's compiled answer keys (runs in the grading pool)
+            grading_plan = get_grading_plan(submission_data.exam_id, exam_tree)
+            grading_results = await grade_submission_async(grading_plan, answers)
+            
+            score = grading_results["score"]
+            correct_count = grading_results["correct_answers"]
+            total_questions = grading_results["total_questions"]
+            grading_status = GRADING_DONE
+        
         now = get_timestamp()
         
         new_submission = {
@@ -584,24 +818,39 @@ async def create_submission(
             "user_id_or_session": user_id,
             "started_at": submission_data.started_at or now,
             "finished_at": submission_data.finished_at or now,
-            "answers": submission_data.answers,
+            "answers": answers,
             "progress_percent": submission_data.progress_percent,
-            "last_playback_time": 0,
+            "last_playback_time": last_playback_time,
             "score": score,
             "total_questions": total_questions,
             "correct_answers": correct_count,
+            "grading_status": grading_status,
             "student_name": user.get("full_name", "Anonymous") if user else "Anonymous",
             "student_email": user.get("email", "") if user else "",
             "is_published": False,
             "published_at": None
         }
         
-        await db.submissions.insert_one({**new_submission, "_id": submission_id})
-        
-        # Update exam submission count
+        try:
+            await db.submissions.insert_one({**new_submission, "_id": submission_id})
+        except DuplicateKeyError:
+            # Same draft finalized twice, or a concurrent attempt by the same
+            # student (unique (exam_id, user_id_or_session) index)
+            raise HTTPException(status_code=409, detail="This attempt has already been submitted")
+        if submission_data.draft_id:
+            draft_autosaver.discard(submission_id)
+            await db.submission_drafts.delete_one({"id": submission_id})
+        if grading_status == GRADING_PENDING:
+            # If this never runs, the grading queue's orphan sweep enqueues the submission
+            await enqueue_grading(db, submission_id, submission_data.exam_id)
+            grading_queue_worker.notify()
+        
+        # Update exam submission count (cached exam trees are deliberately not
+        # invalidated here; submission_count is not used by the exam player).
+        # updated_at is left alone: it versions the exam's content, not its counters
         await db.exams.update_one(
             {"id": submission_data.exam_id},
-            {"$inc": {"submission_count": 1}, "$set": {"updated_at": get_timestamp()}}
+            {"$inc": {"submission_count": 1}}
         )
         
         # Return submission WITHOUT score for students (score hidden until published)
@@ -617,6 +866,62 @@ async def create_submission(
         logger.error(f"Error creating submission: {e}")
         raise HTTPException(status_code=500, detail="Failed to create submission")
 
+@api_router.patch("/submissions/{submission_id}/answers")
+async def autosave_submission_answers(
+    submission_id: str,
+    update: DraftAnswersUpdate,
+    request: Request,
+    session_token: Optional[str] = Cookie(None)
+):
+    """
+    Autosave a draft of an attempt in progress.
+    
+    submission_id is chosen by the client and becomes the submission's id when
+    the attempt is finalized with POST /submissions {"draft_id": ...}. Only
+    changed answers need to be sent (null removes an answer). Updates are
+    buffered and written in batches, so the response only confirms receipt.
+    """
+    if not DRAFT_ID_PATTERN.match(submission_id):
+        raise HTTPException(status_code=400, detail="Invalid draft id")
+    if any(not key or "." in key or key.startswith("$") for key in update.answers):
+        raise HTTPException(status_code=400, detail="Invalid answer key")
+    
+    user = await AuthService.get_current_user(request, db, session_token)
+    fields = {
+        name: value for name, value in (
+            ("last_playback_time", update.last_playback_time),
+            ("progress_percent", update.progress_percent),
+        ) if value is not None
+    }
+    
+    try:
+        await draft_autosaver.record(
+            submission_id, update.exam_id, user["id"] if user else None, update.answers, fields
+        )
+    except DraftConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    return {"id": submission_id, "status": "accepted", "answers_received": len(update.answers)}
+
+@api_router.get("/submissions/{submission_id}/answers")
+async def get_submission_draft(
+    submission_id: str,
+    request: Request,
+    session_token: Optional[str] = Cookie(None)
+):
+    """Get an autosaved draft, e.g. to resume an attempt after a reload"""
+    draft = await draft_autosaver.load(submission_id)
+    if not draft:
+        raise HTTPException(status_code=404, detail="Draft not found")
+    
+    user = await AuthService.get_current_user(request, db, session_token)
+    if draft.get("user_id_or_session") and draft["user_id_or_session"] != (user["id"] if user else None):
+        raise HTTPException(status_code=403, detail="Draft belongs to another user")
+    
+    draft.pop("touched_at", None)
+    draft.setdefault("answers", {})
+    return draft
+
 @api_router.get("/submissions/{submission_id}", response_model=Submission)
 async def get_submission(submission_id: str):
     try:
@@ -651,18 +956,16 @@ async def get_submission_detailed(submission_id: str):
         if not submission:
             raise HTTPException(status_code=404, detail="Submission not found")
         
-        # Get exam details
-        exam = await db.exams.find_one({"id": submission["exam_id"]}, {"_id": 0})
-        if not exam:
+        # Get exam details with all sections and questions
+        exam_tree = await load_exam_tree(submission["exam_id"])
+        if not exam_tree:
             raise HTTPException(status_code=404, detail="Exam not found")
-        
-        # Get all sections and questions for this exam
-        sections = await db.sections.find({"exam_id": submission["exam_id"]}, {"_id": 0}).sort("index", 1).to_list(1000)
-        
+        exam = exam_tree["exam"]
+
         detailed_sections = []
-        for section in sections:
-            questions = await db.questions.find({"section_id": section["id"]}, {"_id": 0}).sort("index", 1).to_list(1000)
-            
+        for section in exam_tree["sections"]:
+            questions = section.pop("questions")
+
             # Add student answer and correct answer to each question
             for question in questions:
                 question_index = str(question["index"])
@@ -750,42 +1053,48 @@ async def update_submission_score(
         raise HTTPException(status_code=500, detail="Failed to update submission score")
 
 # Audio File Upload Route
+async def publish_stored_track(stored: Dict[str, Any]) -> Dict[str, Any]:
+    """Queue renditions and the analysis of a track that has just been stored; returns the upload response"""
+    # Return the URL path to access the file
+    audio_url = f"/listening_tracks/{stored['filename']}"
+    file_path = LISTENING_TRACKS_DIR / stored["filename"]
+    
+    # Lower-bitrate renditions and the analysis are produced in the background
+    transcoding = audio_transcoder.schedule(file_path)
+    analysis = await audio_analyzer.cached(file_path)
+    if analysis is None:
+        audio_analyzer.schedule(file_path)
+    
+    if stored["created"]:
+        logger.info(f"Audio file uploaded successfully: {stored['filename']}")
+    else:
+        logger.info(f"Audio file upload matched stored track {stored['filename']}")
+    
+    return {
+        "message": "Audio file uploaded successfully",
+        "filename": stored["filename"],
+        "audio_url": audio_url,
+        "size": stored["size"],
+        "sha256": stored["sha256"],
+        "deduplicated": not stored["created"],
+        "transcoding": transcoding,
+        # Null until the analysis has run; analysis_url waits for it
+        "duration_seconds": analysis["duration_seconds"] if analysis else None,
+        "analysis_url": f"/api/audio/{stored['filename']}/analysis"
+    }
+
+
 @api_router.post("/upload-audio")
-async def upload_audio_file(file: UploadFile = File(...)):
+async def upload_audio_file(request: Request):
     """
-    Upload an audio file to the listening_tracks directory.
+    Upload an audio file (multipart form field "file") to the listening_tracks directory.
+    The file is streamed to disk as it arrives and stored under its SHA-256,
+    so uploading the same track twice reuses the stored file.
     Returns the URL path to access the uploaded file.
     """
     try:
-        # Validate file type
-        allowed_extensions = ['.mp3', '.wav', '.m4a', '.ogg', '.flac']
-        file_ext = Path(file.filename).suffix.lower()
-        
-        if file_ext not in allowed_extensions:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Invalid file type. Allowed types: {', '.join(allowed_extensions)}"
-            )
-        
-        # Generate unique filename
-        unique_filename = f"{generate_id()}{file_ext}"
-        file_path = LISTENING_TRACKS_DIR / unique_filename
-        
-        # Save file in chunks to handle large files
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Return the URL path to access the file
-        audio_url = f"/listening_tracks/{unique_filename}"
-        
-        logger.info(f"Audio file uploaded successfully: {unique_filename}")
-        
-        return {
-            "message": "Audio file uploaded successfully",
-            "filename": unique_filename,
-            "audio_url": audio_url,
-            "size": os.path.getsize(file_path)
-        }
+        stored = await receive_track_upload(request, LISTENING_TRACKS_DIR, AUDIO_UPLOAD_EXTENSIONS)
+        return await publish_stored_track(stored)
         
     except HTTPException:
         raise
@@ -794,6 +1103,129 @@ async def upload_audio_file(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Failed to upload audio file: {str(e)}")
 
 
+# Resumable audio uploads (tus-style): create, PATCH chunks at Upload-Offset,
+# HEAD for the current offset after an interruption, then complete
+@api_router.post("/uploads/audio", status_code=201)
+async def create_audio_upload(upload_data: AudioUploadCreate, response: Response):
+    meta = await resumable_uploads.create(upload_data.filename, upload_data.size)
+    response.headers["Location"] = f"/api/uploads/audio/{meta['id']}"
+    response.headers["Upload-Offset"] = "0"
+    return {"upload_id": meta["id"], "offset": 0, "size": meta["size"]}
+
+
+@api_router.head("/uploads/audio/{upload_id}")
+async def get_audio_upload_offset(upload_id: str):
+    try:
+        meta = await resumable_uploads.status(upload_id)
+    except UploadNotFound:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return Response(status_code=200, headers={
+        "Upload-Offset": str(meta["offset"]),
+        "Upload-Length": str(meta["size"]),
+        "Cache-Control": "no-store",
+    })
+
+
+@api_router.patch("/uploads/audio/{upload_id}")
+async def append_audio_upload(upload_id: str, request: Request):
+    """Body: the bytes starting at the Upload-Offset header (application/offset+octet-stream)"""
+    if request.headers.get("content-type", "").split(";")[0].strip() != "application/offset+octet-stream":
+        raise HTTPException(status_code=415, detail="Content-Type must be application/offset+octet-stream")
+    offset = request.headers.get("upload-offset", "")
+    if not offset.isdigit():
+        raise HTTPException(status_code=400, detail="Missing or invalid Upload-Offset header")
+    
+    try:
+        meta = await resumable_uploads.append(upload_id, int(offset), request)
+    except UploadNotFound:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except UploadBusy:
+        raise HTTPException(status_code=409, detail="Upload is in use by another request")
+    except OffsetMismatch as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Upload-Offset": str(e.offset)})
+    return Response(status_code=204, headers={"Upload-Offset": str(meta["offset"])})
+
+
+@api_router.post("/uploads/audio/{upload_id}/complete")
+async def complete_audio_upload(upload_id: str):
+    try:
+        stored = await resumable_uploads.finish(upload_id)
+    except UploadNotFound:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except UploadBusy:
+        raise HTTPException(status_code=409, detail="Upload is in use by another request")
+    except OffsetMismatch as e:
+        raise HTTPException(status_code=409, detail=f"Upload is incomplete: {e}", headers={"Upload-Offset": str(e.offset)})
+    return await publish_stored_track(stored)
+
+
+@api_router.delete("/uploads/audio/{upload_id}", status_code=204)
+async def cancel_audio_upload(upload_id: str):
+    try:
+        await resumable_uploads.cancel(upload_id)
+    except UploadNotFound:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except UploadBusy:
+        raise HTTPException(status_code=409, detail="Upload is in use by another request")
+    return Response(status_code=204)
+
+
+@api_router.get("/audio/{filename}/analysis")
+async def get_audio_analysis(filename: str):
+    """
+    Analysis sidecar of an uploaded track: duration, levels, silent gaps and
+    a waveform peak array (0-255, peaks_seconds_per_bucket apart), so
+    players can draw and seek without downloading the track.
+    """
+    source = audio_library.source_for_url(f"/listening_tracks/{filename}")
+    if source is None:
+        raise HTTPException(status_code=404, detail="Audio file not found")
+    
+    analysis = await audio_analyzer.ensure(source)
+    if analysis is None:
+        raise HTTPException(status_code=422, detail="Audio file could not be decoded for analysis")
+    
+    # Stored tracks are content-addressed, so their analysis never changes
+    return FileResponse(
+        audio_analyzer.sidecar_path(source),
+        media_type="application/json",
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
+
+
+@api_router.get("/audio/{filename}/renditions")
+async def get_audio_renditions(
+    filename: str,
+    request: Request,
+    bandwidth_kbps: Optional[int] = Query(None, ge=1),
+    save_data: bool = False
+):
+    """
+    List the renditions of an uploaded track and recommend the one this
+    listener should stream, from the bandwidth the client reports (query
+    parameter, or the Downlink / Save-Data client hints) and the current
+    share of the server uplink. The player should use the recommended URL
+    for the whole playback so that its range requests hit one file.
+    """
+    source = audio_library.source_for_url(f"/listening_tracks/{filename}")
+    if source is None:
+        raise HTTPException(status_code=404, detail="Audio file not found")
+    
+    if bandwidth_kbps is None:
+        # Downlink is in Mbps; malformed, infinite, NaN or non-positive hints are ignored
+        try:
+            downlink_mbps = float(request.headers.get("downlink") or 0)
+        except ValueError:
+            downlink_mbps = 0
+        if math.isfinite(downlink_mbps) and downlink_mbps > 0:
+            bandwidth_kbps = max(1, int(downlink_mbps * 1000))
+    save_data = save_data or request.headers.get("save-data", "").lower() == "on"
+    
+    result = audio_library.choose(source, bandwidth_kbps, save_data)
+    result["transcoding"] = audio_transcoder.is_pending(source)
+    return result
+
+
 # ============================================================================
 # AUTO-IMPORT TEST FROM JSON
 # ============================================================================
@@ -862,6 +1294,29 @@ async def upload_audio_file(file: UploadFile = File(...)):
 # AUTHENTICATION ENDPOINTS
 # ============================================================================
 
+def set_session_cookie(response: Response, token: str):
+    """Set the httpOnly session cookie (lifetime follows the session mode)"""
+    if AuthService.uses_signed_tokens():
+        max_age = AuthService.SESSION_JWT_TTL_MINUTES * 60
+    else:
+        max_age = AuthService.SESSION_EXPIRY_DAYS * 24 * 60 * 60
+    response.set_cookie(
+        key="session_token",
+        value=token,
+        httponly=True,
+        secure=True,
+        samesite="none",
+        max_age=max_age,
+        path="/"
+    )
+
+async def start_student_session(student: Dict[str, Any], emergent_token: str) -> str:
+    """Create the session for a logged-in student and return the cookie token"""
+    if AuthService.uses_signed_tokens():
+        return AuthService.issue_session_token(student, student.get("email") in ADMIN_EMAILS)
+    await AuthService.create_session(db, student["id"], emergent_token)
+    return emergent_token
+
 @api_router.post("/auth/session")
 async def create_auth_session(data: SessionExchange, response: Response):
     """
@@ -883,18 +1338,10 @@ async def create_auth_session(data: SessionExchange, response: Response):
         
         if existing_student:
             # Student exists, create session and return
-            await AuthService.create_session(db, existing_student["id"], session_token)
+            session_token = await start_student_session(existing_student, session_token)
             
             # Set httpOnly cookie
-            response.set_cookie(
-                key="session_token",
-                value=session_token,
-                httponly=True,
-                secure=True,
-                samesite="none",
-                max_age=7 * 24 * 60 * 60,  # 7 days
-                path="/"
-            )
+            set_session_cookie(response, session_token)
             
             return {
                 "user": Student(**existing_student).model_dump(),
@@ -922,18 +1369,10 @@ async def create_auth_session(data: SessionExchange, response: Response):
             }
             
             await db.students.insert_one(student)
-            await AuthService.create_session(db, student_id, session_token)
+            session_token = await start_student_session(student, session_token)
             
             # Set httpOnly cookie
-            response.set_cookie(
-                key="session_token",
-                value=session_token,
-                httponly=True,
-                secure=True,
-                samesite="none",
-                max_age=7 * 24 * 60 * 60,
-                path="/"
-            )
+            set_session_cookie(response, session_token)
             
             return {
                 "user": {
@@ -955,7 +1394,7 @@ async def create_auth_session(data: SessionExchange, response: Response):
 @api_router.get("/auth/me")
 async def get_current_student(request: Request, session_token: Optional[str] = Cookie(None)):
     """Get current authenticated student"""
-    user = await AuthService.get_current_user(request, db, session_token)
+    user = await AuthService.get_current_student(request, db, session_token)
     if not user:
         raise HTTPException(status_code=401, detail="Not authenticated")
     return Student(**user).model_dump()
@@ -964,6 +1403,8 @@ async def get_current_student(request: Request, session_token: Optional[str] = C
 async def logout(request: Request, response: Response, session_token: Optional[str] = Cookie(None)):
     """Logout current user"""
     if session_token:
+        if AuthService.uses_signed_tokens():
+            await AuthService.revoke_session_token(db, session_token)
         await AuthService.delete_session(db, session_token)
     
     response.delete_cookie(
@@ -998,15 +1439,21 @@ async def complete_student_profile(
         {"id": user["id"]},
         {"$set": update_data}
     )
+    AuthService.invalidate_user(user["id"])
     
     # Get updated student
     updated_student = await db.students.find_one({"id": user["id"]})
+    if user.get("from_token"):
+        # Re-issue so the token carries the completed name
+        request.state.refreshed_session_token = AuthService.issue_session_token(
+            updated_student, user.get("is_admin", False)
+        )
     return Student(**updated_student).model_dump()
 
 @api_router.get("/students/me")
 async def get_my_profile(request: Request, session_token: Optional[str] = Cookie(None)):
     """Get current student's full profile"""
-    user = await AuthService.get_current_user(request, db, session_token)
+    user = await AuthService.get_current_student(request, db, session_token)
     AuthService.require_auth(user)
     return Student(**user).model_dump()
 
@@ -1016,16 +1463,19 @@ async def get_my_submissions(request: Request, session_token: Optional[str] = Co
     user = await AuthService.get_current_user(request, db, session_token)
     AuthService.require_auth(user)
     
-    # Get all submissions for this student
+    # Get all submissions for this student (answers are only needed on the detail views)
     submissions = await db.submissions.find(
         {"user_id_or_session": user["id"]},
-        {"_id": 0}
+        {"_id": 0, "answers": 0}
     ).to_list(1000)
     
-    # Enrich submissions with exam details
+    # Enrich submissions with exam details from the exam metadata cache
+    exams = await exam_tree_cache.get_metadata_many(
+        [sub["exam_id"] for sub in submissions], load_exam_metadata
+    )
     enriched_submissions = []
     for sub in submissions:
-        exam = await db.exams.find_one({"id": sub["exam_id"]}, {"_id": 0})
+        exam = exams.get(sub["exam_id"])
         if exam:
             enriched_submissions.append({
                 **sub,
@@ -1066,40 +1516,129 @@ async def get_exam_attempt_status(
 # ADMIN ENDPOINTS - Student Management
 # ============================================================================
 
+STUDENT_SORT_FIELDS = {"created_at", "full_name", "email", "institution"}
+
 @api_router.get("/admin/students")
-async def get_all_students(request: Request, session_token: Optional[str] = Cookie(None)):
-    """Admin only: Get all students"""
+async def get_all_students(
+    request: Request,
+    response: Response,
+    search: Optional[str] = None,
+    sort: str = "created_at",
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: int = Query(10000, ge=1, le=10000),
+    cursor: Optional[str] = None,
+    session_token: Optional[str] = Cookie(None)
+):
+    """
+    Admin only: Get students with their submission counts.
+    
+    search matches words in name, email and institution (text index).
+    Paginated like /admin/submissions: the body is a list and the
+    X-Next-Cursor header holds the cursor of the next page.
+    """
     user = await AuthService.get_current_user(request, db, session_token)
     AuthService.require_admin(user, ADMIN_EMAILS)
     
-    students = await db.students.find({}, {"_id": 0}).to_list(10000)
+    if sort not in STUDENT_SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {sorted(STUDENT_SORT_FIELDS)}")
+    direction = 1 if order == "asc" else -1
+    
+    query: Dict[str, Any] = {}
+    if search and search.strip():
+        query["$text"] = {"$search": search.strip()}
+    if cursor:
+        last_value, last_id = decode_cursor(cursor)
+        query.update(keyset_filter(sort, direction, last_value, last_id))
+    
+    students = await db.students.find(query, {"_id": 0}).sort(
+        [(sort, direction), ("id", direction)]
+    ).limit(limit + 1).to_list(limit + 1)
+    students, next_cursor = page_with_cursor(students, limit, sort)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
-    # Add submission counts
+    # Submission counts of the whole page in one $group
+    counts = {
+        row["_id"]: row["count"]
+        async for row in db.submissions.aggregate([
+            {"$match": {"user_id_or_session": {"$in": [student["id"] for student in students]}}},
+            {"$group": {"_id": "$user_id_or_session", "count": {"$sum": 1}}},
+        ])
+    }
     for student in students:
-        submission_count = await db.submissions.count_documents(
-            {"user_id_or_session": student["id"]}
-        )
-        student["submission_count"] = submission_count
+        student["submission_count"] = counts.get(student["id"], 0)
     
     return students
 
+# Each has a (field, id) index, alone and behind exam_id (see db_indexes.py).
+# Student name and exam title are not sortable: the listing shows their
+# current values from students/exams, not the copies stored on the submission
+SUBMISSION_SORT_FIELDS = {"finished_at", "started_at", "score"}
+
 @api_router.get("/admin/submissions")
-async def get_all_submissions_admin(request: Request, session_token: Optional[str] = Cookie(None)):
-    """Admin only: Get all submissions with student details"""
+async def get_all_submissions_admin(
+    request: Request,
+    response: Response,
+    exam_id: Optional[str] = None,
+    institution: Optional[str] = None,
+    published: Optional[bool] = None,
+    sort: str = "finished_at",
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: int = Query(10000, ge=1, le=10000),
+    cursor: Optional[str] = None,
+    session_token: Optional[str] = Cookie(None)
+):
+    """
+    Admin only: Get submissions with student details.
+    
+    Filters by exam, student institution and published state, sorted server-side
+    by one of SUBMISSION_SORT_FIELDS. The body stays a plain list; when more
+    rows exist, the X-Next-Cursor header carries the cursor of the next page.
+    """
     user = await AuthService.get_current_user(request, db, session_token)
     AuthService.require_admin(user, ADMIN_EMAILS)
     
-    submissions = await db.submissions.find({}, {"_id": 0}).to_list(10000)
+    if sort not in SUBMISSION_SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {sorted(SUBMISSION_SORT_FIELDS)}")
+    direction = 1 if order == "asc" else -1
+    
+    query: Dict[str, Any] = {}
+    if exam_id:
+        query["exam_id"] = exam_id
+    if published is not None:
+        query["is_published"] = True if published else {"$ne": True}
+    if institution:
+        student_ids = await db.students.distinct("id", {"institution": institution})
+        query["user_id_or_session"] = {"$in": student_ids}
+    if cursor:
+        last_value, last_id = decode_cursor(cursor)
+        query = {"$and": [query, keyset_filter(sort, direction, last_value, last_id)]}
+    
+    submissions = await db.submissions.find(query, {"_id": 0}).sort(
+        [(sort, direction), ("id", direction)]
+    ).limit(limit + 1).to_list(limit + 1)
+    submissions, next_cursor = page_with_cursor(submissions, limit, sort)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    
+    # Enrich with student and exam data: one $in query per collection
+    user_ids = list({sub["user_id_or_session"] for sub in submissions})
+    exam_ids = list({sub["exam_id"] for sub in submissions})
+    students = {
+        student["id"]: student
+        async for student in db.students.find(
+            {"id": {"$in": user_ids}}, {"_id": 0, "id": 1, "full_name": 1, "email": 1, "institution": 1}
+        )
+    }
+    exams = {
+        exam["id"]: exam
+        async for exam in db.exams.find({"id": {"$in": exam_ids}}, {"_id": 0, "id": 1, "title": 1})
+    }
     
-    # Enrich with student and exam data
     enriched_submissions = []
     for sub in submissions:
-        # Get student info
-        student = await db.students.find_one({"id": sub["user_id_or_session"]}, {"_id": 0})
-        
-        # Get exam info
-        exam = await db.exams.find_one({"id": sub["exam_id"]}, {"_id": 0})
-        
+        student = students.get(sub["user_id_or_session"])
+        exam = exams.get(sub["exam_id"])
         enriched_submissions.append({
             **sub,
             "student_name": student.get("full_name", "Unknown") if student else "Unknown",
@@ -1127,6 +1666,9 @@ async def delete_student(
     
     # Also delete their sessions and submissions
     await db.sessions.delete_many({"user_id": student_id})
+    AuthService.invalidate_user(student_id)
+    if AuthService.uses_signed_tokens():
+        await AuthService.revoke_user_tokens(db, student_id)
     await db.submissions.delete_many({"user_id_or_session": student_id})
     
     return {"message": "Student deleted successfully"}
@@ -1155,16 +1697,19 @@ async def start_exam(
                     "is_active": True,
                     "started_at": now,
                     "stopped_at": None,
-                    "updated_at": now
+                    "updated_at": now,
+                    "status_updated_at": now
                 }
             }
         )
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Exam not found")
+        exam_tree_cache.invalidate(exam_id)
         
-        # Return updated exam
+        # Return updated exam and notify students watching it
         updated_exam = await db.exams.find_one({"id": exam_id}, {"_id": 0})
+        notify_exam_status(updated_exam)
         return Exam(**updated_exam)
     except HTTPException:
         raise
@@ -1194,16 +1739,19 @@ async def stop_exam(
                 "$set": {
                     "is_active": False,
                     "stopped_at": now,
-                    "updated_at": now
+                    "updated_at": now,
+                    "status_updated_at": now
                 }
             }
         )
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Exam not found")
+        exam_tree_cache.invalidate(exam_id)
         
-        # Return updated exam
+        # Return updated exam and notify students watching it
         updated_exam = await db.exams.find_one({"id": exam_id}, {"_id": 0})
+        notify_exam_status(updated_exam)
         return Exam(**updated_exam)
     except HTTPException:
         raise
@@ -1215,26 +1763,51 @@ async def stop_exam(
 async def get_exam_status(exam_id: str):
     """Public endpoint: Get exam status for polling"""
     try:
-        exam = await db.exams.find_one(
-            {"id": exam_id}, 
-            {"_id": 0, "is_active": 1, "started_at": 1, "stopped_at": 1, "published": 1}
-        )
+        exam = await db.exams.find_one({"id": exam_id}, EXAM_STATUS_PROJECTION)
         if not exam:
             raise HTTPException(status_code=404, detail="Exam not found")
         
-        return {
-            "exam_id": exam_id,
-            "is_active": exam.get("is_active", False),
-            "started_at": exam.get("started_at"),
-            "stopped_at": exam.get("stopped_at"),
-            "published": exam.get("published", False)
-        }
+        return exam_status_payload(exam)
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error fetching exam status: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch exam status")
 
+@api_router.get("/exams/status/stream")
+async def stream_exam_status(ids: str, request: Request):
+    """
+    Public endpoint: server-sent events for exam status transitions.
+    Sends the current status of each exam in ids (comma separated) on connect,
+    then a "status" event whenever an exam is started, stopped, published,
+    hidden or edited. Replaces per-exam polling of /exams/{exam_id}/status.
+    """
+    exam_ids = [exam_id for exam_id in ids.split(",") if exam_id][:50]
+    if not exam_ids:
+        raise HTTPException(status_code=400, detail="At least one exam id is required")
+    
+    subscriber = await exam_status_broadcaster.subscribe(exam_ids)
+    
+    async def event_stream():
+        try:
+            # Ask EventSource to reconnect after 5 seconds if the stream drops
+            yield b"retry: 5000\n\n"
+            while not await request.is_disconnected():
+                frames = await subscriber.next_frames(timeout=SSE_HEARTBEAT_SECONDS)
+                if not frames:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield b": keepalive\n\n"
+                for frame in frames:
+                    yield frame
+        finally:
+            exam_status_broadcaster.unsubscribe(subscriber)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @api_router.put("/admin/exams/{exam_id}/visibility")
 async def toggle_exam_visibility(
     exam_id: str,
@@ -1251,16 +1824,20 @@ async def toggle_exam_visibility(
             raise HTTPException(status_code=404, detail="Exam not found")
         
         # Update visibility
+        now = get_timestamp()
         await db.exams.update_one(
             {"id": exam_id},
             {"$set": {
                 "is_visible": is_visible,
-                "updated_at": datetime.now(timezone.utc).isoformat()
+                "updated_at": now,
+                "status_updated_at": now
             }}
         )
+        exam_tree_cache.invalidate(exam_id)
         
-        # Get updated exam
+        # Get updated exam and notify students watching it
         updated_exam = await db.exams.find_one({"id": exam_id}, {"_id": 0})
+        notify_exam_status(updated_exam)
         admin_email = request.headers.get("X-Admin-Email", "unknown")
         logger.info(f"Admin {admin_email} set exam {exam_id} visibility to {is_visible}")
         
@@ -1271,6 +1848,57 @@ async def toggle_exam_visibility(
         logger.error(f"Error toggling exam visibility: {e}")
         raise HTTPException(status_code=500, detail="Failed to toggle exam visibility")
 
+# Bulk Re-grading Endpoints (Admin only)
+@api_router.post("/admin/exams/{exam_id}/regrade")
+async def regrade_exam_submissions(
+    exam_id: str,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    include_manual: bool = False,
+    batch_size: int = 1000
+):
+    """
+    Admin only: Re-grade every submission of an exam against its current answer keys.
+    Runs in the background; poll GET /admin/regrade-jobs/{job_id} for progress.
+    Manually graded submissions are skipped unless include_manual is set.
+    """
+    require_admin_access(request)
+    
+    if batch_size < 1 or batch_size > 10000:
+        raise HTTPException(status_code=400, detail="batch_size must be between 1 and 10000")
+    
+    # Grade against the keys as saved now, not a cached copy
+    exam_tree_cache.invalidate(exam_id)
+    exam_tree = await get_exam_tree(exam_id)
+    if not exam_tree:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    grading_plan = get_grading_plan(exam_id, exam_tree)
+    
+    job = await create_regrade_job(
+        db,
+        generate_id(),
+        exam_id,
+        include_manual=include_manual,
+        batch_size=batch_size,
+        created_by=request.headers.get("X-Admin-Email")
+    )
+    if job is None:
+        raise HTTPException(status_code=409, detail="A regrade of this exam is already running")
+    
+    background_tasks.add_task(run_regrade_job, db, job["id"], grading_plan)
+    logger.info(f"Regrade {job['id']} queued for exam {exam_id} ({job['total']} submissions)")
+    return job
+
+@api_router.get("/admin/regrade-jobs/{job_id}")
+async def get_regrade_job_progress(job_id: str, request: Request):
+    """Admin only: Progress of a regrade job"""
+    require_admin_access(request)
+    
+    job = await get_regrade_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Regrade job not found")
+    return job
+
 # Result Publishing Endpoints (Admin only)
 @api_router.put("/admin/exams/{exam_id}/publish-results")
 async def publish_exam_results(
@@ -1393,8 +2021,10 @@ app.include_router(get_ai_import_router())
 app.include_router(get_track_router())
 app.include_router(auto_import_router)  # Auto-import for exam JSON uploads
 
-# Mount static files for serving audio files
-app.mount("/listening_tracks", StaticFiles(directory=str(LISTENING_TRACKS_DIR)), name="listening_tracks")
+# Serve audio files (originals and renditions) with byte-range support
+@app.api_route("/listening_tracks/{file_path:path}", methods=["GET", "HEAD"])
+async def serve_listening_track(file_path: str, request: Request):
+    return await audio_library.response(request, file_path)
 
 app.add_middleware(
     CORSMiddleware,
@@ -1402,11 +2032,29 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Location", "Upload-Offset", "Upload-Length"],
 )
 
+if AuthService.uses_signed_tokens():
+    @app.middleware("http")
+    async def refresh_session_cookie(request: Request, call_next):
+        """Send the sliding-refresh session token issued while handling the request"""
+        response = await call_next(request)
+        refreshed_token = getattr(request.state, "refreshed_session_token", None)
+        if refreshed_token:
+            set_session_cookie(response, refreshed_token)
+        return response
+
 @app.on_event("startup")
 async def startup_db():
     """Initialize IELTS tests and database indexes on startup"""
+    # Grading runs off the event loop: GRADING_EXECUTOR=thread|process|inline
+    grading_workers = os.environ.get('GRADING_WORKERS')
+    start_grading_executor(
+        os.environ.get('GRADING_EXECUTOR', 'thread'),
+        int(grading_workers) if grading_workers else None
+    )
+    
     # Initialize default tests (commented out - files removed during rebuild)
     # await init_ielts_test()
     # await init_reading_test()
@@ -1433,17 +2081,54 @@ async def startup_db():
     except Exception as e:
         logger.error(f"Error initializing Question Type Preview Test: {str(e)}")
     
-    # Create indexes for new collections
+    # Reconcile indexes with the registry in db_indexes.py
     try:
-        # Tracks indexes
-        await db.tracks.create_index([("track_type", 1), ("status", 1)])
-        await db.tracks.create_index([("created_by", 1)])
-        await db.tracks.create_index([("exam_id", 1)])
-        
-        logger.info("Database indexes created successfully")
+        report = await reconcile_indexes(db)
+        logger.info(f"Database indexes reconciled ({len(report['created'])} created)")
+        for name in report["created"]:
+            logger.info(f"Created index {name}")
+        for name in report["extra"]:
+            logger.warning(f"Index not in registry: {name}")
+        for problem in report["mismatched"] + report["errors"]:
+            logger.warning(f"Index problem: {problem}")
+    except Exception as e:
+        logger.warning(f"Error reconciling indexes: {e}")
+    
+    # Consume the grading queue in this process (GRADING_QUEUE_CONSUMERS=0
+    # leaves it to standalone workers, see scripts/grading_worker.py)
+    if GRADING_MODE == "queue" and grading_queue_worker.concurrency > 0:
+        grading_queue_worker.start()
+    
+    draft_autosaver.start()
+    AuthService.start_http_client()
+    
+    resumable_uploads.start()
+    
+    # Transcode tracks uploaded while renditions were not being produced
+    backfilled = audio_transcoder.backfill()
+    if backfilled:
+        logger.info(f"Transcoding renditions for {backfilled} listening track(s)")
+    
+    # Signed session tokens: keep the revocation list in sync
+    if AuthService.uses_signed_tokens():
+        AuthService.revocations.start(db)
+    
+    try:
+        abandoned = await fail_abandoned_jobs(db)
+        if abandoned:
+            logger.warning(f"Marked {abandoned} abandoned regrade job(s) as failed")
     except Exception as e:
-        logger.warning(f"Error creating indexes: {e}")
+        logger.warning(f"Error checking regrade jobs: {e}")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await exam_status_broadcaster.close()
+    await grading_queue_worker.stop()
+    await draft_autosaver.close()
+    await audio_transcoder.close()
+    await audio_analyzer.close()
+    await resumable_uploads.close()
+    await AuthService.revocations.stop()
+    await AuthService.close_http_client()
+    shutdown_grading_executor()
     client.close()
\ No newline at end of file
@@ -9,6 +9,8 @@ from typing import List, Optional, Literal
 from datetime import datetime
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
+from exam_cache import invalidate_exam_cache
+
 router = APIRouter()
 
 # ============================================
@@ -152,6 +154,7 @@ async def update_track(
                 exam_update["description"] = update_data.description
             
             await db.exams.update_one({"id": track["exam_id"]}, {"$set": exam_update})
+            invalidate_exam_cache(track["exam_id"])
         
         return {"success": True, "message": "Track updated successfully"}
         
@@ -7,6 +7,7 @@ import FooterNavigation from './FooterNavigation';
 import NotesSystem from './features/NotesSystem';
 import TextHighlighter from './features/TextHighlighter';
 import HelpModal from './HelpModal';
+import { AudioService } from '../../services/AudioService';
 import '../../styles/exam/base.css';
 import '../../styles/exam/banner.css';
 import '../../styles/exam/navigation.css';
@@ -17,6 +18,22 @@ import '../../styles/exam/tools.css';
 import '../../styles/exam/custom.css';
 import '../../styles/exam/question-types.css';
 
+// Answers are autosaved to the server at this interval
+const DRAFT_SAVE_INTERVAL_MS = 5000;
+// Answers acknowledged this recently are re-sent on submit, in case the
+// server has not flushed them yet
+const DRAFT_RESEND_WINDOW_MS = 15000;
+
+const getDraftId = (examId) => {
+  const key = `exam-draft-${examId}`;
+  let draftId = localStorage.getItem(key);
+  if (!draftId) {
+    draftId = window.crypto?.randomUUID ? window.crypto.randomUUID() : `draft-${Date.now()}-${Math.random().toString(36).slice(2)}`;
+    localStorage.setItem(key, draftId);
+  }
+  return draftId;
+};
+
 const ExamInterface = ({ examId }) => {
   const [exam, setExam] = useState(null);
   const [currentQuestion, setCurrentQuestion] = useState(1);
@@ -32,6 +49,9 @@ const ExamInterface = ({ examId }) => {
   
   const contentRef = useRef(null);
   const audioRef = useRef(null);
+  // Answers not yet acknowledged by the draft endpoint, and ack times of sent ones
+  const unsavedAnswersRef = useRef({});
+  const savedAtRef = useRef({});
 
   useEffect(() => {
     loadExam();
@@ -59,10 +79,41 @@ const ExamInterface = ({ examId }) => {
     return () => clearInterval(timer);
   }, [timeLeft]);
 
+  useEffect(() => {
+    if (!exam) return;
+
+    const saveDraft = async () => {
+      const changed = { ...unsavedAnswersRef.current };
+      if (Object.keys(changed).length === 0) return;
+
+      try {
+        const { BackendService } = await import('../../services/BackendService');
+        await BackendService.saveDraftAnswers(getDraftId(examId), {
+          exam_id: examId,
+          answers: changed,
+          last_playback_time: Math.floor(audioRef.current?.currentTime || 0),
+        });
+        const now = Date.now();
+        Object.entries(changed).forEach(([key, value]) => {
+          // Keep answers that changed again while the request was in flight
+          if (unsavedAnswersRef.current[key] === value) {
+            delete unsavedAnswersRef.current[key];
+          }
+          savedAtRef.current[key] = now;
+        });
+      } catch (error) {
+        console.error('Failed to autosave answers:', error);
+      }
+    };
+
+    const interval = setInterval(saveDraft, DRAFT_SAVE_INTERVAL_MS);
+    return () => clearInterval(interval);
+  }, [exam, examId]);
+
   const loadExam = async () => {
     try {
       // Load exam from Backend API
-      const { default: BackendService } = await import('../../services/BackendService');
+      const { BackendService } = await import('../../services/BackendService');
       const fullExamData = await BackendService.getExamWithSectionsAndQuestions(examId);
       
       // Backend returns {exam: {...}, sections: [...]}
@@ -75,7 +126,7 @@ const ExamInterface = ({ examId }) => {
         title: examData.title,
         type: examData.exam_type || 'listening',
         duration: examData.duration_seconds || 3600,
-        audioUrl: examData.audio_url,
+        audioUrl: await AudioService.resolvePlaybackUrl(examData.audio_url),
         candidateName: 'Student',
         candidateNumber: 'STU-12345',
         totalQuestions: examData.question_count || 40,
@@ -89,6 +140,8 @@ const ExamInterface = ({ examId }) => {
       if (savedProgress) {
         const progress = JSON.parse(savedProgress);
         setAnswers(progress.answers || {});
+        // Server copy of the draft may predate the last local save
+        unsavedAnswersRef.current = { ...(progress.answers || {}) };
         setReviewMarked(progress.reviewMarked || []);
         setNotes(progress.notes || []);
         setHighlights(progress.highlights || []);
@@ -100,6 +153,7 @@ const ExamInterface = ({ examId }) => {
   };
 
   const handleAnswerChange = (questionIndex, value) => {
+    unsavedAnswersRef.current[questionIndex] = value;
     setAnswers(prev => ({
       ...prev,
       [questionIndex]: value
@@ -145,13 +199,23 @@ const ExamInterface = ({ examId }) => {
     }
 
     try {
-      const { default: BackendService } = await import('../../services/BackendService');
+      const { BackendService } = await import('../../services/BackendService');
+      
+      // The autosaved draft holds most answers; only send the ones that may not have reached it
+      const now = Date.now();
+      const answersToSend = {};
+      Object.entries(answers).forEach(([key, value]) => {
+        if (key in unsavedAnswersRef.current || !savedAtRef.current[key] || now - savedAtRef.current[key] < DRAFT_RESEND_WINDOW_MS) {
+          answersToSend[key] = value;
+        }
+      });
       
       // Submit to backend
       await BackendService.createSubmission({
         exam_id: examId,
         user_id_or_session: 'anonymous-' + Date.now(),
-        answers: answers,
+        draft_id: getDraftId(examId),
+        answers: answersToSend,
         exam_type: exam.type || 'listening',
         time_taken: exam.duration - (timeLeft || 0),
         progress_percent: (Object.keys(answers).length / (exam.totalQuestions || 40)) * 100
@@ -159,6 +223,7 @@ const ExamInterface = ({ examId }) => {
       
       // Clear progress from localStorage
       localStorage.removeItem(`exam-progress-${examId}`);
+      localStorage.removeItem(`exam-draft-${examId}`);
       
       alert('Test submitted successfully!');
       window.location.href = '/student/dashboard';
@@ -48,17 +48,6 @@ export function StudentDashboard() {
       const publishedExams = await BackendService.getPublishedExams();
       setExams(publishedExams);
 
-      const statuses = {};
-      for (const exam of publishedExams) {
-        try {
-          const status = await BackendService.getExamStatus(exam.id);
-          statuses[exam.id] = status;
-        } catch (error) {
-          console.error(`Error loading status for exam ${exam.id}:`, error);
-        }
-      }
-      setExamStatuses(statuses);
-
       if (user?.uid) {
         const studentSubmissions = await FirebaseAuthService.getStudentSubmissions(user.uid);
         setSubmissions(studentSubmissions);
@@ -96,18 +85,29 @@ export function StudentDashboard() {
 
   useEffect(() => {
     if (exams.length === 0) return;
+    const handleStatus = (status) => {
+      setExamStatuses(prev => ({ ...prev, [status.exam_id]: status }));
+    };
+
+    // Pushed status updates; the stream sends the current status on connect
+    if (typeof EventSource !== 'undefined') {
+      return BackendService.subscribeExamStatuses(exams.map(exam => exam.id), handleStatus);
+    }
+
+    // Fallback: one batched request per tick, empty while nothing changed
+    let version = null;
     const pollStatuses = async () => {
-      const statuses = {};
-      for (const exam of exams) {
-        try {
-          const status = await BackendService.getExamStatus(exam.id);
-          statuses[exam.id] = status;
-        } catch (error) {
-          console.error(`Error polling status for exam ${exam.id}:`, error);
+      try {
+        const result = await BackendService.getExamStatuses(exams.map(exam => exam.id), version);
+        if (result) {
+          version = result.version;
+          result.statuses.forEach(handleStatus);
         }
+      } catch (error) {
+        console.error('Error polling exam statuses:', error);
       }
-      setExamStatuses(statuses);
     };
+    pollStatuses();
     const interval = setInterval(pollStatuses, 3000);
     return () => clearInterval(interval);
   }, [exams]);
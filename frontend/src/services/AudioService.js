@@ -3,19 +3,56 @@ import axios from 'axios';
 // Get backend URL from environment variable
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8001';
 
+const UPLOAD_CHUNK_BYTES = 5 * 1024 * 1024;
+const UPLOAD_MAX_RETRIES = 8;
+
 // Audio service for handling audio uploads and validation
 export const AudioService = {
-  uploadLocalAudio: async (file) => {
+  // Resumable upload: the file is sent in chunks, and after a network error
+  // the upload continues from the last byte the server stored
+  uploadLocalAudio: async (file, onProgress) => {
     try {
-      const formData = new FormData();
-      formData.append('file', file);
-
-      const response = await axios.post(`${BACKEND_URL}/api/upload-audio`, formData, {
-        headers: {
-          'Content-Type': 'multipart/form-data',
-        },
-        timeout: 300000, // 5 minutes timeout for large files
+      const { data: upload } = await axios.post(`${BACKEND_URL}/api/uploads/audio`, {
+        filename: file.name,
+        size: file.size,
       });
+      const uploadUrl = `${BACKEND_URL}/api/uploads/audio/${upload.upload_id}`;
+
+      let offset = 0;
+      let failures = 0;
+      while (offset < file.size) {
+        try {
+          const response = await axios.patch(uploadUrl, file.slice(offset, offset + UPLOAD_CHUNK_BYTES), {
+            headers: {
+              'Content-Type': 'application/offset+octet-stream',
+              'Upload-Offset': String(offset),
+            },
+            timeout: 120000,
+          });
+          offset = Number(response.headers['upload-offset']);
+          failures = 0;
+          if (onProgress) {
+            onProgress(Math.round((offset / file.size) * 100));
+          }
+        } catch (error) {
+          // Retry network errors, offset conflicts and server errors
+          const status = error.response?.status;
+          failures += 1;
+          if (failures > UPLOAD_MAX_RETRIES || (status && status !== 409 && status < 500)) {
+            throw error;
+          }
+          await new Promise((resolve) => setTimeout(resolve, Math.min(30000, 1000 * 2 ** failures)));
+          // Ask the server how much it has kept before resuming
+          try {
+            const head = await axios.head(uploadUrl);
+            offset = Number(head.headers['upload-offset']);
+          } catch (headError) {
+            console.error('Could not read the upload offset, retrying:', headError);
+          }
+        }
+      }
+
+      const response = await axios.post(`${uploadUrl}/complete`, null, { timeout: 300000 });
 
       if (response.data && response.data.audio_url) {
         // Return the full URL to access the audio file
@@ -46,4 +83,35 @@ export const AudioService = {
       return false;
     }
   },
+
+  // Pick the rendition of an uploaded track that suits this connection.
+  // The returned URL should be used for the whole playback so that every
+  // range request reads the same file.
+  resolvePlaybackUrl: async (audioUrl) => {
+    const match = audioUrl && audioUrl.match(/\/listening_tracks\/([^/?#]+)$/);
+    if (!match) {
+      return audioUrl;
+    }
+
+    const origin = audioUrl.slice(0, audioUrl.length - match[0].length);
+    const connection = navigator.connection || {};
+    const params = {};
+    if (connection.downlink) {
+      params.bandwidth_kbps = Math.round(connection.downlink * 1000);
+    }
+    if (connection.saveData) {
+      params.save_data = true;
+    }
+
+    try {
+      const response = await axios.get(`${BACKEND_URL}/api/audio/${match[1]}/renditions`, {
+        params,
+        timeout: 5000,
+      });
+      return `${origin}${response.data.recommended}`;
+    } catch (error) {
+      console.error('Falling back to the original audio track:', error);
+      return audioUrl;
+    }
+  },
 };
\ No newline at end of file
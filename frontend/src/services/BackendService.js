@@ -136,6 +136,39 @@ export const BackendService = {
     }
   },
 
+  // Status of several exams in one request. Pass the last returned version as
+  // `since`; resolves to null when nothing changed (204).
+  getExamStatuses: async (examIds, since = null) => {
+    try {
+      const params = { ids: examIds.join(',') };
+      if (since !== null) {
+        params.since = since;
+      }
+      const response = await api.get('/exams/status', { params });
+      return response.status === 204 ? null : response.data;
+    } catch (error) {
+      console.error('Error fetching exam statuses:', error);
+      throw new Error('Failed to fetch exam statuses');
+    }
+  },
+
+  // Subscribe to pushed status changes of several exams (server-sent events).
+  // onStatus receives the same shape as getExamStatus; returns an unsubscribe function.
+  subscribeExamStatuses: (examIds, onStatus) => {
+    const ids = examIds.map(encodeURIComponent).join(',');
+    const source = new EventSource(`${BACKEND_URL}/api/exams/status/stream?ids=${ids}`);
+    source.addEventListener('status', (event) => {
+      try {
+        onStatus(JSON.parse(event.data));
+      } catch (error) {
+        console.error('Error parsing exam status event:', error);
+      }
+    });
+    // EventSource reconnects on its own after network errors
+    source.onerror = () => console.warn('Exam status stream interrupted, reconnecting...');
+    return () => source.close();
+  },
+
   toggleExamVisibility: async (examId, isVisible, adminEmail) => {
     try {
       const response = await api.put(`/admin/exams/${examId}/visibility?is_visible=${isVisible}`, {}, {
@@ -276,6 +309,12 @@ export const BackendService = {
   },
 
   // Submission operations
+  // Autosave changed answers of an attempt in progress (null removes an answer)
+  saveDraftAnswers: async (draftId, draftData) => {
+    const response = await api.patch(`/submissions/${draftId}/answers`, draftData);
+    return response.data;
+  },
+
   createSubmission: async (submissionData) => {
     try {
       // Use longer timeout for submissions (30 seconds)
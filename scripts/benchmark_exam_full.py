@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark for GET /api/exams/{exam_id}/full assembly.
+
+Compares the old per-section query loop (N+1 round trips) with the
+single-aggregation load_exam_tree() against a local mongod.
+Seeds a throwaway database with exams of 4 and 40 sections (10 questions each)
+and drops it afterwards.
+
+Usage:
+    MONGO_URL=mongodb://localhost:27017 python scripts/benchmark_exam_full.py [--runs 200]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.append(str(BACKEND_DIR))
+
+# Point the server module at a throwaway database before importing it
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ["DB_NAME"] = os.environ.get("BENCH_DB_NAME", "ielts_benchmark")
+
+import server  # noqa: E402
+
+QUESTIONS_PER_SECTION = 10
+SECTION_COUNTS = [4, 40]
+
+
+async def seed_exam(db, section_count):
+    """Create an exam with the given number of sections"""
+    exam_id = f"bench-exam-{section_count}"
+    now = server.get_timestamp()
+    await db.exams.insert_one({
+        "_id": exam_id,
+        "id": exam_id,
+        "title": f"Benchmark exam ({section_count} sections)",
+        "description": "Benchmark data",
+        "exam_type": "listening",
+        "duration_seconds": 2400,
+        "published": True,
+        "created_at": now,
+        "updated_at": now,
+    })
+
+    sections = []
+    questions = []
+    for s in range(1, section_count + 1):
+        section_id = f"{exam_id}-section-{s}"
+        sections.append({"_id": section_id, "id": section_id, "exam_id": exam_id, "index": s, "title": f"Section {s}"})
+        for q in range(1, QUESTIONS_PER_SECTION + 1):
+            question_id = f"{section_id}-q{q}"
+            questions.append({
+                "_id": question_id,
+                "id": question_id,
+                "exam_id": exam_id,
+                "section_id": section_id,
+                "index": q,
+                "type": "short_answer",
+                "payload": {"prompt": "Lorem ipsum " * 20, "answer_key": "answer"},
+                "marks": 1,
+                "created_by": "benchmark",
+                "is_demo": False,
+            })
+
+    await db.sections.insert_many(sections)
+    await db.questions.insert_many(questions)
+    return exam_id
+
+
+async def legacy_exam_tree(db, exam_id):
+    """Previous implementation: one query per section"""
+    exam = await db.exams.find_one({"id": exam_id}, {"_id": 0})
+    sections = await db.sections.find({"exam_id": exam_id}, {"_id": 0}).sort("index", 1).to_list(1000)
+    for section in sections:
+        section["questions"] = await db.questions.find(
+            {"section_id": section["id"]}, {"_id": 0}
+        ).sort("index", 1).to_list(1000)
+    return {"exam": exam, "sections": sections}
+
+
+async def time_runs(func, runs):
+    """Return per-call latencies in milliseconds"""
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def describe(latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    return f"mean {statistics.mean(ordered):7.2f} ms | p50 {statistics.median(ordered):7.2f} ms | p95 {p95:7.2f} ms"
+
+
+async def main(runs):
+    db = server.db
+    await server.client.drop_database(db.name)
+    await db.sections.create_index([("exam_id", 1)])
+    await db.questions.create_index([("section_id", 1), ("index", 1)])
+
+    try:
+        for section_count in SECTION_COUNTS:
+            exam_id = await seed_exam(db, section_count)
+
+            legacy = await legacy_exam_tree(db, exam_id)
+            current = await server.load_exam_tree(exam_id)
+            assert legacy == current, "load_exam_tree() returned a different tree"
+
+            legacy_latencies = await time_runs(lambda: legacy_exam_tree(db, exam_id), runs)
+            current_latencies = await time_runs(lambda: server.load_exam_tree(exam_id), runs)
+
+            print(f"\n{section_count} sections x {QUESTIONS_PER_SECTION} questions ({runs} runs)")
+            print(f"  per-section queries : {describe(legacy_latencies)}")
+            print(f"  single aggregation  : {describe(current_latencies)}")
+    finally:
+        await server.client.drop_database(db.name)
+        server.client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=200, help="Timed calls per variant")
+    args = parser.parse_args()
+    asyncio.run(main(args.runs))
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for the end-of-exam submission burst.
+
+Fires N concurrent POST /api/submissions against a running backend while a
+probe keeps calling an unrelated cheap endpoint (GET /api/), and reports the
+probe's latency percentiles at idle and during the burst. With grading on the
+event loop the probe stalls behind every grading; with GRADING_EXECUTOR=thread
+or process it should stay close to its idle latency.
+
+Run against a development database only: every submission is stored.
+
+Usage:
+    BACKEND_URL=http://localhost:8001 python scripts/benchmark_grading_burst.py \\
+        [--exam-id comprehensive-ielts-practice-test] [--submissions 500]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+import uuid
+
+import httpx
+
+BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8001")
+PROBE_PATH = "/api/"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def describe(latencies):
+    return (
+        f"n={len(latencies):5d} | p50 {percentile(latencies, 50):7.1f} ms | "
+        f"p95 {percentile(latencies, 95):7.1f} ms | p99 {percentile(latencies, 99):7.1f} ms | "
+        f"max {max(latencies, default=0):7.1f} ms"
+    )
+
+
+async def probe(client, stop, latencies, interval):
+    """Call the probe endpoint until stop is set"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get(PROBE_PATH)
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+
+
+async def submit(client, exam_id, question_ids, latencies, failures):
+    answers = {qid: random.choice(["a", "b", "c", "true", "false", "river bank"]) for qid in question_ids}
+    start = time.perf_counter()
+    response = await client.post("/api/submissions", json={
+        "exam_id": exam_id,
+        "user_id_or_session": f"bench-{uuid.uuid4()}",
+        "answers": answers,
+    })
+    latencies.append((time.perf_counter() - start) * 1000)
+    if response.status_code != 200:
+        failures.append(response.status_code)
+
+
+async def main(exam_id, submissions, idle_seconds, probe_interval):
+    limits = httpx.Limits(max_connections=submissions + 10)
+    async with httpx.AsyncClient(base_url=BACKEND_URL, timeout=120, limits=limits) as client:
+        response = await client.get(f"/api/exams/{exam_id}/full")
+        response.raise_for_status()
+        question_ids = [q["id"] for section in response.json()["sections"] for q in section["questions"]]
+        print(f"Exam {exam_id}: {len(question_ids)} questions")
+
+        # Idle baseline
+        idle_latencies = []
+        stop = asyncio.Event()
+        task = asyncio.create_task(probe(client, stop, idle_latencies, probe_interval))
+        await asyncio.sleep(idle_seconds)
+        stop.set()
+        await task
+
+        # Burst
+        burst_latencies, submit_latencies, failures = [], [], []
+        stop = asyncio.Event()
+        task = asyncio.create_task(probe(client, stop, burst_latencies, probe_interval))
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            submit(client, exam_id, question_ids, submit_latencies, failures)
+            for _ in range(submissions)
+        ])
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await task
+
+    print(f"\n{submissions} submissions in {elapsed:.1f}s ({submissions / elapsed:.0f}/s), {len(failures)} failed")
+    print(f"  submissions      : {describe(submit_latencies)}")
+    print(f"  {PROBE_PATH} idle      : {describe(idle_latencies)}")
+    print(f"  {PROBE_PATH} in burst  : {describe(burst_latencies)}")
+    if failures:
+        print(f"  failure statuses : {statistics.multimode(failures)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exam-id", default="comprehensive-ielts-practice-test")
+    parser.add_argument("--submissions", type=int, default=500)
+    parser.add_argument("--idle-seconds", type=float, default=5.0)
+    parser.add_argument("--probe-interval", type=float, default=0.01, help="Seconds between probe calls")
+    args = parser.parse_args()
+    asyncio.run(main(args.exam_id, args.submissions, args.idle_seconds, args.probe_interval))
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Import throughput benchmark for AI track imports.
+
+Generates --tests synthetic listening tests (4 sections, 40 questions each)
+and imports them as one batch, reporting tests/s and questions/s.
+
+  --mode http    POST each test to /api/tracks/import-from-ai of a running
+                 backend, --concurrency requests in flight
+  --mode direct  call ai_import_service.write_import() in-process against the
+                 database configured in backend/.env (no HTTP overhead)
+
+Run against a development database only. In direct mode --cleanup removes
+the imported tests afterwards.
+
+Usage:
+    python scripts/benchmark_import.py --mode direct --tests 200 --cleanup
+    BACKEND_URL=http://localhost:8001 python scripts/benchmark_import.py --mode http --tests 200
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8001")
+QUESTION_TYPES = ["short_answer", "multiple_choice", "sentence_completion", "map_labeling"]
+
+
+def make_test(n):
+    """A valid listening import with 40 questions"""
+    sections = []
+    for section_index in range(1, 5):
+        questions = []
+        for offset in range(10):
+            index = (section_index - 1) * 10 + offset + 1
+            question_type = QUESTION_TYPES[index % len(QUESTION_TYPES)]
+            question = {
+                "index": index,
+                "type": question_type,
+                "prompt": f"Question {index} of benchmark test {n}",
+                "answer_key": "A" if question_type == "multiple_choice" else f"answer {index}",
+            }
+            if question_type == "multiple_choice":
+                question["options"] = ["A", "B", "C", "D"]
+            if question_type in ("short_answer", "sentence_completion"):
+                question["max_words"] = 3
+            questions.append(question)
+        sections.append({
+            "index": section_index,
+            "title": f"Section {section_index}",
+            "instructions": "Answer the questions below.",
+            "questions": questions,
+        })
+    return {
+        "test_type": "listening",
+        "title": f"Benchmark import {n}",
+        "description": "Synthetic test generated by benchmark_import.py",
+        "duration_seconds": 1800,
+        "audio_url": "https://example.com/benchmark.mp3",
+        "sections": sections,
+    }
+
+
+async def run_http(tests, concurrency):
+    import httpx
+
+    failures = []
+    slots = asyncio.Semaphore(concurrency)
+
+    async def post(client, payload):
+        async with slots:
+            response = await client.post("/api/tracks/import-from-ai", json=payload)
+            if response.status_code != 200:
+                failures.append(response.status_code)
+
+    async with httpx.AsyncClient(base_url=BACKEND_URL, timeout=120) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[post(client, payload) for payload in tests])
+        return time.perf_counter() - start, failures, []
+
+
+async def run_direct(tests, concurrency):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+    from ai_import_service import AIImportRequest, write_import
+    from server import db
+
+    requests = [AIImportRequest(**payload) for payload in tests]
+    failures, exam_ids = [], []
+    slots = asyncio.Semaphore(concurrency)
+
+    async def write(import_data):
+        async with slots:
+            try:
+                exam_ids.append((await write_import(db, import_data))[0])
+            except Exception as e:
+                failures.append(repr(e))
+
+    start = time.perf_counter()
+    await asyncio.gather(*[write(import_data) for import_data in requests])
+    return time.perf_counter() - start, failures, exam_ids
+
+
+async def cleanup(exam_ids):
+    from ai_import_service import _remove_import
+    from server import db
+
+    for exam_id in exam_ids:
+        await _remove_import(db, exam_id)
+    print(f"Removed {len(exam_ids)} imported tests")
+
+
+async def main(mode, count, concurrency, remove):
+    tests = [make_test(n) for n in range(count)]
+    runner = run_http if mode == "http" else run_direct
+    elapsed, failures, exam_ids = await runner(tests, concurrency)
+
+    imported = count - len(failures)
+    print(f"{imported}/{count} tests imported in {elapsed:.2f}s ({mode}, concurrency {concurrency})")
+    print(f"  {imported / elapsed:.1f} tests/s, {imported * 40 / elapsed:.0f} questions/s")
+    if failures:
+        print(f"  first failure: {failures[0]}")
+    if remove and exam_ids:
+        await cleanup(exam_ids)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["http", "direct"], default="direct")
+    parser.add_argument("--tests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--cleanup", action="store_true", help="Delete imported tests afterwards (direct mode)")
+    args = parser.parse_args()
+    asyncio.run(main(args.mode, args.tests, args.concurrency, args.cleanup))
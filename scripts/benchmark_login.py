@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Login storm benchmark for POST /api/auth/session.
+
+Sends N logins with --concurrency in flight against a running backend and
+reports throughput and latency percentiles. Meant to run offline: start
+scripts/stub_session_api.py and run the backend with EMERGENT_SESSION_API
+pointing at it. Compare runs before and after changing the session
+exchange settings (SESSION_EXCHANGE_CONCURRENCY, SESSION_EXCHANGE_TIMEOUT_SECONDS,
+AUTH_SESSION_MODE).
+
+Run against a development database only: the stub's fake students are
+created on first login.
+
+Usage:
+    BACKEND_URL=http://localhost:8001 python scripts/benchmark_login.py \\
+        [--logins 2000] [--concurrency 200]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from collections import Counter
+
+import httpx
+
+BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8001")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def login(client, n, latencies, statuses):
+    start = time.perf_counter()
+    try:
+        response = await client.post("/api/auth/session", json={"session_id": f"bench-{n}"})
+        statuses[response.status_code] += 1
+    except httpx.HTTPError as e:
+        statuses[type(e).__name__] += 1
+    latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def main(logins, concurrency):
+    latencies, statuses = [], Counter()
+    limits = httpx.Limits(max_connections=concurrency)
+    slots = asyncio.Semaphore(concurrency)
+
+    async def bounded(n):
+        async with slots:
+            await login(client, n, latencies, statuses)
+
+    async with httpx.AsyncClient(base_url=BACKEND_URL, timeout=60, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[bounded(n) for n in range(logins)])
+        elapsed = time.perf_counter() - start
+
+    print(f"{logins} logins in {elapsed:.1f}s ({logins / elapsed:.0f}/s), concurrency {concurrency}")
+    print(
+        f"  p50 {percentile(latencies, 50):.1f} ms | p95 {percentile(latencies, 95):.1f} ms | "
+        f"p99 {percentile(latencies, 99):.1f} ms | max {max(latencies, default=0):.1f} ms"
+    )
+    print(f"  statuses: {dict(statuses)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.concurrency))
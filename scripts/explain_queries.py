@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Report the query plan of every hot API query.
+
+Reconciles indexes against the registry in backend/db_indexes.py (unless
+--no-reconcile is given), then explains each query in API_QUERIES and flags
+collection scans and in-memory sorts. Exits non-zero if any are found, so it
+can gate a deployment.
+
+Usage:
+    python scripts/explain_queries.py [--no-reconcile]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.append(str(BACKEND_DIR))
+load_dotenv(BACKEND_DIR / ".env")
+
+from db_indexes import reconcile_indexes, explain_api_queries  # noqa: E402
+
+
+async def main(reconcile):
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    db = client[os.environ["DB_NAME"]]
+
+    try:
+        if reconcile:
+            report = await reconcile_indexes(db)
+            for section in ("created", "extra", "mismatched", "errors"):
+                for item in report[section]:
+                    print(f"[{section}] {item}")
+
+        problems = 0
+        print(f"\n{'QUERY':<26} {'COLLECTION':<12} PLAN")
+        print("=" * 70)
+        for result in await explain_api_queries(db):
+            flag = ""
+            if result["collection_scan"] or result["in_memory_sort"]:
+                problems += 1
+                flag = "  <-- COLLSCAN" if result["collection_scan"] else "  <-- in-memory SORT"
+            print(f"{result['name']:<26} {result['collection']:<12} {' > '.join(result['stages'])}{flag}")
+
+        print("=" * 70)
+        print(f"{problems} problem plan(s)")
+        return 1 if problems else 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--no-reconcile", action="store_true", help="Only explain, do not create missing indexes")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(not args.no_reconcile)))
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Standalone grading queue worker.
+
+Consumes the grading_jobs collection filled by POST /api/submissions when the
+API runs with GRADING_MODE=queue, so grading capacity can be scaled
+independently of the API processes (run the API with
+GRADING_QUEUE_CONSUMERS=0 to leave all grading to these workers).
+Uses the same MONGO_URL / DB_NAME environment as the backend.
+
+Usage:
+    python scripts/grading_worker.py [--consumers 8] [--executor process]
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from grading_engine import start_grading_executor, shutdown_grading_executor  # noqa: E402
+from grading_queue import GradingQueueWorker  # noqa: E402
+from server import db, load_grading_plan  # noqa: E402
+
+
+async def main(consumers, stats_interval):
+    worker = GradingQueueWorker(db, load_grading_plan, concurrency=consumers)
+    worker.start()
+    try:
+        while True:
+            await asyncio.sleep(stats_interval)
+            logging.info(f"Grading jobs by status: {await worker.stats()}")
+    finally:
+        await worker.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--consumers", type=int, default=8, help="Jobs graded concurrently")
+    parser.add_argument("--executor", choices=["thread", "process", "inline"], default="process")
+    parser.add_argument("--workers", type=int, default=None, help="Grading pool size")
+    parser.add_argument("--stats-interval", type=float, default=30.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    start_grading_executor(args.executor, args.workers)
+    try:
+        asyncio.run(main(args.consumers, args.stats_interval))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutdown_grading_executor()
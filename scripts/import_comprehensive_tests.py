@@ -9,8 +9,12 @@ This script imports 3 comprehensive test files:
 
 Total: 27 question types, 82 questions
 
+All tests are sent in a single request to the bulk import endpoint, which
+reports the result of each test as it is created. Other test files (JSON
+objects, JSON arrays or JSON Lines question banks) can be given instead.
+
 Usage:
-    python import_comprehensive_tests.py
+    python import_comprehensive_tests.py [test_file ...]
 """
 
 import requests
@@ -39,65 +43,57 @@ TEST_FILES = [
     }
 ]
 
-def load_json_file(file_path):
-    """Load JSON file and return data"""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        print(f"❌ Error: File not found: {file_path}")
-        return None
-    except json.JSONDecodeError as e:
-        print(f"❌ Error: Invalid JSON in {file_path}: {e}")
-        return None
+def stream_files(file_paths, chunk_size=64 * 1024):
+    """Yield the contents of the test files, newline separated, in chunks"""
+    for file_path in file_paths:
+        with open(file_path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        yield b"\n"
 
-def validate_test(test_data):
-    """Validate test data structure"""
+def import_tests(file_paths):
+    """Import all tests with one bulk request; returns (per-test results, summary)"""
+    results = []
+    summary = {}
     try:
         response = requests.post(
-            f"{BACKEND_URL}/api/tracks/validate-import",
-            json=test_data,
-            timeout=30
+            f"{BACKEND_URL}/api/tracks/import-bulk",
+            data=stream_files(file_paths),
+            headers={"Content-Type": "application/x-ndjson"},
+            stream=True,
+            timeout=(10, 600)
         )
         
-        if response.status_code == 200:
-            result = response.json()
-            print(f"   ✅ Validation passed: {result.get('message', 'Valid')}")
-            return True
-        else:
-            error = response.json()
-            print(f"   ❌ Validation failed: {error.get('detail', response.text)}")
-            return False
-            
-    except requests.exceptions.RequestException as e:
-        print(f"   ❌ Error validating: {e}")
-        return False
-
-def import_test(test_data, test_name):
-    """Import test via API"""
-    try:
-        response = requests.post(
-            f"{BACKEND_URL}/api/tracks/import-from-ai",
-            json=test_data,
-            timeout=60
-        )
+        if response.status_code != 200:
+            print(f"   ❌ Bulk import failed ({response.status_code}): {response.text}")
+            return results, summary
         
-        if response.status_code == 200:
-            result = response.json()
-            print(f"   ✅ Import successful!")
-            print(f"      Test Title: {result.get('title')}")
-            print(f"      Exam ID: {result.get('exam_id')}")
-            print(f"      Track ID: {result.get('track_id')}")
-            print(f"      Status: {result.get('status')}")
-            return True
-        else:
-            error = response.json() if response.headers.get('content-type') == 'application/json' else response.text
-            print(f"   ❌ Import failed: {error}")
-            return False
+        for line in response.iter_lines():
+            if not line:
+                continue
+            record = json.loads(line)
+            if "summary" in record:
+                summary = record["summary"]
+                continue
             
+            results.append(record)
+            if record["status"] == "success":
+                print(f"   ✅ {record.get('title')}")
+                print(f"      Exam ID: {record.get('exam_id')}")
+                print(f"      Track ID: {record.get('track_id')}")
+                print(f"      Questions: {record.get('questions_created')}")
+            else:
+                print(f"   ❌ {record.get('title') or 'Test ' + str(record['position'])}")
+                for error in record.get("errors", []):
+                    print(f"      {error}")
+        
     except requests.exceptions.RequestException as e:
         print(f"   ❌ Error importing: {e}")
-        return False
+    
+    return results, summary
 
 def check_backend_connection():
     """Check if backend is accessible"""
@@ -114,34 +110,25 @@ def check_backend_connection():
         print(f"   Error: {e}")
         return False
 
-def display_summary(results):
+def display_summary(results, summary):
     """Display import summary"""
     print("\n" + "="*70)
     print("IMPORT SUMMARY")
     print("="*70)
     
-    total = len(results)
-    successful = sum(1 for r in results if r['success'])
-    failed = total - successful
-    
-    print(f"Total Tests: {total}")
-    print(f"Successful: {successful}")
-    print(f"Failed: {failed}")
+    print(f"Total Tests: {summary.get('total', len(results))}")
+    print(f"Successful: {summary.get('succeeded', 0)}")
+    print(f"Failed: {summary.get('failed', 0)}")
+    if summary.get('error'):
+        print(f"Upload error: {summary['error']}")
     print()
     
     for result in results:
-        status = "✅ SUCCESS" if result['success'] else "❌ FAILED"
-        print(f"{status} - {result['name']} ({result['type']})")
+        status = "✅ SUCCESS" if result['status'] == 'success' else "❌ FAILED"
+        print(f"{status} - {result.get('title') or 'Test ' + str(result['position'])}")
     
     print("="*70)
 
-def count_questions(test_data):
-    """Count questions in test data"""
-    total = 0
-    for section in test_data.get('sections', []):
-        total += len(section.get('questions', []))
-    return total
-
 def main():
     """Main import process"""
     print("="*70)
@@ -161,69 +148,29 @@ def main():
     # Get base directory (parent of scripts folder)
     base_dir = Path(__file__).parent.parent
     
-    results = []
+    if len(sys.argv) > 1:
+        file_paths = [Path(arg) for arg in sys.argv[1:]]
+    else:
+        file_paths = [base_dir / test_config['file'] for test_config in TEST_FILES]
     
-    # Process each test file
-    for test_config in TEST_FILES:
-        file_path = base_dir / test_config['file']
-        test_name = test_config['name']
-        test_type = test_config['type']
-        
-        print(f"\n{'='*70}")
-        print(f"Processing: {test_name}")
-        print(f"File: {test_config['file']}")
-        print(f"Type: {test_type.upper()}")
-        print('='*70)
-        
-        # Load JSON
-        print(f"1️⃣  Loading JSON file...")
-        test_data = load_json_file(file_path)
-        
-        if not test_data:
-            results.append({
-                'name': test_name,
-                'type': test_type,
-                'success': False,
-                'error': 'File load failed'
-            })
-            continue
-        
-        # Display test info
-        question_count = count_questions(test_data)
-        section_count = len(test_data.get('sections', []))
-        print(f"   ✅ Loaded successfully")
-        print(f"      Sections: {section_count}")
-        print(f"      Questions: {question_count}")
-        print()
-        
-        # Validate
-        print(f"2️⃣  Validating test structure...")
-        if not validate_test(test_data):
-            results.append({
-                'name': test_name,
-                'type': test_type,
-                'success': False,
-                'error': 'Validation failed'
-            })
-            continue
-        
-        print()
-        
-        # Import
-        print(f"3️⃣  Importing test to database...")
-        success = import_test(test_data, test_name)
-        
-        results.append({
-            'name': test_name,
-            'type': test_type,
-            'success': success
-        })
+    missing = [str(file_path) for file_path in file_paths if not file_path.exists()]
+    if missing:
+        print(f"❌ Error: File not found: {', '.join(missing)}")
+        sys.exit(1)
+    
+    for file_path in file_paths:
+        print(f"   📄 {file_path.name} ({file_path.stat().st_size / 1024:.0f} KB)")
+    print()
+    
+    # Import
+    print(f"Importing tests from {len(file_paths)} files...")
+    results, summary = import_tests(file_paths)
     
     # Display summary
-    display_summary(results)
+    display_summary(results, summary)
     
     # Exit with appropriate code
-    all_success = all(r['success'] for r in results)
+    all_success = bool(summary) and not summary.get('error') and summary.get('failed') == 0
     sys.exit(0 if all_success else 1)
 
 if __name__ == "__main__":
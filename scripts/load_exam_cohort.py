@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Load test of a full exam sitting: a cohort of candidates taking one exam.
+
+Every candidate follows the exam lifecycle of the student frontend against a
+running backend:
+
+  login    POST /api/auth/session, then the dashboard: published exams and
+           own submissions
+  lobby    batched status polling (GET /api/exams/status?since=...) every
+           --poll-seconds until the exam is started
+  start    all candidates check their attempt status, load
+           GET /api/exams/{id}/full at once, resolve the audio rendition and
+           fetch the head of the track with a range request
+  exam     autosave (PATCH /api/submissions/{draft}/answers) of a few new
+           answers every --autosave-seconds
+  burst    POST /api/submissions finalizing the draft, spread over the last
+           --burst-seconds and skewed toward time-up, when the exam timer
+           auto-submits
+
+With --admin-email the harness starts the exam (PUT /api/admin/exams/{id}/start)
+once the lobby has polled for --lobby-seconds, and stops it again at the end;
+without it the exam should already be active and the lobby just waits.
+
+Reports p50/p95/p99 latency and errors per endpoint, and MongoDB operations
+per second for each phase (serverStatus opcounters, sampled every second from
+MONGO_URL in backend/.env or the environment). Each --cohort size is run in
+turn. Results can be saved as a baseline (--save-baseline) and later runs are
+compared against it: a p95/p99 more than --tolerance above the baseline (and
+at least --min-delta-ms slower), or a higher error rate, is reported as a
+regression and the script exits non-zero.
+
+Meant to run against a local uvicorn and mongod with a development database:
+start scripts/stub_session_api.py and run the backend with EMERGENT_SESSION_API
+pointing at it. Every run logs in fresh students and stores their submissions.
+
+Usage:
+    BACKEND_URL=http://localhost:8001 python scripts/load_exam_cohort.py \\
+        --exam-id comprehensive-ielts-practice-test --cohort 100 500 \\
+        [--admin-email admin@example.com] [--save-baseline]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import httpx
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+load_dotenv(BACKEND_DIR / ".env")
+
+BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8001")
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baselines" / "exam_cohort.json"
+PHASES = ["login", "lobby", "start", "exam", "burst"]
+ANSWER_CHOICES = ["a", "b", "c", "d", "true", "false", "not given", "river bank"]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Recorder:
+    """Latencies and outcomes per endpoint (method and path template)"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    async def call(self, client, endpoint, method, url, expected=(200,), **kwargs):
+        """Send one request and record it under endpoint; returns the response or None"""
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.latencies[endpoint].append((time.perf_counter() - start) * 1000)
+            self.statuses[endpoint][type(e).__name__] += 1
+            return None
+        self.latencies[endpoint].append((time.perf_counter() - start) * 1000)
+        self.statuses[endpoint][response.status_code] += 1
+        return response if response.status_code in expected else None
+
+    def report(self):
+        report = {}
+        for endpoint in sorted(self.latencies):
+            latencies = self.latencies[endpoint]
+            statuses = self.statuses[endpoint]
+            ok = sum(count for status, count in statuses.items() if isinstance(status, int) and status < 400)
+            report[endpoint] = {
+                "count": len(latencies),
+                "error_rate": round(1 - ok / len(latencies), 4),
+                "p50_ms": round(percentile(latencies, 50), 1),
+                "p95_ms": round(percentile(latencies, 95), 1),
+                "p99_ms": round(percentile(latencies, 99), 1),
+                "max_ms": round(max(latencies), 1),
+                "statuses": {str(status): count for status, count in statuses.items()},
+            }
+        return report
+
+
+class MongoSampler:
+    """Samples serverStatus opcounters every second and attributes them to the current phase"""
+
+    def __init__(self, mongo_url):
+        self.client = AsyncIOMotorClient(mongo_url) if mongo_url else None
+        self.phase = None
+        self.ops = Counter()
+        self.seconds = Counter()
+        self.peak = Counter()
+        self._task = None
+
+    async def _opcounters(self):
+        status = await self.client.admin.command("serverStatus")
+        return sum(status["opcounters"].values())
+
+    async def _run(self):
+        previous = await self._opcounters()
+        previous_at = time.perf_counter()
+        while True:
+            await asyncio.sleep(1)
+            current = await self._opcounters()
+            now = time.perf_counter()
+            if self.phase:
+                ops = current - previous
+                self.ops[self.phase] += ops
+                self.seconds[self.phase] += now - previous_at
+                self.peak[self.phase] = max(self.peak[self.phase], ops / (now - previous_at))
+            previous, previous_at = current, now
+
+    async def start(self):
+        if self.client is None:
+            return
+        try:
+            await self._opcounters()
+        except Exception as e:
+            print(f"MongoDB opcounters unavailable ({type(e).__name__}); reporting HTTP latencies only")
+            self.client.close()
+            self.client = None
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self.client:
+            self.client.close()
+
+    def report(self):
+        return {
+            phase: {
+                "ops_per_second": round(self.ops[phase] / self.seconds[phase], 1),
+                "peak_ops_per_second": round(self.peak[phase], 1),
+            }
+            for phase in PHASES if self.seconds[phase]
+        }
+
+
+class Sitting:
+    """Shared clock of one cohort run: exam start and end, seen by every candidate"""
+
+    def __init__(self, args, cohort):
+        self.args = args
+        self.cohort = cohort
+        self.run_id = uuid.uuid4().hex[:8]
+        self.started = asyncio.Event()
+        self.logged_in = 0
+        self.all_logged_in = asyncio.Event()
+        self.exam_ends_at = None
+
+
+async def candidate(n, client, sitting, recorder):
+    args = sitting.args
+    exam_id = args.exam_id
+
+    # Login and dashboard
+    response = await recorder.call(
+        client, "POST /api/auth/session", "POST", "/api/auth/session",
+        json={"session_id": f"cohort-{sitting.run_id}-{n}"}
+    )
+    token = response.cookies.get("session_token") if response else None
+    sitting.logged_in += 1
+    if sitting.logged_in == sitting.cohort:
+        sitting.all_logged_in.set()
+    if not token:
+        return
+    # The session cookie is Secure, so send the token as a bearer token over plain HTTP
+    headers = {"Authorization": f"Bearer {token}"}
+
+    await asyncio.gather(
+        recorder.call(client, "GET /api/exams/published", "GET", "/api/exams/published", headers=headers),
+        recorder.call(client, "GET /api/students/me/submissions", "GET", "/api/students/me/submissions", headers=headers),
+    )
+
+    # Lobby: batched status polling until the exam is active
+    version = None
+    active = False
+    while True:
+        params = {"ids": exam_id}
+        if version is not None:
+            params["since"] = version
+        response = await recorder.call(
+            client, "GET /api/exams/status", "GET", "/api/exams/status",
+            expected=(200, 204), params=params
+        )
+        if response is not None and response.status_code == 200:
+            body = response.json()
+            version = body["version"]
+            active = any(status.get("is_active") for status in body["statuses"])
+        # Candidates notice the start on their next poll
+        if sitting.started.is_set() and (active or not args.admin_email):
+            break
+        await asyncio.sleep(args.poll_seconds * random.uniform(0.8, 1.2))
+
+    # Exam start: attempt check, exam tree and audio
+    await recorder.call(
+        client, "GET /api/students/me/exam-status/{id}", "GET", f"/api/students/me/exam-status/{exam_id}",
+        headers=headers
+    )
+    response = await recorder.call(client, "GET /api/exams/{id}/full", "GET", f"/api/exams/{exam_id}/full")
+    if response is None:
+        return
+    tree = response.json()
+    question_ids = [q["id"] for section in tree["sections"] for q in section.get("questions", [])]
+    audio_url = tree["exam"].get("audio_url") or ""
+
+    if "/listening_tracks/" in audio_url:
+        filename = audio_url.rsplit("/listening_tracks/", 1)[1]
+        response = await recorder.call(
+            client, "GET /api/audio/{file}/renditions", "GET", f"/api/audio/{filename}/renditions"
+        )
+        track = response.json()["recommended"] if response else f"/listening_tracks/{filename}"
+        await recorder.call(
+            client, "GET /listening_tracks/{file} (range)", "GET", track, expected=(200, 206),
+            headers={"Range": f"bytes=0-{args.audio_kb * 1024 - 1}"}
+        )
+
+    # Exam: answer a few questions between autosaves
+    draft_id = f"load-{sitting.run_id}-{n}"
+    unanswered = list(question_ids)
+    random.shuffle(unanswered)
+    per_save = max(1, len(question_ids) // max(1, int(args.exam_seconds / args.autosave_seconds)))
+    submit_at = sitting.exam_ends_at - args.burst_seconds * random.random() ** 3
+    # Spread autosaves the way independent browser timers are spread
+    next_save = time.perf_counter() + random.uniform(0, args.autosave_seconds)
+    while next_save < submit_at:
+        await asyncio.sleep(next_save - time.perf_counter())
+        changed = {qid: random.choice(ANSWER_CHOICES) for qid in unanswered[:per_save]}
+        unanswered = unanswered[per_save:]
+        if changed:
+            await recorder.call(
+                client, "PATCH /api/submissions/{id}/answers", "PATCH", f"/api/submissions/{draft_id}/answers",
+                headers=headers,
+                json={
+                    "exam_id": exam_id,
+                    "answers": changed,
+                    "last_playback_time": int(args.exam_seconds - (sitting.exam_ends_at - next_save)),
+                }
+            )
+        next_save += args.autosave_seconds
+
+    # Submission burst: finalize the draft with the answers not autosaved yet
+    await asyncio.sleep(max(0.0, submit_at - time.perf_counter()))
+    await recorder.call(
+        client, "POST /api/submissions", "POST", "/api/submissions", headers=headers,
+        json={
+            "exam_id": exam_id,
+            "draft_id": draft_id,
+            "answers": {qid: random.choice(ANSWER_CHOICES) for qid in unanswered[:per_save]},
+        }
+    )
+
+
+async def run_cohort(args, cohort):
+    recorder = Recorder()
+    sampler = MongoSampler(os.environ.get("MONGO_URL"))
+    sitting = Sitting(args, cohort)
+    admin_headers = {"X-Admin-Email": args.admin_email} if args.admin_email else {}
+
+    limits = httpx.Limits(max_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=BACKEND_URL, timeout=120, limits=limits) as client:
+        await sampler.start()
+        started_at = time.perf_counter()
+        sampler.phase = "login"
+        tasks = [asyncio.create_task(candidate(n, client, sitting, recorder)) for n in range(cohort)]
+        try:
+            await sitting.all_logged_in.wait()
+            login_seconds = time.perf_counter() - started_at
+
+            sampler.phase = "lobby"
+            await asyncio.sleep(args.lobby_seconds)
+            if args.admin_email:
+                await recorder.call(
+                    client, "PUT /api/admin/exams/{id}/start", "PUT", f"/api/admin/exams/{args.exam_id}/start",
+                    headers=admin_headers
+                )
+            sampler.phase = "start"
+            sitting.exam_ends_at = time.perf_counter() + args.exam_seconds
+            sitting.started.set()
+            await asyncio.sleep(min(args.start_seconds, args.exam_seconds - args.burst_seconds))
+            sampler.phase = "exam"
+            await asyncio.sleep(max(0.0, sitting.exam_ends_at - args.burst_seconds - time.perf_counter()))
+            sampler.phase = "burst"
+            outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await sampler.stop()
+            if args.admin_email:
+                await client.put(f"/api/admin/exams/{args.exam_id}/stop", headers=admin_headers)
+
+    crashed = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+    if crashed:
+        print(f"{len(crashed)} candidate(s) stopped early, first error: {crashed[0]!r}")
+    return {
+        "candidates_stopped_early": len(crashed),
+        "login_seconds": round(login_seconds, 1),
+        "total_seconds": round(time.perf_counter() - started_at, 1),
+        "endpoints": recorder.report(),
+        "mongo": sampler.report(),
+    }
+
+
+def print_result(cohort, result):
+    print(f"\nCohort of {cohort}: logged in within {result['login_seconds']}s, sitting took {result['total_seconds']}s")
+    for endpoint, stats in result["endpoints"].items():
+        print(
+            f"  {endpoint:42s} n={stats['count']:6d} | p50 {stats['p50_ms']:7.1f} ms | "
+            f"p95 {stats['p95_ms']:7.1f} ms | p99 {stats['p99_ms']:7.1f} ms | "
+            f"errors {stats['error_rate']:6.2%}"
+        )
+        if stats["error_rate"]:
+            print(f"  {'':42s} statuses: {stats['statuses']}")
+    for phase, stats in result["mongo"].items():
+        print(f"  mongo {phase:6s}: {stats['ops_per_second']:8.1f} ops/s (peak {stats['peak_ops_per_second']:.0f}/s)")
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """Regressions of results against a baseline, as printable lines"""
+    regressions = []
+    for cohort, result in results.items():
+        base = baseline.get("cohorts", {}).get(cohort)
+        if not base:
+            print(f"\nNo baseline for a cohort of {cohort}")
+            continue
+        for endpoint, stats in result["endpoints"].items():
+            before = base["endpoints"].get(endpoint)
+            if not before:
+                continue
+            for key in ("p95_ms", "p99_ms"):
+                if stats[key] > before[key] * (1 + tolerance) and stats[key] - before[key] >= min_delta_ms:
+                    regressions.append(f"{cohort}: {endpoint} {key} {before[key]} -> {stats[key]}")
+            if stats["error_rate"] > before["error_rate"]:
+                regressions.append(f"{cohort}: {endpoint} error rate {before['error_rate']:.2%} -> {stats['error_rate']:.2%}")
+    return regressions
+
+
+async def main(args):
+    results = {}
+    for cohort in args.cohort:
+        results[str(cohort)] = await run_cohort(args, cohort)
+        print_result(cohort, results[str(cohort)])
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        saved = json.loads(baseline_path.read_text()) if baseline_path.exists() else {"cohorts": {}}
+        saved["cohorts"].update(results)
+        saved["settings"] = {
+            key: getattr(args, key) for key in (
+                "exam_id", "lobby_seconds", "poll_seconds", "exam_seconds", "autosave_seconds",
+                "burst_seconds", "audio_kb"
+            )
+        }
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(saved, indent=2) + "\n")
+        print(f"\nBaseline saved to {baseline_path}")
+        return 0
+
+    if not baseline_path.exists():
+        return 0
+    regressions = compare(results, json.loads(baseline_path.read_text()), args.tolerance, args.min_delta_ms)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against {baseline_path}:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"\nNo regressions against {baseline_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exam-id", default="comprehensive-ielts-practice-test")
+    parser.add_argument("--cohort", type=int, nargs="+", default=[100], help="Candidate counts, run one after another")
+    parser.add_argument("--admin-email", help="Admin email used to start and stop the exam")
+    parser.add_argument("--lobby-seconds", type=float, default=15.0, help="Status polling before the exam starts")
+    parser.add_argument("--poll-seconds", type=float, default=3.0, help="Dashboard status polling interval")
+    parser.add_argument("--start-seconds", type=float, default=10.0, help="Length of the exam-load phase in the report")
+    parser.add_argument("--exam-seconds", type=float, default=120.0, help="Exam duration, compressed from the real one")
+    parser.add_argument("--autosave-seconds", type=float, default=5.0, help="Autosave interval")
+    parser.add_argument("--burst-seconds", type=float, default=60.0, help="Window before time-up in which candidates submit")
+    parser.add_argument("--audio-kb", type=int, default=1024, help="Bytes of the track fetched by the first range request, in KiB")
+    parser.add_argument("--max-connections", type=int, default=1000)
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline file to compare with or save to")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run's results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative p95/p99 increase")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="Ignore latency increases below this")
+    args = parser.parse_args()
+    if args.burst_seconds >= args.exam_seconds:
+        parser.error("--burst-seconds must be shorter than --exam-seconds")
+    sys.exit(asyncio.run(main(args)))
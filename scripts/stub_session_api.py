@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Emergent OAuth session-data endpoint.
+
+Answers GET /auth/v1/env/oauth/session-data with a deterministic user for the
+X-Session-ID header, so logins can be benchmarked without Google or Emergent.
+Session ids of the form "bench-<n>" map to one of --users fake students
+(bench-user-<n % users>@example.com); any other id maps to itself. An id
+starting with "invalid" gets a 401, like an expired session id.
+
+Point the backend at it with
+    EMERGENT_SESSION_API=http://127.0.0.1:8100/auth/v1/env/oauth/session-data
+
+Usage:
+    python scripts/stub_session_api.py [--port 8100] [--latency-ms 50] [--users 1000]
+"""
+
+import argparse
+import asyncio
+import hashlib
+
+import uvicorn
+from fastapi import FastAPI, Header, HTTPException
+
+
+def build_app(latency_ms: float, users: int) -> FastAPI:
+    app = FastAPI(title="Session-data stub")
+
+    @app.get("/auth/v1/env/oauth/session-data")
+    async def session_data(x_session_id: str = Header(...)):
+        if x_session_id.startswith("invalid"):
+            raise HTTPException(status_code=401, detail="Invalid session")
+        if latency_ms:
+            # Simulated upstream processing time
+            await asyncio.sleep(latency_ms / 1000)
+
+        name = x_session_id
+        if x_session_id.startswith("bench-") and x_session_id[6:].isdigit():
+            name = f"bench-user-{int(x_session_id[6:]) % users}"
+        digest = hashlib.sha256(name.encode("utf-8")).hexdigest()
+        return {
+            "id": f"google-{digest[:21]}",
+            "email": f"{name}@example.com",
+            "name": name.replace("-", " ").title(),
+            "picture": "",
+            "session_token": hashlib.sha256(f"{x_session_id}:token".encode("utf-8")).hexdigest(),
+        }
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Delay added to every answer")
+    parser.add_argument("--users", type=int, default=1000, help="Distinct fake students behind bench-<n> ids")
+    args = parser.parse_args()
+    uvicorn.run(build_app(args.latency_ms, args.users), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,11 @@
+"""
+Shared pytest setup: the backend modules are imported the way server.py
+imports them, from the backend directory
+"""
+
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
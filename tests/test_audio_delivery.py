@@ -0,0 +1,64 @@
+"""Tests for byte range parsing of listening track requests"""
+
+import os
+
+import pytest
+
+from audio_delivery import RangeNotSatisfiable, file_etag, parse_range
+
+SIZE = 1000
+
+
+@pytest.mark.parametrize("header,expected", [
+    ("bytes=0-499", (0, 499)),
+    ("bytes=500-999", (500, 999)),
+    ("bytes=0-0", (0, 0)),
+    ("bytes=999-999", (999, 999)),
+    # Open-ended and past-the-end ranges stop at the last byte
+    ("bytes=500-", (500, 999)),
+    ("bytes=0-5000", (0, 999)),
+    # Suffix ranges: the last N bytes
+    ("bytes=-100", (900, 999)),
+    ("bytes=-1", (999, 999)),
+    ("bytes=-5000", (0, 999)),
+    (" bytes=10-20 ", (10, 20)),
+])
+def test_satisfiable_ranges(header, expected):
+    assert parse_range(header, SIZE) == expected
+
+
+@pytest.mark.parametrize("header", [
+    "", None,
+    # Multi-range requests are answered with the whole file
+    "bytes=0-10,20-30",
+    # Malformed or unsupported headers are ignored
+    "bytes=-", "bytes=abc-def", "items=0-10", "bytes 0-10", "bytes=0-10-20",
+])
+def test_whole_file(header):
+    assert parse_range(header, SIZE) is None
+
+
+@pytest.mark.parametrize("header", [
+    "bytes=1000-", "bytes=1000-1100", "bytes=500-499", "bytes=-0",
+])
+def test_unsatisfiable_ranges(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, SIZE)
+
+
+@pytest.mark.parametrize("header", ["bytes=0-", "bytes=0-10", "bytes=-10"])
+def test_no_range_of_an_empty_file_is_satisfiable(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, 0)
+
+
+def test_file_etag_changes_with_content(tmp_path):
+    track = tmp_path / "track.mp3"
+    track.write_bytes(b"a" * 10)
+    etag = file_etag(os.stat(track))
+
+    assert etag.startswith('"') and etag.endswith('"')
+    assert file_etag(os.stat(track)) == etag
+
+    track.write_bytes(b"a" * 11)
+    assert file_etag(os.stat(track)) != etag
@@ -0,0 +1,91 @@
+"""Tests for incremental parsing of bulk test uploads"""
+
+import io
+import json
+
+import pytest
+
+from bulk_import import BulkImportFormatError, iter_json_documents
+
+TESTS = [
+    {"title": "Listening 1", "sections": [{"index": 1, "questions": [{"type": "form_completion"}]}]},
+    {"title": "Réading — 2", "notes": "multi-byte: 日本語 ✓"},
+    {"title": "Writing 3", "tasks": []},
+]
+
+
+def _parse(data, **kwargs):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return list(iter_json_documents(io.BytesIO(data), **kwargs))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 64, 64 * 1024])
+@pytest.mark.parametrize("layout", ["jsonl", "array", "pretty", "concatenated"])
+def test_layouts_and_chunk_boundaries(layout, chunk_size):
+    if layout == "jsonl":
+        data = "\n".join(json.dumps(test, ensure_ascii=False) for test in TESTS) + "\n"
+    elif layout == "array":
+        data = json.dumps(TESTS, ensure_ascii=False)
+    elif layout == "pretty":
+        data = "\n".join(json.dumps(test, ensure_ascii=False, indent=2) for test in TESTS)
+    else:
+        data = json.dumps(TESTS[:1], indent=2) + "\n" + json.dumps(TESTS[1:], ensure_ascii=False)
+
+    assert _parse(data, chunk_size=chunk_size) == TESTS
+
+
+def test_utf8_bom_and_surrounding_whitespace():
+    data = b"\xef\xbb\xbf \r\n\t" + json.dumps(TESTS).encode("utf-8") + b"\n\n"
+
+    assert _parse(data, chunk_size=3) == TESTS
+
+
+def test_empty_uploads():
+    assert _parse("") == []
+    assert _parse(" \n ") == []
+    assert _parse("[]") == []
+    assert _parse("[ ]\n[]") == []
+
+
+def test_documents_are_yielded_before_the_upload_is_read():
+    class Stream(io.BytesIO):
+        def read(self, size=-1):
+            data = super().read(size)
+            reads.append(len(data))
+            return data
+
+    reads = []
+    data = "\n".join(json.dumps(test) for test in TESTS * 100).encode("utf-8")
+    documents = iter_json_documents(Stream(data), chunk_size=64)
+
+    assert next(documents) == TESTS[0]
+    assert sum(reads) < len(data)
+
+
+@pytest.mark.parametrize("data,message", [
+    ('{"title": "a"} {"title": ', "Invalid JSON in test 2"),
+    ('{"title": "a"}\n{bad}', "Invalid JSON in test 2"),
+    ('[{"title": "a"} {"title": "b"}]', "Expected ',' or ']' after test 1"),
+    ('[{"title": "a"}, {"title": "b"}', "JSON array is not closed"),
+])
+def test_malformed_uploads(data, message):
+    with pytest.raises(BulkImportFormatError, match=message):
+        _parse(data, chunk_size=4)
+
+
+def test_tests_before_an_error_are_yielded():
+    documents = iter_json_documents(io.BytesIO(b'{"title": "a"}\n{"title": "b"}\nnot json'), chunk_size=4)
+
+    assert next(documents) == {"title": "a"}
+    assert next(documents) == {"title": "b"}
+    with pytest.raises(BulkImportFormatError, match="test 3"):
+        next(documents)
+
+
+def test_document_size_limit():
+    big = json.dumps({"title": "x" * 500})
+
+    assert _parse(big, chunk_size=16, max_document_chars=1000) == [json.loads(big)]
+    with pytest.raises(BulkImportFormatError, match="exceeds 100 characters"):
+        _parse(big, chunk_size=16, max_document_chars=100)
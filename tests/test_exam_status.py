@@ -0,0 +1,90 @@
+"""Tests for exam status payloads and versions"""
+
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from exam_status import STATUS_FIELDS, ExamStatusBroadcaster, ExamStatusSnapshot, exam_status_payload, status_version
+
+
+def test_status_version_is_status_updated_at_in_milliseconds():
+    updated_at = datetime(2024, 5, 1, 9, 30, 15, 250000, tzinfo=timezone.utc)
+    status = {"status_updated_at": updated_at.isoformat()}
+
+    assert status_version(status) == int(updated_at.timestamp() * 1000)
+
+
+def test_status_version_orders_status_changes():
+    earlier = {"status_updated_at": "2024-05-01T09:30:00+00:00"}
+    later = {"status_updated_at": "2024-05-01T09:30:00.001000+00:00"}
+
+    assert status_version(later) > status_version(earlier)
+
+
+def test_status_version_is_zero_without_status_change():
+    assert status_version({}) == 0
+    assert status_version({"status_updated_at": None}) == 0
+    assert status_version({"status_updated_at": ""}) == 0
+
+
+def test_status_version_is_zero_for_malformed_timestamps():
+    assert status_version({"status_updated_at": "yesterday"}) == 0
+    assert status_version({"status_updated_at": 1714555815}) == 0
+
+
+def test_status_version_ignores_updated_at():
+    exam = {"id": "exam-1", "is_active": True, "status_updated_at": "2024-05-01T09:30:00+00:00"}
+    edited = {**exam, "updated_at": "2024-06-01T00:00:00+00:00", "submission_count": 12}
+
+    assert status_version(exam_status_payload(edited)) == status_version(exam_status_payload(exam))
+
+
+def test_payload_defaults_and_fields():
+    payload = exam_status_payload({"id": "exam-1"})
+
+    assert payload == {
+        "exam_id": "exam-1",
+        "is_active": False,
+        "started_at": None,
+        "stopped_at": None,
+        "published": False,
+        "is_visible": True,
+        "status_updated_at": None,
+    }
+    assert set(STATUS_FIELDS) <= set(payload)
+
+
+def test_failed_subscribe_leaves_no_subscriber():
+    async def failing_loader(exam_ids):
+        raise ConnectionError("database unavailable")
+
+    async def scenario():
+        broadcaster = ExamStatusBroadcaster(failing_loader, resync_interval=0)
+        with pytest.raises(ConnectionError):
+            await broadcaster.subscribe(["exam-1", "exam-2"])
+        return broadcaster
+
+    broadcaster = asyncio.run(scenario())
+
+    assert broadcaster._channels == {}
+
+
+def test_full_snapshot_evicts_the_oldest_status():
+    loads = []
+
+    async def loader(exam_ids):
+        loads.append(exam_ids)
+        return [{"exam_id": exam_id} for exam_id in exam_ids]
+
+    async def scenario():
+        snapshot = ExamStatusSnapshot(loader, max_age=60, max_entries=2)
+        await snapshot.get_many(["exam-1", "exam-2"])
+        snapshot.update({"exam_id": "exam-1", "is_active": True})
+        await snapshot.get_many(["exam-3"])
+        return await snapshot.get_many(["exam-1", "exam-3"])
+
+    statuses = asyncio.run(scenario())
+
+    assert statuses == [{"exam_id": "exam-1", "is_active": True}, {"exam_id": "exam-3"}]
+    assert loads == [["exam-1", "exam-2"], ["exam-3"]]
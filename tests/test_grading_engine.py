@@ -0,0 +1,168 @@
+"""Tests for compiled grading plans against the original per-question grader"""
+
+import itertools
+import re
+
+import pytest
+
+from grading_engine import band_score_for, compile_grading_plan, grade_submission, grade_with_plan
+from new_question_type_schemas import get_all_question_types, is_auto_gradable
+
+
+# The grader as it was before grading plans, kept as the reference the
+# compiled plans must agree with
+def _legacy_normalize(answer):
+    if not answer:
+        return ""
+    return re.sub(r'\s+', ' ', str(answer).lower().strip())
+
+
+def _legacy_match(student_answer, correct_answer, question_type):
+    student_norm = _legacy_normalize(student_answer)
+    correct_norm = _legacy_normalize(correct_answer)
+    if not student_norm:
+        return False
+    if question_type in [
+        "short_answer_reading", "short_answer_listening",
+        "sentence_completion", "sentence_completion_wordlist",
+        "note_completion", "flow_chart_completion",
+        "table_completion", "summary_completion"
+    ]:
+        return correct_norm in student_norm or student_norm in correct_norm
+    return student_norm == correct_norm
+
+
+def _legacy_grade(questions, student_answers):
+    results = []
+    correct_count = 0
+    total_gradable = 0
+    for question in questions:
+        question_id = question.get("id", "")
+        question_type = question.get("type", "")
+        answer_key = question.get("answer_key", "")
+        student_answer = student_answers.get(question_id, "")
+        if not is_auto_gradable(question_type):
+            results.append({
+                "question_id": question_id,
+                "type": question_type,
+                "is_correct": None,
+                "student_answer": student_answer,
+                "correct_answer": answer_key,
+                "requires_manual_grading": True
+            })
+            continue
+        total_gradable += 1
+        is_correct = _legacy_match(student_answer, answer_key, question_type)
+        correct_count += is_correct
+        results.append({
+            "question_id": question_id,
+            "type": question_type,
+            "is_correct": is_correct,
+            "student_answer": student_answer,
+            "correct_answer": answer_key,
+            "requires_manual_grading": False
+        })
+    percentage = (correct_count / total_gradable * 100) if total_gradable > 0 else 0
+    return {
+        "score": band_score_for(correct_count, total_gradable),
+        "correct_answers": correct_count,
+        "total_questions": total_gradable,
+        "details": results,
+        "percentage": round(percentage, 2)
+    }
+
+
+# Types with flexible matching in both graders, plus unknown and manual ones
+QUESTION_TYPES = get_all_question_types() + ["note_completion", "summary_completion", "unknown_type"]
+ANSWER_KEYS = ["Paris", "  the  Eiffel Tower ", "B", "", None, 42]
+STUDENT_ANSWERS = ["paris", "PARIS ", "Eiffel", "the eiffel tower", "in the Eiffel Tower area", "b", "", None, "42"]
+
+
+def _exam(answer_key):
+    return [
+        {"id": f"q{index}", "type": question_type, "answer_key": answer_key}
+        for index, question_type in enumerate(QUESTION_TYPES)
+    ]
+
+
+@pytest.mark.parametrize("answer_key,student_answer", list(itertools.product(ANSWER_KEYS, STUDENT_ANSWERS)))
+def test_plan_matches_legacy_grader(answer_key, student_answer):
+    questions = _exam(answer_key)
+    answers = {question["id"]: student_answer for question in questions}
+
+    plan = compile_grading_plan(questions, "listening")
+
+    assert grade_with_plan(plan, answers) == _legacy_grade(questions, answers)
+
+
+def test_plan_matches_legacy_grader_on_mixed_answers():
+    questions = [
+        {"id": f"q{index}", "type": question_type, "answer_key": answer_key}
+        for index, (question_type, answer_key) in enumerate(itertools.product(QUESTION_TYPES, ANSWER_KEYS))
+    ]
+    answers = {
+        question["id"]: STUDENT_ANSWERS[index % len(STUDENT_ANSWERS)]
+        for index, question in enumerate(questions)
+        if index % 7
+    }
+
+    plan = compile_grading_plan(questions)
+
+    assert grade_with_plan(plan, answers) == _legacy_grade(questions, answers)
+
+
+def test_grade_submission_uses_the_plan():
+    questions = _exam("Paris")
+    answers = {"q0": "paris", "q1": "London"}
+
+    assert grade_submission(questions, answers) == _legacy_grade(questions, answers)
+
+
+def test_plan_is_reusable_across_students():
+    questions = _exam("Paris")
+    plan = compile_grading_plan(questions)
+
+    for student_answer in STUDENT_ANSWERS:
+        answers = {question["id"]: student_answer for question in questions}
+        assert grade_with_plan(plan, answers) == _legacy_grade(questions, answers)
+
+
+def test_plan_compiles_answer_keys_once():
+    plan = compile_grading_plan([
+        {"id": "q1", "type": "form_completion", "answer_key": "  Paris "},
+        {"id": "q2", "type": "writing_task_1", "answer_key": ""},
+    ], "listening")
+
+    assert plan == {
+        "exam_type": "listening",
+        "questions": [
+            ("q1", "form_completion", "  Paris ", "exact", ("paris",)),
+            ("q2", "writing_task_1", "", None, ()),
+        ],
+    }
+
+
+def test_list_answer_keys_accept_any_alternative():
+    questions = [{"id": "q1", "type": "form_completion", "answer_key": ["Paris", "PARIS", "City of Light"]}]
+    plan = compile_grading_plan(questions)
+
+    assert plan["questions"][0][4] == ("paris", "city of light")
+    for student_answer, expected in [("paris", True), ("city  of light", True), ("Lyon", False), ("", False)]:
+        assert grade_with_plan(plan, {"q1": student_answer})["details"][0]["is_correct"] is expected
+
+
+def test_empty_exam_scores_zero():
+    assert grade_with_plan(compile_grading_plan([]), {}) == {
+        "score": 0.0,
+        "correct_answers": 0,
+        "total_questions": 0,
+        "details": [],
+        "percentage": 0,
+    }
+
+
+@pytest.mark.parametrize("correct,total,band", [
+    (0, 0, 0.0), (0, 40, 2.5), (4, 40, 3.0), (20, 40, 5.0), (36, 40, 9.0), (40, 40, 9.0), (34, 40, 8.5)
+])
+def test_band_score_for(correct, total, band):
+    assert band_score_for(correct, total) == band
@@ -0,0 +1,125 @@
+"""Tests for keyset pagination cursors and filters"""
+
+import pytest
+from fastapi import HTTPException
+
+from pagination import decode_cursor, encode_cursor, keyset_filter, page_with_cursor
+
+
+@pytest.mark.parametrize("value", [
+    "2024-05-01T09:30:00+00:00", 7.5, 0, None, "ünïcode / + =",
+])
+def test_cursor_round_trip(value):
+    cursor = encode_cursor(value, "row-1")
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (value, "row-1")
+
+
+@pytest.mark.parametrize("cursor", [
+    "", "not a cursor", "!!!!", encode_cursor("value", "id")[:-3],
+    # Valid base64 and JSON, but not a [value, id] pair
+    "WzEsMl0", "eyJhIjoxfQ",
+])
+def test_decode_cursor_rejects_malformed_cursors(cursor):
+    with pytest.raises(HTTPException) as excinfo:
+        decode_cursor(cursor)
+
+    assert excinfo.value.status_code == 400
+
+
+def test_keyset_filter_ascending():
+    assert keyset_filter("score", 1, 6.5, "b") == {"$or": [
+        {"score": {"$gt": 6.5}},
+        {"score": 6.5, "id": {"$gt": "b"}},
+    ]}
+
+
+def test_keyset_filter_descending_includes_nulls():
+    assert keyset_filter("score", -1, 6.5, "b") == {"$or": [
+        {"score": {"$lt": 6.5}},
+        {"score": 6.5, "id": {"$lt": "b"}},
+        {"score": None},
+    ]}
+
+
+def test_keyset_filter_after_null():
+    assert keyset_filter("score", 1, None, "b") == {"$or": [
+        {"score": {"$ne": None}},
+        {"score": None, "id": {"$gt": "b"}},
+    ]}
+    assert keyset_filter("score", -1, None, "b") == {"score": None, "id": {"$lt": "b"}}
+
+
+# Minimal evaluation of the filters above with MongoDB semantics: null
+# equality also matches missing fields, range operators never match null
+def _matches(row, query):
+    if "$or" in query:
+        return any(_matches(row, branch) for branch in query["$or"])
+    for field, condition in query.items():
+        value = row.get(field)
+        if isinstance(condition, dict):
+            for operator, operand in condition.items():
+                if operator == "$ne":
+                    ok = value != operand
+                elif value is None:
+                    ok = False
+                elif operator == "$gt":
+                    ok = value > operand
+                else:
+                    ok = value < operand
+                if not ok:
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _sort_key(row, field):
+    # MongoDB orders null and missing values before numbers
+    value = row.get(field)
+    return (value is not None, value if value is not None else 0, row["id"])
+
+
+ROWS = [
+    {"id": "a", "score": 7.0}, {"id": "b"}, {"id": "c", "score": 5.5},
+    {"id": "d", "score": 7.0}, {"id": "e", "score": None}, {"id": "f", "score": 9.0},
+    {"id": "g", "score": 5.5}, {"id": "h"}, {"id": "i", "score": 7.0},
+]
+
+
+@pytest.mark.parametrize("direction", [1, -1])
+@pytest.mark.parametrize("limit", [1, 2, 3, 4, 20])
+def test_pages_cover_every_row_once(direction, limit):
+    ordered = sorted(ROWS, key=lambda row: _sort_key(row, "score"), reverse=direction == -1)
+
+    seen = []
+    cursor = None
+    while True:
+        query = {}
+        if cursor:
+            value, row_id = decode_cursor(cursor)
+            query = keyset_filter("score", direction, value, row_id)
+        rows = [row for row in ordered if _matches(row, query)][:limit + 1]
+        page, cursor = page_with_cursor(rows, limit, "score")
+        seen.extend(row["id"] for row in page)
+        if cursor is None:
+            break
+
+    assert seen == [row["id"] for row in ordered]
+
+
+def test_page_with_cursor_last_page():
+    rows = [{"id": "a", "score": 1}, {"id": "b", "score": 2}]
+
+    assert page_with_cursor(rows, 2, "score") == (rows, None)
+    assert page_with_cursor([], 2, "score") == ([], None)
+
+
+def test_page_with_cursor_points_after_last_row():
+    rows = [{"id": "a", "score": 1}, {"id": "b", "score": 2}, {"id": "c", "score": 3}]
+
+    page, cursor = page_with_cursor(rows, 2, "score")
+
+    assert page == rows[:2]
+    assert decode_cursor(cursor) == (2, "b")